@@ -0,0 +1,144 @@
+"""Measure the ingest agent against the fake REDundead over localhost
+
+Starts the agent in its own process and runs the same recovery with no
+watcher, one watcher and many watchers streaming its events, then with
+many watchers of which one reads slowly. The job's wall time should not
+depend on the watchers: events are encoded once and a slow watcher only
+receives larger batches. Each case also records how long after the job's
+end every watcher had received all events, and what the agent process used
+in CPU time where /proc is available. The watchers run in this process, so
+on a machine with few cores they compete with the job for CPU and the
+agent's CPU time is the better measure of the cost of each watcher.
+
+    python benchmarks/bench_agent.py [--lines 300000] [--watchers 10] [--json]
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "src"))
+
+from redundead_agent import AgentClient  # noqa: E402
+
+# Seconds the slow watcher spends on each event it receives
+SLOW_WATCHER_DELAY = 0.001
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def cpu_seconds(pid):
+    """User and system CPU time of a process, None without /proc"""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def start_agent(lines, config):
+    """Agent process with the fake REDundead, return (process, client)"""
+    env = dict(os.environ, FAKE_REDUNDEAD_LINES=str(lines), FAKE_REDUNDEAD_CLIPS="10000",
+               FAKE_REDUNDEAD_RATE="0", FAKE_REDUNDEAD_BURST="0", APPDATA=config, XDG_CONFIG_HOME=config,
+               REDUNDEAD_COMMAND=f'"{sys.executable}" "{os.path.join(HERE, "fake_redundead.py")}"')
+    port = free_port()
+    process = subprocess.Popen([sys.executable, os.path.join(HERE, "..", "src", "redundead_cli.py"), "agent",
+                                "--port", str(port), "--no-history"], env=env, stderr=subprocess.DEVNULL)
+    client = AgentClient(f"http://127.0.0.1:{port}")
+    deadline = time.monotonic() + 10
+    while True:
+        try:
+            client.jobs()
+            return process, client
+        except OSError:
+            if time.monotonic() > deadline:
+                process.kill()
+                raise
+            time.sleep(0.05)
+
+
+def watch(client, job_id, delay, received):
+    """Read every event of a job, record the time the last one arrived"""
+    count = 0
+    for _ in client.events(job_id):
+        count += 1
+        if delay:
+            time.sleep(delay)
+    received.append((time.perf_counter(), count))
+
+
+def run_case(client, pid, target, watchers, slow):
+    """One recovery with watchers, return its metrics"""
+    cpu_before = cpu_seconds(pid)
+    start = time.perf_counter()
+    job = client.submit("disk1", target, verify=False, dedup=False)
+    received = []
+    # With slow, the first watcher dawdles over every event
+    delays = [SLOW_WATCHER_DELAY if slow and index == 0 else 0 for index in range(watchers)]
+    threads = [threading.Thread(target=watch, args=(client, job["id"], delay, received)) for delay in delays]
+    for thread in threads:
+        thread.start()
+    # Poll the job itself, the watchers may still be catching up when it ends
+    while client.job(job["id"])["state"] not in ("done", "failed", "cancelled"):
+        time.sleep(0.02)
+    finished = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    cpu_after = cpu_seconds(pid)
+    state = client.job(job["id"])
+    return {
+        "job_s": finished - start,
+        "events": state["events"],
+        "delivered_all": all(count == state["events"] for _, count in received),
+        # The job is polled, a watcher may see the end first
+        "last_watcher_lag_s": max([at - finished for at, _ in received] + [0.0]),
+        "agent_cpu_s": cpu_after - cpu_before if cpu_before is not None else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=300000)
+    parser.add_argument("--watchers", type=int, default=10)
+    parser.add_argument("--json", action="store_true", help="print results as one JSON object")
+    args = parser.parse_args()
+
+    cases = [("none", 0, False), ("one", 1, False), ("many", args.watchers, False), ("many_slow", args.watchers, True)]
+    results = {}
+    with tempfile.TemporaryDirectory() as folder:
+        process, client = start_agent(args.lines, os.path.join(folder, "config"))
+        try:
+            for name, watchers, slow in cases:
+                metrics = run_case(client, process.pid, os.path.join(folder, name), watchers, slow)
+                for key, value in metrics.items():
+                    results[f"{name}_{key}"] = value
+        finally:
+            process.kill()
+            process.wait()
+
+    if args.json:
+        print(json.dumps(results))
+        return
+    print(f"{args.lines} lines, {results['none_events']} events per job")
+    for name, watchers, slow in cases:
+        cpu = results[f"{name}_agent_cpu_s"]
+        label = f"{watchers} watchers" + (", one slow" if slow else "")
+        print(f"  {label:24s} job {results[f'{name}_job_s']:6.2f} s, "
+              f"last watcher {results[f'{name}_last_watcher_lag_s'] * 1000:7.1f} ms later, "
+              f"agent CPU {cpu if cpu is not None else float('nan'):6.2f} s, "
+              f"all delivered: {results[f'{name}_delivered_all']}")
+
+
+if __name__ == "__main__":
+    main()
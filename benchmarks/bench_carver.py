@@ -0,0 +1,92 @@
+"""Measure the built-in R3D carver on a synthetic disk image
+
+    python benchmarks/bench_carver.py [--size-mb 1024] [--clips 20] [--workers N] [--json]
+
+The image is filler with clips placed at unaligned offsets, some of them
+across scan range boundaries. Every carved clip is compared byte for byte.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "src"))
+
+import r3d_carver  # noqa: E402
+from synthetic_r3d import make_clip  # noqa: E402
+
+
+def build_image(path, size, clip_count, seed=0):
+    """Write an image of size bytes with clips at random offsets, return {offset: clip}"""
+    rng = random.Random(seed)
+    clips = {}
+    slot = size // clip_count
+    for index in range(clip_count):
+        clip = make_clip(frames=rng.randint(8, 64), seed=index)
+        offset = index * slot + rng.randrange(1, max(2, slot - len(clip)))
+        clips[offset] = clip
+    # Force one clip across a scan range boundary
+    if size > r3d_carver.RANGE_SIZE + 4 * 1024 * 1024:
+        clips = {o: c for o, c in clips.items()
+                 if not (r3d_carver.RANGE_SIZE - 4 * 1024 * 1024 <= o <= r3d_carver.RANGE_SIZE + 4 * 1024 * 1024)}
+        clips[r3d_carver.RANGE_SIZE - 1000] = make_clip(frames=32, seed=99)
+
+    filler = bytes(range(256)) * 4096
+    with open(path, "wb") as f:
+        written = 0
+        while written < size:
+            written += f.write(filler[:size - written])
+        for offset, clip in clips.items():
+            f.seek(offset)
+            f.write(clip)
+    return clips
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=1024)
+    parser.add_argument("--clips", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=r3d_carver.CARVE_WORKERS)
+    parser.add_argument("--json", action="store_true", help="print results as one JSON object")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        image = os.path.join(folder, "image.bin")
+        output = os.path.join(folder, "out")
+        os.makedirs(output)
+        size = args.size_mb * 1024 * 1024
+        clips = build_image(image, size, args.clips)
+
+        lines = []
+        backend = r3d_carver.NativeCarverBackend(args.workers)
+        start = time.perf_counter()
+        backend.run(image, output, lambda line, stream: lines.append(line))
+        elapsed = time.perf_counter() - start
+
+        mismatched = 0
+        for offset, clip in clips.items():
+            path = os.path.join(output, f"clip_{offset:012X}.R3D")
+            if not os.path.exists(path):
+                mismatched += 1
+                continue
+            with open(path, "rb") as f:
+                if f.read() != clip:
+                    mismatched += 1
+        carved = len(os.listdir(output))
+
+    if args.json:
+        print(json.dumps({"mib_per_s": args.size_mb / elapsed, "clips_placed": len(clips),
+                          "clips_carved": carved, "clips_mismatched": mismatched}))
+        return 1 if mismatched or carved != len(clips) else 0
+    print(f"Native carver: {args.size_mb} MiB with {args.workers} workers in {elapsed:.2f} s = "
+          f"{args.size_mb / elapsed:.0f} MiB/s")
+    print(f"Clips: {len(clips)} placed, {carved} carved, {mismatched} missing or different")
+    return 1 if mismatched or carved != len(clips) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
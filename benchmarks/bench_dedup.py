@@ -0,0 +1,133 @@
+"""Measure deduplication of a folder of large recovered clips
+
+Builds a RecoveryFolder of sparse multi-GB clips: distinct clips, exact
+duplicates of some of them and partial copies that hold only their start.
+Each clip has random data at the sampled offsets and zeros elsewhere, so the
+folder takes little disk space. A manifest with a hash per clip stands in for
+the one verification writes. The scan is timed with that manifest, which is
+the normal case after a recovery, and the time a full re-read would take is
+estimated from the hash speed measured on this machine.
+
+    python benchmarks/bench_dedup.py [--clips 2000] [--size-mb 4096] [--duplicates 200] [--partials 100] [--json]
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "src"))
+
+import redundead_dedup  # noqa: E402
+from redundead_verify import HASH_ALGORITHM, MANIFEST_JSON, hash_file  # noqa: E402
+
+
+def write_sparse(path, size, blocks):
+    """Create a sparse file of size bytes with data blocks at the given offsets"""
+    with open(path, "wb"):
+        pass
+    if os.name == "nt":
+        # NTFS files are only sparse when flagged, otherwise the size is allocated
+        subprocess.run(["fsutil", "sparse", "setflag", path], stdout=subprocess.DEVNULL, check=True)
+    with open(path, "r+b") as f:
+        f.truncate(size)
+        for offset, data in blocks:
+            f.seek(offset)
+            f.write(data)
+
+
+def clip_blocks(rng, size):
+    """Random data wherever deduplication samples a clip or a shorter copy of it"""
+    sample = redundead_dedup.SAMPLE_SIZE
+    blocks = [(0, rng.randbytes(sample)), (size - sample, rng.randbytes(sample))]
+    blocks += [(rng.randrange(sample, size - 2 * sample), rng.randbytes(sample)) for _ in range(4)]
+    return blocks
+
+
+def build_folder(folder, clips, size, duplicates, partials, seed=0):
+    """Write the clips and their manifest, return the number of clips written"""
+    rng = random.Random(seed)
+    rows = []
+    originals = []
+    for index in range(clips):
+        # Carved clips differ in length, a few sectors apart is enough
+        clip_size = size + index * 4096
+        name = f"A001_C{index:04d}_0101XY_001.R3D"
+        blocks = clip_blocks(rng, clip_size)
+        write_sparse(os.path.join(folder, name), clip_size, blocks)
+        originals.append((name, clip_size, blocks))
+        rows.append({"name": name, "size": clip_size, "algorithm": HASH_ALGORITHM, "hash": f"content{index}"})
+    for index in range(duplicates):
+        source, clip_size, blocks = originals[index % clips]
+        name = f"dup{index:04d}_{source}"
+        write_sparse(os.path.join(folder, name), clip_size, blocks)
+        rows.append({"name": name, "size": clip_size, "algorithm": HASH_ALGORITHM,
+                     "hash": f"content{index % clips}"})
+    for index in range(partials):
+        source, clip_size, blocks = originals[-1 - index % clips]
+        partial_size = clip_size // 2 + index * 512
+        kept = [(offset, data[:max(partial_size - offset, 0)]) for offset, data in blocks if offset < partial_size]
+        write_sparse(os.path.join(folder, f"part{index:04d}_{source}"), partial_size, kept)
+    with open(os.path.join(folder, MANIFEST_JSON), "w", encoding="utf-8") as f:
+        json.dump(rows, f)
+    return clips + duplicates + partials
+
+
+def hash_speed(folder, size=256 * 1024 * 1024):
+    """Full hash speed in bytes per second, measured on real data"""
+    path = os.path.join(folder, "hash_speed.bin")
+    with open(path, "wb") as f:
+        block = os.urandom(8 * 1024 * 1024)
+        for _ in range(size // len(block)):
+            f.write(block)
+    start = time.perf_counter()
+    hash_file(path)
+    elapsed = time.perf_counter() - start
+    os.remove(path)
+    return size / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clips", type=int, default=2000)
+    parser.add_argument("--size-mb", type=int, default=4096)
+    parser.add_argument("--duplicates", type=int, default=200)
+    parser.add_argument("--partials", type=int, default=100)
+    parser.add_argument("--json", action="store_true", help="print results as one JSON object")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        recovery_folder = os.path.join(folder, "RecoveryFolder")
+        os.makedirs(recovery_folder)
+        total = build_folder(recovery_folder, args.clips, args.size_mb * 1024 * 1024, args.duplicates, args.partials)
+        logical = sum(entry.stat().st_size for entry in os.scandir(recovery_folder)
+                      if entry.name.endswith(".R3D"))
+
+        start = time.perf_counter()
+        result = redundead_dedup.deduplicate(recovery_folder, "report")
+        elapsed = time.perf_counter() - start
+        assert len(result.duplicates) == args.duplicates, len(result.duplicates)
+        assert len(result.partials) == args.partials, len(result.partials)
+        full_read = logical / hash_speed(folder)
+
+    results = {
+        "clips": total,
+        "logical_gb": logical / 1024 ** 3,
+        "scan_s": elapsed,
+        "clips_per_s": total / elapsed,
+        "full_read_estimate_s": full_read,
+    }
+    if args.json:
+        print(json.dumps(results))
+        return
+    print(f"{total} clips, {results['logical_gb']:.0f} GB, {args.duplicates} duplicates, {args.partials} partial")
+    print(f"  sampled scan:      {elapsed:8.2f} s ({results['clips_per_s']:,.0f} clips/s)")
+    print(f"  full re-read est.: {full_read:8.0f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Measure get_physical_disks: REDundead spawn time and device table parse time
+
+The spawn case runs the fake REDundead as a real process. The parse case
+replays its captured output through the streaming table parser many times,
+so the parse cost is measured without process start-up noise. The hung case
+runs a REDundead that never answers next to the system's fallback providers
+and measures how long the fallback answer takes to win.
+
+    python benchmarks/bench_device_table.py [--devices 64] [--repeat 2000] [--json]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "src"))
+
+os.environ["REDUNDEAD_COMMAND"] = f'"{sys.executable}" "{os.path.join(HERE, "fake_redundead.py")}"'
+
+import redundead_core  # noqa: E402
+import redundead_providers  # noqa: E402
+
+
+def bench_spawn(devices, runs=5):
+    """Median wall time of one get_physical_disks call against the fake process"""
+    os.environ["FAKE_REDUNDEAD_DEVICES"] = str(devices)
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        disks = redundead_core.get_physical_disks()
+        times.append(time.perf_counter() - start)
+    assert len(disks) == devices, disks
+    return sorted(times)[len(times) // 2]
+
+
+def bench_parse(devices, repeat):
+    """Average time to parse the device table output, line by line as it is streamed"""
+    os.environ["FAKE_REDUNDEAD_DEVICES"] = str(devices)
+    captured = subprocess.run(redundead_core.REDUNDEAD_COMMAND, capture_output=True, text=True,
+                              shell=True).stdout.splitlines(keepends=True)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        parser = redundead_providers.DeviceTableParser()
+        for line in captured:
+            if parser.feed(line):
+                break
+    elapsed = time.perf_counter() - start
+    assert len(parser.devices) == devices, parser.devices
+    return elapsed / repeat
+
+
+def bench_hung(timeout):
+    """Wall time until a fallback wins over a REDundead that never prints its table, None without fallbacks"""
+    hung = f'"{sys.executable}" -c "import time; time.sleep({timeout * 2})"'
+    providers = redundead_providers.default_providers(hung)
+    if len(providers) < 2:
+        return None
+    start = time.perf_counter()
+    disks = redundead_providers.enumerate_devices(providers, timeout=timeout)
+    elapsed = time.perf_counter() - start
+    return elapsed if disks else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, default=64)
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--json", action="store_true", help="print results as one JSON object")
+    args = parser.parse_args()
+
+    spawn = bench_spawn(args.devices)
+    parse = bench_parse(args.devices, args.repeat)
+    hung = bench_hung(redundead_core.DISK_SCAN_TIMEOUT)
+    results = {
+        "spawn_and_parse_ms": spawn * 1000,
+        "parse_us": parse * 1e6,
+        "parse_us_per_device": parse * 1e6 / args.devices,
+        "hung_fallback_ms": hung * 1000 if hung is not None else None,
+    }
+    if args.json:
+        print(json.dumps(results))
+        return
+    print(f"get_physical_disks with {args.devices} devices:")
+    print(f"  spawn + parse: {results['spawn_and_parse_ms']:8.1f} ms")
+    print(f"  parse only:    {results['parse_us']:8.1f} us ({results['parse_us_per_device']:.2f} us per device)")
+    if hung is not None:
+        print(f"  hung REDundead, fallback answer: {results['hung_fallback_ms']:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
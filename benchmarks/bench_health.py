@@ -0,0 +1,127 @@
+"""Measure the read health monitor: its cost and how fast it detects a failing card
+
+Times one sample of a real drive's counters, the work the monitor does once
+a second during a recovery. Then replays simulated counter traces on a
+simulated clock, one sample per second: a healthy card with latency jitter
+and an occasional slow read, a card whose reads turn slow, and a card whose
+reads stop completing. The healthy card should never leave ok, the others
+should be reported slow after about SLOW_SECONDS and stalled after about
+STALL_SECONDS.
+
+    python benchmarks/bench_health.py [--samples 2000] [--seconds 300] [--json]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "src"))
+
+from redundead_devices import IOCounters, io_counters  # noqa: E402
+from redundead_health import HEALTH_OK, HealthMonitor  # noqa: E402
+
+# Simulated card: reads of 1 MB, this many per second when healthy
+READS_PER_SECOND = 80
+HEALTHY_LATENCY = 0.004
+# When the failing cards start failing, seconds into the trace
+FAILURE_AT = 60
+
+
+def local_drive():
+    """Kernel name or id of a drive with I/O statistics, None if there is none"""
+    if os.name == "nt":
+        candidates = [f"disk{number}" for number in range(8)]
+    else:
+        try:
+            with open("/proc/diskstats", "r", encoding="utf-8") as f:
+                candidates = [line.split()[2] for line in f]
+        except OSError:
+            return None
+    for candidate in candidates:
+        if io_counters(candidate) is not None:
+            return candidate
+    return None
+
+
+def sample_cost(drive, samples):
+    """Microseconds per reading of a drive's counters, including the monitor's own work"""
+    monitor = HealthMonitor(drive, lambda state, sample: None)
+    monitor.last = io_counters(drive)
+    start = time.perf_counter()
+    for _ in range(samples):
+        monitor.sample(io_counters(drive))
+    return (time.perf_counter() - start) / samples * 1e6
+
+
+def trace(kind, seconds, seed):
+    """Counters once a second of a healthy, slowing or stalling card"""
+    rng = random.Random(seed)
+    reads = read_seconds = 0.0
+    for second in range(seconds):
+        failing = second >= FAILURE_AT
+        in_flight = 1
+        if kind == "stall" and failing:
+            count = 0
+        elif kind == "slow" and failing:
+            # A few retries per second, each taking most of a second
+            count = rng.randint(1, 3)
+            read_seconds += count * rng.uniform(0.3, 0.9)
+        else:
+            count = READS_PER_SECOND
+            read_seconds += sum(rng.expovariate(1 / HEALTHY_LATENCY) for _ in range(count))
+            if rng.random() < 0.02:
+                # An occasional slow read, as after a reader's power save
+                read_seconds += 0.5
+            in_flight = rng.randint(0, 2)
+        reads += count
+        yield IOCounters(int(reads), int(reads) * 1024 ** 2, read_seconds, in_flight)
+
+
+def replay(kind, seconds, seed=1):
+    """Changes of state as (seconds after FAILURE_AT, state)"""
+    now = [0.0]
+    changes = []
+    monitor = HealthMonitor("simulated", lambda state, sample: changes.append((now[0], state)),
+                            clock=lambda: now[0])
+    counters = trace(kind, seconds, seed)
+    monitor.last = next(counters)
+    for reading in counters:
+        now[0] += 1.0
+        monitor.sample(reading)
+    return [(at - FAILURE_AT, state) for at, state in changes]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--samples", type=int, default=2000)
+    parser.add_argument("--seconds", type=int, default=300, help="length of each simulated trace")
+    parser.add_argument("--json", action="store_true", help="print results as one JSON object")
+    args = parser.parse_args()
+
+    drive = local_drive()
+    results = {"sample_us": sample_cost(drive, args.samples) if drive else None}
+    for kind in ("healthy", "slow", "stall"):
+        changes = replay(kind, args.seconds)
+        results[f"{kind}_changes"] = len(changes)
+        # Anything but ok before the card starts failing, or at all for the healthy one
+        results[f"{kind}_false_alarms"] = sum(1 for at, state in changes
+                                              if state != HEALTH_OK and (at < 0 or kind == "healthy"))
+        for at, state in changes:
+            results.setdefault(f"{kind}_{state}_after_s", at)
+    if args.json:
+        print(json.dumps(results))
+        return
+    cost = results["sample_us"]
+    print(f"one sample of {drive or 'no drive'}: {cost if cost is not None else float('nan'):.1f} us")
+    for kind in ("healthy", "slow", "stall"):
+        reported = ", ".join(f"{state} after {results[key]:.0f} s"
+                             for state in ("slow", "stalled") if (key := f"{kind}_{state}_after_s") in results)
+        print(f"  {kind:8s} card: {results[f'{kind}_changes']} changes, "
+              f"{results[f'{kind}_false_alarms']} false alarms, {reported or 'always ok'}")
+
+
+if __name__ == "__main__":
+    main()
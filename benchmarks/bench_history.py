@@ -0,0 +1,107 @@
+"""Measure the recovery history: cost on the recovery thread and batched commit rate
+
+The queued case records clips the way RecoveryJob does and reports how long
+each call takes on the calling thread and how long the writer needs to
+commit them all. The direct case commits every record in its own
+transaction, as a writer without batching would, for comparison. A lookup
+by serial number and one by clip name are timed on the filled database.
+
+    python benchmarks/bench_history.py [--records 20000] [--direct-records 2000] [--json]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "src"))
+
+from redundead_history import RUN_DONE, RecoveryHistory  # noqa: E402
+
+
+def clip_row(index):
+    return {"name": f"A001_C{index:05d}_0101XY_001.R3D", "size": 1024 * 1024 * 1024, "algorithm": "blake2b",
+            "hash": f"{index:0128x}", "status": "ok", "detail": ""}
+
+
+def bench_queued(path, records):
+    """Per call time of queued writes and the time until all are committed"""
+    history = RecoveryHistory(path)
+    run_id = history.start_run("disk1", "disk1", "/target", "redundead", "SERIAL1", "RED MINI-MAG", 2 ** 40)
+    start = time.perf_counter()
+    for index in range(records):
+        history.record_clip(run_id, clip_row(index), f"/target/clip_{index}.R3D")
+    queued = time.perf_counter() - start
+    history.finish_run(run_id, RUN_DONE, "Success", 2 ** 40, records, 500.0)
+    history.flush()
+    committed = time.perf_counter() - start
+    return history, queued / records, records / committed
+
+
+def bench_direct(path, records):
+    """Records per second with one transaction per record"""
+    history = RecoveryHistory(path)
+    history.close()
+    connection = history.connect()
+    start = time.perf_counter()
+    for index in range(records):
+        row = clip_row(index)
+        with connection:
+            connection.execute(
+                "INSERT INTO clips (run_id, name, path, size, algorithm, hash, status, detail, recorded) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                ("direct", row["name"], "/target", row["size"], row["algorithm"], row["hash"], row["status"],
+                 row["detail"], time.time()),
+            )
+    elapsed = time.perf_counter() - start
+    connection.close()
+    return records / elapsed
+
+
+def bench_lookup(history, repeat=200):
+    """Average time of a lookup by serial number and of one by clip name"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        assert history.runs_for_device("SERIAL1", status=RUN_DONE, limit=1)
+    serial = (time.perf_counter() - start) / repeat
+    start = time.perf_counter()
+    for index in range(repeat):
+        assert history.find_clip(clip_row(index).get("name"))
+    clip = (time.perf_counter() - start) / repeat
+    return serial, clip
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=20000)
+    parser.add_argument("--direct-records", type=int, default=2000)
+    parser.add_argument("--json", action="store_true", help="print results as one JSON object")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        history, call, queued_rate = bench_queued(os.path.join(folder, "queued.sqlite3"), args.records)
+        serial, clip = bench_lookup(history)
+        history.close()
+        direct_rate = bench_direct(os.path.join(folder, "direct.sqlite3"), args.direct_records)
+
+    results = {
+        "record_call_us": call * 1e6,
+        "batched_records_per_s": queued_rate,
+        "direct_records_per_s": direct_rate,
+        "lookup_serial_ms": serial * 1000,
+        "lookup_clip_ms": clip * 1000,
+    }
+    if args.json:
+        print(json.dumps(results))
+        return
+    print(f"Recovery history with {args.records} clips:")
+    print(f"  record_clip on the recovery thread: {results['record_call_us']:8.2f} us per call")
+    print(f"  batched commits:    {queued_rate:10.0f} records/s")
+    print(f"  one per transaction: {direct_rate:9.0f} records/s")
+    print(f"  lookup by serial: {results['lookup_serial_ms']:.3f} ms, by clip name: {results['lookup_clip_ms']:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Measure hot-plug updates of the drive list against pressing refresh
+
+Uses the drives of this machine. A card insertion is simulated by making
+the device cache forget one drive and then sending the burst of
+notifications a real insertion produces: the disk, its partitions and a
+media change within a few hundred milliseconds. The watcher should call
+back once, read only that drive and start no process. For comparison the
+same insertion handled by pressing refresh runs the full enumeration once
+per press, counting the processes it starts.
+
+    python benchmarks/bench_hotplug.py [--events 6] [--presses 5] [--json]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "src"))
+
+import redundead_core  # noqa: E402
+from redundead_hotplug import HotplugWatcher  # noqa: E402
+
+# Seconds between the notifications of one insertion
+EVENT_SPACING = 0.04
+
+
+class CountingPopen(subprocess.Popen):
+    """Popen that counts the processes started"""
+    started = 0
+
+    def __init__(self, *args, **kwargs):
+        CountingPopen.started += 1
+        super().__init__(*args, **kwargs)
+
+
+def forget_last(cache):
+    """Make the cache believe the last drive isn't attached yet, return its id"""
+    disk = cache.disks[-1]
+    cache.disks = cache.disks[:-1]
+    name = f"PhysicalDrive{disk.id[len('disk'):]}" if os.name == "nt" else disk.id
+    cache.signature = cache.signature - {name}
+    return disk.id
+
+
+def manual(cache, presses):
+    """Seconds and processes for pressing refresh presses times"""
+    CountingPopen.started = 0
+    start = time.perf_counter()
+    for _ in range(presses):
+        cache.get(force=True)
+    return time.perf_counter() - start, CountingPopen.started
+
+
+def hotplug(cache, device_id, events):
+    """Callbacks, processes and seconds from the last notification to the updated list"""
+    CountingPopen.started = 0
+    done = threading.Event()
+    callbacks = []
+
+    def changed(names):
+        disks, _ = cache.update(names)
+        callbacks.append((time.perf_counter(), any(disk.id == device_id for disk in disks)))
+        done.set()
+
+    watcher = HotplugWatcher(changed)
+    watcher.start()
+    for _ in range(events):
+        watcher.notify(device_id)
+        last = time.perf_counter()
+        time.sleep(EVENT_SPACING)
+    done.wait(10)
+    # Any further callback would come within the debounce time
+    time.sleep(watcher.debounce * 2)
+    watcher.stop()
+    return {
+        "callbacks": len(callbacks),
+        "found": bool(callbacks) and callbacks[0][1],
+        "processes": CountingPopen.started,
+        "update_ms": (callbacks[0][0] - last) * 1000 if callbacks else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=6, help="notifications per insertion")
+    parser.add_argument("--presses", type=int, default=5, help="refresh presses per insertion")
+    parser.add_argument("--json", action="store_true", help="print results as one JSON object")
+    args = parser.parse_args()
+
+    subprocess.Popen = CountingPopen
+    with tempfile.TemporaryDirectory() as folder:
+        cache = redundead_core.DiskCache(path=os.path.join(folder, "devices.json"))
+        if not cache.get(force=True):
+            sys.exit("No drives found")
+        manual_s, manual_processes = manual(cache, args.presses)
+        device_id = forget_last(cache)
+        result = hotplug(cache, device_id, args.events)
+
+    results = {
+        "drives": len(cache.disks),
+        "manual_s": manual_s,
+        "manual_processes": manual_processes,
+        "hotplug_callbacks": result["callbacks"],
+        "hotplug_found": result["found"],
+        "hotplug_processes": result["processes"],
+        "hotplug_update_ms": result["update_ms"],
+    }
+    if args.json:
+        print(json.dumps(results))
+        return
+    print(f"{results['drives']} drives, {device_id} inserted")
+    print(f"  refresh pressed {args.presses} times: {manual_s:6.2f} s, {manual_processes} processes started")
+    update = result["update_ms"]
+    print(f"  hot-plug, {args.events} notifications: {result['callbacks']} update, "
+          f"{result['processes']} processes started, list updated "
+          f"{update if update is not None else float('nan'):.0f} ms after the last notification, "
+          f"drive listed: {result['found']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""Measure GUI event-loop latency while a synthetic run floods the log
+
+Runs 100k lines through the log view twice: once with one signal and one
+QTextEdit.append per line (the old path) and once through LogSink batches
+into REDundeadGUI.update_log. A 10 ms QTimer records how late each tick
+fires, which is the delay a user sees before the next repaint. Each message
+is also timed from the emit in the worker thread until the view holds it
+(signal to view latency).
+
+    python benchmarks/bench_log_render.py [--lines 100000] [--json]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from collections import deque
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "src"))
+
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal  # noqa: E402
+from PyQt5.QtWidgets import QApplication, QTextEdit  # noqa: E402
+
+from redundead_core import LOG_MAX_BLOCKS, LogSink  # noqa: E402
+from redundead_gui import REDundeadGUI  # noqa: E402
+
+TICK_MS = 10
+
+
+class Producer(QObject):
+    """Emits log messages from a background thread like RecoveryWorker does"""
+    log_update = pyqtSignal(str)
+
+
+class LagProbe:
+    """Records how late a fixed-interval timer fires"""
+
+    def __init__(self):
+        self.lags = []
+        self.last = time.perf_counter()
+        self.timer = QTimer()
+        self.timer.timeout.connect(self.tick)
+        self.timer.start(TICK_MS)
+
+    def tick(self):
+        now = time.perf_counter()
+        self.lags.append(max(0.0, (now - self.last) * 1000 - TICK_MS))
+        self.last = now
+
+    def summary(self):
+        lags = sorted(self.lags) or [0.0]
+        return {
+            "ticks": len(self.lags),
+            "p50_ms": statistics.median(lags),
+            "p99_ms": lags[int(len(lags) * 0.99) - 1 if len(lags) > 1 else 0],
+            "max_ms": lags[-1],
+        }
+
+
+def percentile(values, fraction):
+    """Value below which the given fraction of values lies"""
+    values = sorted(values) or [0.0]
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def run_case(app, lines, batched):
+    """Push lines through one log path and return latency statistics"""
+    view = QTextEdit()
+    view.setReadOnly(True)
+    view.show()
+    received = [0]
+    # Queued signals are delivered in order, so emit times form a FIFO
+    emitted = deque()
+    latencies = []
+    # Reuse the GUI slot on a bare object holding only the text view
+    holder = type("Holder", (), {})()
+    holder.log_text = view
+
+    if batched:
+        view.document().setMaximumBlockCount(LOG_MAX_BLOCKS)
+
+        def on_message(message):
+            REDundeadGUI.update_log(holder, message)
+            received[0] += message.count("\n") + 1
+            latencies.append((time.perf_counter() - emitted.popleft()) * 1000)
+    else:
+        def on_message(message):
+            view.append(message)
+            scrollbar = view.verticalScrollBar()
+            scrollbar.setValue(scrollbar.maximum())
+            received[0] += 1
+            latencies.append((time.perf_counter() - emitted.popleft()) * 1000)
+
+    producer = Producer()
+    producer.log_update.connect(on_message)
+
+    def emit(message):
+        emitted.append(time.perf_counter())
+        producer.log_update.emit(message)
+
+    def produce():
+        sink = LogSink(emit) if batched else None
+        for i in range(lines):
+            line = f"Scanning disk1 offset {i * 4096} -> RecoveryFolder"
+            if sink:
+                sink.write(line)
+            else:
+                emit(line)
+        if sink:
+            sink.close()
+
+    probe = LagProbe()
+    start = time.perf_counter()
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    while received[0] < lines:
+        app.processEvents()
+    elapsed = time.perf_counter() - start
+    probe.timer.stop()
+    view.close()
+
+    result = probe.summary()
+    result["seconds"] = elapsed
+    result["blocks"] = view.document().blockCount()
+    result["signal_to_view_p50_ms"] = percentile(latencies, 0.5)
+    result["signal_to_view_p99_ms"] = percentile(latencies, 0.99)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=100000)
+    parser.add_argument("--json", action="store_true", help="print results as one JSON object")
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv)
+    results = {}
+    for key, name, batched in (("per_line", "per-line append", False), ("batched", "LogSink batches", True)):
+        result = run_case(app, args.lines, batched)
+        results.update({f"{key}_{metric}": value for metric, value in result.items()})
+        if not args.json:
+            print(f"{name:16s} {result['seconds']:6.2f} s  lag p50 {result['p50_ms']:6.1f} ms  "
+                  f"p99 {result['p99_ms']:7.1f} ms  max {result['max_ms']:7.1f} ms  "
+                  f"signal to view p99 {result['signal_to_view_p99_ms']:7.1f} ms  "
+                  f"blocks {result['blocks']}")
+    if args.json:
+        print(json.dumps(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""Measure RecoveryWorker output throughput against the fake REDundead
+
+Compares the old readline/sleep polling loop, the text pump that read
+line-buffered text pipes with one readline per line, and the binary
+OutputPump. The legacy loop is capped by time because at 10 lines/s it would
+never finish 1M lines, and it only reads stdout: with interleaved stderr it
+deadlocks once a pipe fills.
+
+The binary pump runs once with a single text consumer, as RecoveryJob uses
+it, and once fanned out to four consumers that share each chunk of output:
+the text log, a marker search, a line counter and a byte counter. Only the
+log decodes. Every case hands each line to an on_line callback. CPU time is
+that of the reading process, per line.
+
+The live fake REDundead writes line by line and limits the rate, so the
+pumps are also run on a replay of its output written at pipe speed, which
+shows the cost of the reading side alone.
+
+    python benchmarks/bench_output_pump.py [--lines 1000000] [--legacy-seconds 5] [--json]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "src"))
+
+from redundead_pump import OutputPump, text_consumer  # noqa: E402
+
+FAKE_COMMAND = f'"{sys.executable}" "{os.path.join(HERE, "fake_redundead.py")}"'
+REPLAY_CODE = "import shutil, sys; shutil.copyfileobj(open(sys.argv[1], 'rb'), sys.stdout.buffer, 1 << 20)"
+
+
+def record(lines, path):
+    """Write the stdout of the fake REDundead to path for replays"""
+    env = dict(os.environ, FAKE_REDUNDEAD_LINES=str(lines))
+    with open(path, "wb") as f:
+        subprocess.run(f'{FAKE_COMMAND} disk1 "{HERE}"', shell=True, stdout=f, env=env, check=True)
+
+
+def spawn(lines, stderr_every, text=True, replay=None):
+    """Start the fake REDundead with text pipes as before, or binary ones as REDundeadBackend does"""
+    env = dict(os.environ)
+    env["FAKE_REDUNDEAD_LINES"] = str(lines)
+    env["FAKE_REDUNDEAD_STDERR"] = str(stderr_every)
+    if text:
+        pipes = {"text": True, "bufsize": 1}
+    else:
+        pipes = {"bufsize": 0}
+    if replay:
+        return subprocess.Popen([sys.executable, "-c", REPLAY_CODE, replay],
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, **pipes)
+    return subprocess.Popen(
+        f'{FAKE_COMMAND} disk1 "{HERE}"',
+        shell=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        env=env,
+        **pipes
+    )
+
+
+def bench_legacy(lines, seconds):
+    """Old polling loop: readline on stdout, then sleep 0.1 s"""
+    process = spawn(lines, 0)
+    stdout_output = ""
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        return_code = process.poll()
+        stdout_line = process.stdout.readline()
+        if stdout_line:
+            stdout_output += stdout_line
+            count += 1
+        if return_code is not None and not stdout_line:
+            break
+        time.sleep(0.1)
+    elapsed = time.perf_counter() - start
+    process.kill()
+    process.communicate()
+    return count, elapsed
+
+
+def bench_text_pump(lines, stderr_every, replay=None):
+    """The previous pump: one thread per text pipe, readline and rstrip per line"""
+    count = [0]
+
+    def on_line(line, stream):
+        count[0] += 1
+
+    def read(name, stream):
+        for line in iter(stream.readline, ""):
+            on_line(line.rstrip("\r\n"), name)
+        stream.close()
+
+    start, cpu = time.perf_counter(), time.process_time()
+    process = spawn(lines, stderr_every, replay=replay)
+    threads = [threading.Thread(target=read, args=pipe)
+               for pipe in (("stdout", process.stdout), ("stderr", process.stderr))]
+    for thread in threads:
+        thread.start()
+    process.wait()
+    for thread in threads:
+        thread.join()
+    return count[0], time.perf_counter() - start, time.process_time() - cpu
+
+
+def bench_pump(lines, stderr_every, fan_out=False, replay=None):
+    """Binary OutputPump with a text consumer, and optionally three more that don't decode"""
+    count = [0]
+    totals = {"markers": 0, "lines": 0, "bytes": 0}
+
+    def on_line(line, stream):
+        count[0] += 1
+
+    def markers(chunk):
+        totals["markers"] += chunk.count(b".R3D")
+
+    def lines_seen(chunk):
+        totals["lines"] += chunk.count(b"\n")
+
+    def bytes_seen(chunk):
+        totals["bytes"] += len(chunk)
+
+    consumers = [text_consumer(on_line)]
+    if fan_out:
+        consumers += [markers, lines_seen, bytes_seen]
+    start, cpu = time.perf_counter(), time.process_time()
+    pump = OutputPump(spawn(lines, stderr_every, text=False, replay=replay), consumers)
+    pump.start()
+    pump.wait()
+    return count[0], time.perf_counter() - start, time.process_time() - cpu
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=1000000)
+    parser.add_argument("--stderr-every", type=int, default=1000)
+    parser.add_argument("--legacy-seconds", type=float, default=5.0)
+    parser.add_argument("--json", action="store_true", help="print results as one JSON object")
+    args = parser.parse_args()
+
+    legacy_count, legacy_elapsed = bench_legacy(args.lines, args.legacy_seconds)
+    runs = {
+        "text_pump": bench_text_pump(args.lines, args.stderr_every),
+        "pump": bench_pump(args.lines, args.stderr_every),
+        "fan_out": bench_pump(args.lines, args.stderr_every, fan_out=True),
+    }
+    with tempfile.TemporaryDirectory() as folder:
+        replay = os.path.join(folder, "output.txt")
+        record(args.lines, replay)
+        runs["text_pump_replay"] = bench_text_pump(args.lines, 0, replay)
+        runs["pump_replay"] = bench_pump(args.lines, 0, replay=replay)
+        runs["fan_out_replay"] = bench_pump(args.lines, 0, fan_out=True, replay=replay)
+    results = {"legacy_lines_per_s": legacy_count / legacy_elapsed}
+    for name, (count, elapsed, cpu) in runs.items():
+        results[f"{name}_lines_per_s"] = count / elapsed
+        results[f"{name}_cpu_us_per_line"] = cpu / count * 1e6
+    if args.json:
+        print(json.dumps(results))
+        return
+    print(f"legacy loop: {legacy_count} lines in {legacy_elapsed:.2f} s = "
+          f"{legacy_count / legacy_elapsed:,.0f} lines/s")
+    labels = {"text_pump": "text pump", "pump": "OutputPump", "fan_out": "4 consumers"}
+    for name, (count, elapsed, cpu) in runs.items():
+        label = labels[name.replace("_replay", "")] + (" (replay)" if name.endswith("_replay") else "")
+        print(f"{label + ':':23s}{count} lines in {elapsed:.2f} s = {count / elapsed:,.0f} lines/s, "
+              f"{cpu / count * 1e6:.2f} us CPU per line")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Measure presets: the cost of the settings file and of quiet log verbosity
+
+Times loading a settings file holding a number of presets, saving one of
+them, which rewrites the file atomically, and preparing a job from a preset:
+reading it, naming its folder from the template and creating the
+RecoveryJob. Then runs the same recovery against the fake REDundead with
+full and with quiet verbosity. Both write every line to the log file, quiet
+should deliver only the helper's own lines to the log view.
+
+    python benchmarks/bench_presets.py [--presets 50] [--repeat 200] [--lines 300000] [--json]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "src"))
+
+os.environ["REDUNDEAD_COMMAND"] = f'"{sys.executable}" "{os.path.join(HERE, "fake_redundead.py")}"'
+
+from redundead_core import LOG_FILE_NAME, RecoveryJob, job_folders  # noqa: E402
+from redundead_devices import Device  # noqa: E402
+from redundead_settings import Settings  # noqa: E402
+
+
+def settings_costs(folder, presets, repeat):
+    """Milliseconds to load the settings, save a preset and prepare a job from it"""
+    path = os.path.join(folder, "settings.json")
+    settings = Settings(path)
+    for number in range(presets):
+        settings.save_preset(f"preset {number}", {"target": folder, "folder": "{date}_{serial}_{disk}",
+                                                  "jobs": 2, "verbosity": "quiet", "auto_start": True})
+    start = time.perf_counter()
+    for _ in range(repeat):
+        settings = Settings(path)
+    load = time.perf_counter() - start
+
+    preset = settings.preset("preset 0")
+    start = time.perf_counter()
+    for _ in range(repeat):
+        settings.save_preset("preset 0", preset)
+    save = time.perf_counter() - start
+
+    device = Device("disk1", 256 * 1024 ** 3, "RED MINI-MAG", "A1B2C3")
+    start = time.perf_counter()
+    for _ in range(repeat):
+        preset = settings.preset("preset 0")
+        folder_name, subfolder = job_folders(preset["folder"], device.id, device, True)
+        RecoveryJob(device.id, preset["target"], device.size_bytes, subfolder=subfolder, verify=preset["verify"],
+                    device=device, folder=folder_name, verbosity=preset["verbosity"])
+    prepare = time.perf_counter() - start
+    return load / repeat * 1000, save / repeat * 1000, prepare / repeat * 1000
+
+
+def run_job(lines, verbosity):
+    """Run one job, return (seconds, lines shown, lines in the log file)"""
+    os.environ.update({"FAKE_REDUNDEAD_LINES": str(lines), "FAKE_REDUNDEAD_CLIPS": "10000",
+                       "FAKE_REDUNDEAD_RATE": "0", "FAKE_REDUNDEAD_BURST": "0"})
+    shown = [0]
+
+    def on_log(batch):
+        shown[0] += batch.count("\n") + 1
+
+    with tempfile.TemporaryDirectory() as folder:
+        job = RecoveryJob("disk1", folder, total_bytes=lines * 4096, verify=False, dedup=False,
+                          verbosity=verbosity)
+        job.on_log = on_log
+        thread = threading.Thread(target=job.run)
+        start = time.perf_counter()
+        thread.start()
+        thread.join()
+        seconds = time.perf_counter() - start
+        with open(os.path.join(job.recovery_folder, LOG_FILE_NAME), "rb") as f:
+            written = sum(1 for _ in f)
+    return seconds, shown[0], written
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--presets", type=int, default=50, help="presets in the settings file")
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--lines", type=int, default=300000, help="lines printed by the fake REDundead")
+    parser.add_argument("--json", action="store_true", help="print results as one JSON object")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        load_ms, save_ms, prepare_ms = settings_costs(folder, args.presets, args.repeat)
+    results = {"load_ms": load_ms, "save_preset_ms": save_ms, "prepare_job_ms": prepare_ms}
+    for verbosity in ("full", "quiet"):
+        seconds, shown, written = run_job(args.lines, verbosity)
+        results[f"{verbosity}_s"] = seconds
+        results[f"{verbosity}_lines_shown"] = shown
+        results[f"{verbosity}_lines_written"] = written
+    if args.json:
+        print(json.dumps(results))
+        return
+    print(f"settings with {args.presets} presets: load {load_ms:.2f} ms, save a preset {save_ms:.2f} ms, "
+          f"prepare a job from a preset {prepare_ms:.2f} ms")
+    for verbosity in ("full", "quiet"):
+        print(f"  {verbosity:5s} log: {results[f'{verbosity}_s']:6.2f} s, "
+              f"{results[f'{verbosity}_lines_shown']} lines shown, "
+              f"{results[f'{verbosity}_lines_written']} lines in the log file")
+
+
+if __name__ == "__main__":
+    main()
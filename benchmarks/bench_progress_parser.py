@@ -0,0 +1,51 @@
+"""Measure ProgressParser cost per line on typical REDundead output
+
+    python benchmarks/bench_progress_parser.py [--lines 1000000] [--json]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "src"))
+
+from redundead_core import ProgressParser  # noqa: E402
+
+
+def make_lines(count):
+    """Mix of offset lines, clip lines and noise similar to fake_redundead.py"""
+    lines = []
+    for i in range(count):
+        if i % 10000 == 9999:
+            lines.append(f"Recovered RecoveryFolder/A001_C{i // 10000:03d}_0101XY_001.R3D")
+        elif i % 100 == 50:
+            lines.append("Checking block header")
+        else:
+            lines.append(f"Scanning disk1 offset {i * 4096} -> RecoveryFolder")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=1000000)
+    parser.add_argument("--json", action="store_true", help="print results as one JSON object")
+    args = parser.parse_args()
+
+    lines = make_lines(args.lines)
+    progress = ProgressParser(total_bytes=args.lines * 4096)
+    start = time.perf_counter()
+    for line in lines:
+        progress.feed(line)
+    elapsed = time.perf_counter() - start
+    if args.json:
+        print(json.dumps({"ns_per_line": elapsed / args.lines * 1e9, "lines_per_s": args.lines / elapsed}))
+        return
+    print(f"ProgressParser: {args.lines} lines in {elapsed:.2f} s = "
+          f"{args.lines / elapsed:,.0f} lines/s, {elapsed / args.lines * 1e9:.0f} ns/line")
+    print(f"percent={progress.percent:.1f} clips={progress.clips_found}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Measure RecoveryJob line throughput and memory growth against the fake REDundead
+
+Runs the same job path as RecoveryWorker: OutputPump, ProgressParser, journal
+checkpoints and the LogSink, with the log batches going to a counting
+callback instead of the GUI. Three cases:
+
+    flat out   the fake prints as fast as the pipe accepts lines
+    burst      the fake prints at a fixed average rate in large bursts,
+               the job should keep up and finish right after the last line
+    long run   resident memory is sampled while a long run streams,
+               growth should stay flat once buffers are warm
+
+    python benchmarks/bench_recovery_job.py [--lines 1000000] [--json]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "src"))
+
+os.environ["REDUNDEAD_COMMAND"] = f'"{sys.executable}" "{os.path.join(HERE, "fake_redundead.py")}"'
+
+from redundead_core import RecoveryJob  # noqa: E402
+
+MEMORY_SAMPLE_INTERVAL = 0.2
+
+
+def resident_bytes():
+    """Resident set size of this process, None where it can't be read cheaply"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def run_job(lines, env, on_sample=None):
+    """Run one job into a temporary folder, return (seconds, lines seen, success)"""
+    os.environ.update({"FAKE_REDUNDEAD_LINES": str(lines), "FAKE_REDUNDEAD_CLIPS": "10000",
+                       "FAKE_REDUNDEAD_RATE": "0", "FAKE_REDUNDEAD_BURST": "0"})
+    os.environ.update(env)
+    seen = [0]
+    result = []
+
+    def on_log(batch):
+        seen[0] += batch.count("\n") + 1
+
+    with tempfile.TemporaryDirectory() as folder:
+        job = RecoveryJob("disk1", folder, total_bytes=lines * 4096, verify=False)
+        job.on_log = on_log
+        job.on_complete = lambda success, message: result.append(success)
+        thread = threading.Thread(target=job.run)
+        start = time.perf_counter()
+        thread.start()
+        while thread.is_alive():
+            thread.join(MEMORY_SAMPLE_INTERVAL)
+            if on_sample:
+                on_sample(time.perf_counter() - start, seen[0])
+        elapsed = time.perf_counter() - start
+    return elapsed, seen[0], bool(result and result[0])
+
+
+def bench_flat_out(lines):
+    """Lines per second with the fake printing flat out"""
+    elapsed, seen, ok = run_job(lines, {})
+    return {"flat_lines_per_s": lines / elapsed, "flat_ok": ok and seen >= lines}
+
+
+def bench_burst(lines, rate, burst):
+    """Return achieved rate and how long the job needed beyond the fake's own schedule"""
+    elapsed, seen, ok = run_job(lines, {"FAKE_REDUNDEAD_RATE": str(rate), "FAKE_REDUNDEAD_BURST": str(burst)})
+    return {
+        "burst_lines_per_s": lines / elapsed,
+        "burst_overrun_ms": max(elapsed - lines / rate, 0.0) * 1000,
+        "burst_ok": ok and seen >= lines,
+    }
+
+
+def bench_memory(lines):
+    """Resident memory at 10% of the run and at the end"""
+    samples = []
+    elapsed, seen, ok = run_job(lines, {}, lambda t, count: samples.append((count, resident_bytes())))
+    samples = [(count, rss) for count, rss in samples if rss is not None]
+    if len(samples) < 4:
+        return {}
+    # Skip the warm-up, buffers and the journal file reach their size early
+    warm = samples[len(samples) // 10]
+    last = samples[-1]
+    growth = last[1] - warm[1]
+    per_million = growth / max(last[0] - warm[0], 1) * 1e6
+    return {
+        "rss_mb": last[1] / 1024 ** 2,
+        "rss_growth_mb": growth / 1024 ** 2,
+        "rss_growth_mb_per_million_lines": per_million / 1024 ** 2,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=1000000)
+    parser.add_argument("--burst-lines", type=int, default=200000)
+    parser.add_argument("--rate", type=int, default=100000, help="burst case average lines/s")
+    parser.add_argument("--burst", type=int, default=20000, help="burst case lines per burst")
+    parser.add_argument("--memory-lines", type=int, default=3000000)
+    parser.add_argument("--json", action="store_true", help="print results as one JSON object")
+    args = parser.parse_args()
+
+    results = {}
+    results.update(bench_flat_out(args.lines))
+    results.update(bench_burst(args.burst_lines, args.rate, args.burst))
+    results.update(bench_memory(args.memory_lines))
+    if args.json:
+        print(json.dumps(results))
+        return
+    print(f"flat out: {results['flat_lines_per_s']:>12,.0f} lines/s")
+    print(f"burst:    {results['burst_lines_per_s']:>12,.0f} lines/s at {args.rate:,} lines/s requested, "
+          f"finished {results['burst_overrun_ms']:.0f} ms after the last burst")
+    if "rss_mb" in results:
+        print(f"memory:   {results['rss_mb']:.1f} MB resident, {results['rss_growth_mb']:+.1f} MB after warm-up "
+              f"({results['rss_growth_mb_per_million_lines']:+.2f} MB per million lines)")
+
+
+if __name__ == "__main__":
+    main()
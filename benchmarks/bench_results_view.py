@@ -0,0 +1,140 @@
+"""Measure the results view over a folder of thousands of recovered fragments
+
+Writes small synthetic clips, half of them cut short like carved fragments,
+and times reading their information the way the results view does, counting
+the bytes read per clip. Then the results step is shown offscreen and
+scrolled from top to bottom, several pages per step as when the scroll bar
+is dragged. Each step is timed including the repaint, and the clips whose
+information was loaded on the way are counted: rows only passed over are
+never read. REDline is not used, the view draws placeholders.
+
+    python benchmarks/bench_results_view.py [--clips 5000] [--step-pages 2] [--json]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+# Placeholders only, whether or not REDline is installed
+os.environ["REDLINE_COMMAND"] = "redline-not-installed"
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "src"))
+
+from PyQt5.QtWidgets import QApplication  # noqa: E402
+
+import r3d  # noqa: E402
+from redundead_dedup import find_clips  # noqa: E402
+from synthetic_r3d import make_clip  # noqa: E402
+
+
+class CountingFile:
+    """Unbuffered file that counts the bytes read through it"""
+
+    def __init__(self, f):
+        self.f = f
+        self.bytes_read = 0
+
+    def seek(self, offset):
+        self.f.seek(offset)
+
+    def read(self, size):
+        data = self.f.read(size)
+        self.bytes_read += len(data)
+        return data
+
+
+def build_folder(folder, clips):
+    """Write the clips, every other one cut in the middle of its frames"""
+    for index in range(clips):
+        data = make_clip(frames=8, frame_size=4096, seed=index)
+        if index % 2:
+            data = data[:len(data) // 2]
+        with open(os.path.join(folder, f"clip_{index:06d}.R3D"), "wb") as f:
+            f.write(data)
+
+
+def read_headers(folder):
+    """Seconds and bytes read per clip for reading the information of every clip"""
+    clips = find_clips(folder)
+    total = 0
+    start = time.perf_counter()
+    for clip in clips:
+        with open(clip.path, "rb", buffering=0) as f:
+            counting = CountingFile(f)
+            r3d.read_clip_info(counting, clip.size)
+            total += counting.bytes_read
+    return (time.perf_counter() - start) / len(clips), total / len(clips)
+
+
+def scroll(folder, step_pages):
+    """Scroll the results view through the folder, return (step times in seconds, rows loaded, rows)"""
+    # A fresh thumbnail cache, nothing is known about the clips yet
+    os.environ["APPDATA"] = os.environ["XDG_CONFIG_HOME"] = tempfile.mkdtemp()
+    from redundead_gui import Translations
+    from redundead_results import ResultsWidget
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    widget = ResultsWidget(Translations())
+    widget.resize(900, 700)
+    widget.show()
+    widget.load(folder)
+    while not widget.model.clips:
+        app.processEvents()
+
+    bar = widget.view.verticalScrollBar()
+    times = []
+    for value in range(0, bar.maximum() + 1, max(int(bar.pageStep() * step_pages), 1)):
+        start = time.perf_counter()
+        bar.setValue(value)
+        widget.view.viewport().repaint()
+        app.processEvents()
+        times.append(time.perf_counter() - start)
+    # Let the loads still in flight finish before counting
+    deadline = time.perf_counter() + 10
+    while widget.model.pending and time.perf_counter() < deadline:
+        app.processEvents()
+    loaded = len(widget.model.infos)
+    widget.shutdown()
+    return times, loaded, len(widget.model.clips)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clips", type=int, default=5000)
+    parser.add_argument("--step-pages", type=float, default=2.0)
+    parser.add_argument("--json", action="store_true", help="print results as one JSON object")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        build_folder(folder, args.clips)
+        info_seconds, info_bytes = read_headers(folder)
+        times, loaded, rows = scroll(folder, args.step_pages)
+
+    results = {
+        "clips": rows,
+        "info_us_per_clip": info_seconds * 1e6,
+        "info_bytes_per_clip": info_bytes,
+        "scroll_steps": len(times),
+        "scroll_step_median_ms": statistics.median(times) * 1000,
+        "scroll_step_max_ms": max(times) * 1000,
+        "clips_loaded": loaded,
+        "clips_loaded_fraction": loaded / rows,
+    }
+    if args.json:
+        print(json.dumps(results))
+        return
+    print(f"{rows} clips")
+    print(f"  clip information: {results['info_us_per_clip']:8.1f} us and "
+          f"{results['info_bytes_per_clip']:.0f} bytes read per clip")
+    print(f"  scrolling:        median {results['scroll_step_median_ms']:.2f} ms, "
+          f"worst {results['scroll_step_max_ms']:.2f} ms per step over {len(times)} steps")
+    print(f"  loaded:           {loaded} of {rows} clips ({results['clips_loaded_fraction']:.0%})")
+
+
+if __name__ == "__main__":
+    main()
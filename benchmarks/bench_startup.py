@@ -0,0 +1,155 @@
+"""Measure GUI startup: process start to window shown, and first paint in process
+
+The cold start runs the GUI in fresh processes, as a user launching the
+helper would, and times from spawning the process to the first paint of the
+main window. The target is STARTUP_TARGET_MS, the disk scan not included: it
+runs in the background with an artificial delay and fills the drive list
+afterwards. The language is stored in the settings file beforehand, as after
+the first launch, so no dialog holds up the window.
+
+The in-process case constructs the window in an interpreter that has already
+imported everything, and times the drive list and a synchronous scan for
+comparison, the scan being what startup used to block on.
+
+    python benchmarks/bench_startup.py [--scan-delay 2] [--runs 5] [--json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "src"))
+
+# Process start to window shown, without the disk scan
+STARTUP_TARGET_MS = 300
+
+
+class PaintWatcher:
+    """Event filter that records the first paint of a widget"""
+
+    def __init__(self, QObject, QEvent):
+        watcher = self
+
+        class Filter(QObject):
+            def eventFilter(self, obj, event):
+                if event.type() == QEvent.Paint and watcher.painted is None:
+                    watcher.painted = time.perf_counter()
+                return False
+
+        self.painted = None
+        self.filter = Filter()
+
+
+def prepare(scan_delay):
+    """Fake REDundead with a slow scan and a fresh settings folder with the language chosen"""
+    os.environ["REDUNDEAD_COMMAND"] = f'"{sys.executable}" "{os.path.join(HERE, "fake_redundead.py")}"'
+    os.environ["FAKE_REDUNDEAD_DELAY"] = str(scan_delay)
+    # Start without a cached device list, as on a first launch
+    os.environ["APPDATA"] = os.environ["XDG_CONFIG_HOME"] = tempfile.mkdtemp()
+    from redundead_core import default_settings
+    default_settings().set("language", "en")
+
+
+def show_window():
+    """Build and show the main window, return (app, window, seconds to first paint)"""
+    from PyQt5.QtCore import QEvent, QObject
+    from PyQt5.QtWidgets import QApplication
+    import redundead_gui
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    watcher = PaintWatcher(QObject, QEvent)
+    start = time.perf_counter()
+    window = redundead_gui.REDundeadGUI()
+    window.installEventFilter(watcher.filter)
+    window.show()
+    while watcher.painted is None:
+        app.processEvents()
+    return app, window, watcher.painted - start
+
+
+def child(spawned):
+    """Body of one cold start process, prints the time since the parent spawned it"""
+    show_window()
+    print(json.dumps({"shown_ms": (time.time() - spawned) * 1000}))
+    # Skip interpreter teardown, the background scan may still be running
+    sys.stdout.flush()
+    os._exit(0)
+
+
+def cold_start(runs):
+    """Process start to window shown, one fresh process per run"""
+    times = []
+    for _ in range(runs):
+        spawned = time.time()
+        result = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", repr(spawned)],
+                                capture_output=True, text=True, check=True)
+        times.append(json.loads(result.stdout.strip().splitlines()[-1])["shown_ms"])
+    return times
+
+
+def core_import():
+    """Time to import the Qt-free core in a fresh process"""
+    code = "import time; start = time.perf_counter(); import redundead_core; print(time.perf_counter() - start)"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                            cwd=os.path.join(HERE, "..", "src"))
+    return float(result.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scan-delay", type=float, default=2.0)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="print results as one JSON object")
+    parser.add_argument("--child", type=float, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.child)
+
+    prepare(args.scan_delay)
+    import redundead_core
+    # In process first, so a missing PyQt5 fails here and the run is recorded as skipped
+    app, window, first_paint = show_window()
+    start = time.perf_counter()
+    while window.drive_list.count() == 0:
+        app.processEvents()
+    populated = first_paint + time.perf_counter() - start
+
+    scan_start = time.perf_counter()
+    redundead_core.get_physical_disks()
+    scan = time.perf_counter() - scan_start
+
+    core = core_import()
+    cold = cold_start(args.runs)
+
+    results = {
+        "cold_start_ms": statistics.median(cold),
+        "cold_start_best_ms": min(cold),
+        "cold_start_target_ms": STARTUP_TARGET_MS,
+        "within_target": statistics.median(cold) <= STARTUP_TARGET_MS,
+        "core_import_ms": core * 1000,
+        "first_paint_ms": first_paint * 1000,
+        "drive_list_ms": populated * 1000,
+        "sync_scan_ms": scan * 1000,
+    }
+    if args.json:
+        print(json.dumps(results))
+        return
+    verdict = "within" if results["within_target"] else "OVER"
+    print(f"cold start, process to window shown: median {results['cold_start_ms']:.1f} ms, "
+          f"best {results['cold_start_best_ms']:.1f} ms over {args.runs} runs "
+          f"({verdict} the {STARTUP_TARGET_MS} ms target)")
+    print(f"import of the core:  {results['core_import_ms']:8.1f} ms")
+    print(f"first paint:         {results['first_paint_ms']:8.1f} ms (in process)")
+    print(f"drive list filled:   {results['drive_list_ms']:8.1f} ms")
+    print(f"synchronous scan:    {results['sync_scan_ms']:8.1f} ms (runs in the background)")
+
+
+if __name__ == "__main__":
+    main()
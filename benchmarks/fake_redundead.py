@@ -0,0 +1,88 @@
+"""Stand-in for the REDundead executable used by the benchmarks
+
+Without arguments it prints a device table, with a device and a folder it
+streams recovery output. Behaviour is controlled by environment variables:
+
+    FAKE_REDUNDEAD_LINES    number of output lines to print (default 1000000)
+    FAKE_REDUNDEAD_STDERR   print every Nth line to stderr instead (default 0, off)
+    FAKE_REDUNDEAD_CLIPS    report a recovered clip every Nth line (default 10000)
+    FAKE_REDUNDEAD_DELAY    seconds to wait before printing the device table (default 0)
+    FAKE_REDUNDEAD_CLIP_SIZE  approximate size of the R3D clip written for each reported clip
+                              (default 0, no files are written)
+    FAKE_REDUNDEAD_RATE     average lines per second (default 0, as fast as the pipe accepts)
+    FAKE_REDUNDEAD_BURST    lines printed back to back before pausing to hold the rate
+                            (default rate / 100, a burst every 10 ms)
+    FAKE_REDUNDEAD_DEVICES  number of rows in the device table (default 3)
+"""
+import os
+import sys
+import time
+
+from synthetic_r3d import clip_frames_for_size, make_clip
+
+
+DEVICE_TABLE = """REDundead - R3D file recovery
+
+Device    Size       Name
+disk0     954 GB     Samsung SSD 970 EVO Plus 1TB
+disk1     1.8 TB     RED MINI-MAG 2TB
+disk2     477 GB     RED MINI-MAG 480GB
+"""
+
+
+def device_table(count):
+    """Device table with count rows, the first three are the fixed ones above"""
+    if count <= 3:
+        return "\n".join(DEVICE_TABLE.splitlines()[:3 + count]) + "\n"
+    rows = [f"disk{i:<6d}{i % 900 + 64} GB     RED MINI-MAG {i % 900 + 64}GB #{i}" for i in range(3, count)]
+    return DEVICE_TABLE + "\n".join(rows) + "\n"
+
+
+def write_clip(path, seed, size):
+    """Write a structurally valid R3D clip of roughly size bytes"""
+    with open(path, "wb") as f:
+        f.write(make_clip(clip_frames_for_size(size), seed=seed))
+
+
+def stream_recovery(device, folder):
+    """Print recovery output lines, as fast as the pipe accepts them or at a set rate"""
+    lines = int(os.environ.get("FAKE_REDUNDEAD_LINES", "1000000"))
+    stderr_every = int(os.environ.get("FAKE_REDUNDEAD_STDERR", "0"))
+    clip_every = int(os.environ.get("FAKE_REDUNDEAD_CLIPS", "10000"))
+    clip_size = int(os.environ.get("FAKE_REDUNDEAD_CLIP_SIZE", "0"))
+    rate = float(os.environ.get("FAKE_REDUNDEAD_RATE", "0"))
+    burst = int(os.environ.get("FAKE_REDUNDEAD_BURST", "0")) or max(1, int(rate / 100))
+    out = sys.stdout
+    err = sys.stderr
+    start = time.perf_counter()
+    for i in range(lines):
+        if rate and i % burst == 0 and i:
+            # Hold the average rate, output arrives in bursts like REDundead's block reads
+            out.flush()
+            delay = start + i / rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        if stderr_every and i % stderr_every == 0:
+            err.write(f"Read error at offset {i * 4096}\n")
+        elif clip_every and i % clip_every == clip_every - 1:
+            name = f"A001_C{i // clip_every:03d}_0101XY_001.R3D"
+            if clip_size:
+                write_clip(os.path.join(folder, name), i, clip_size)
+            out.write(f"Recovered {folder}/{name}\n")
+        else:
+            out.write(f"Scanning {device} offset {i * 4096} -> {folder}\n")
+    out.flush()
+    err.flush()
+
+
+def main():
+    if len(sys.argv) < 3:
+        time.sleep(float(os.environ.get("FAKE_REDUNDEAD_DELAY", "0")))
+        sys.stdout.write(device_table(int(os.environ.get("FAKE_REDUNDEAD_DEVICES", "3"))))
+        return 0
+    stream_recovery(sys.argv[1], sys.argv[2])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""Run every benchmark and write the results as JSON for comparison across commits
+
+Each benchmark runs in its own process with --json, headless (the Qt ones use
+the offscreen platform). Benchmarks that can't run here, for example without
+PyQt5, are recorded as skipped with the reason.
+
+    python benchmarks/run_all.py [--full] [--output results.json] [--compare old.json]
+
+--compare prints every metric next to the value in an earlier results file.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Script and the arguments of the quick run, --full uses each script's defaults
+BENCHMARKS = [
+    ("bench_progress_parser.py", ["--lines", "200000"]),
+    ("bench_device_table.py", ["--repeat", "500"]),
+    ("bench_output_pump.py", ["--lines", "200000", "--legacy-seconds", "2"]),
+    ("bench_recovery_job.py", ["--lines", "200000", "--burst-lines", "100000", "--memory-lines", "500000"]),
+    ("bench_carver.py", ["--size-mb", "256", "--clips", "8"]),
+    ("bench_dedup.py", ["--clips", "500", "--size-mb", "64", "--duplicates", "50", "--partials", "20"]),
+    ("bench_history.py", ["--records", "5000", "--direct-records", "500"]),
+    ("bench_log_render.py", ["--lines", "20000"]),
+    ("bench_startup.py", ["--scan-delay", "0.5"]),
+    ("bench_agent.py", ["--lines", "100000", "--watchers", "5"]),
+    ("bench_hotplug.py", ["--presses", "3"]),
+    ("bench_health.py", ["--samples", "500"]),
+    ("bench_presets.py", ["--lines", "100000", "--repeat", "100"]),
+    ("bench_results_view.py", ["--clips", "1000"]),
+]
+
+
+def commit():
+    """Short hash of the checked out commit, with a marker for local changes"""
+    try:
+        head = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE,
+                              capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=HERE,
+                               capture_output=True, text=True).stdout.strip()
+        return head + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(script, args):
+    """Run one benchmark, return its metrics or a skipped/error record"""
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, os.path.join(HERE, script), "--json", *args],
+                            capture_output=True, text=True, env=env)
+    elapsed = time.perf_counter() - start
+    lines = result.stdout.strip().splitlines()
+    if result.returncode == 0 and lines:
+        try:
+            metrics = json.loads(lines[-1])
+            metrics["wall_s"] = elapsed
+            return metrics
+        except ValueError:
+            pass
+    reason = (result.stderr.strip().splitlines() or ["no output"])[-1]
+    status = "skipped" if "No module named" in reason else "error"
+    return {status: reason}
+
+
+def compare(results, baseline):
+    """Print each metric with its baseline value and the relative change"""
+    for name, metrics in results.items():
+        old = baseline.get(name, {})
+        print(name)
+        for metric, value in metrics.items():
+            if not isinstance(value, (int, float)) or isinstance(value, bool):
+                print(f"  {metric:36s} {value}")
+                continue
+            before = old.get(metric)
+            if isinstance(before, (int, float)) and not isinstance(before, bool) and before:
+                change = (value - before) / abs(before) * 100
+                print(f"  {metric:36s} {value:14.3f}  was {before:14.3f}  {change:+7.1f}%")
+            else:
+                print(f"  {metric:36s} {value:14.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--full", action="store_true", help="use each benchmark's default, longer settings")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", metavar="BASELINE", help="results file of an earlier run to compare with")
+    parser.add_argument("--only", nargs="+", metavar="NAME", help="run only these benchmarks, e.g. carver")
+    args = parser.parse_args()
+
+    results = {}
+    for script, quick_args in BENCHMARKS:
+        name = script[len("bench_"):-len(".py")]
+        if args.only and name not in args.only:
+            continue
+        sys.stderr.write(f"running {name}...\n")
+        results[name] = run_benchmark(script, [] if args.full else quick_args)
+
+    report = {
+        "commit": commit(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "mode": "full" if args.full else "quick",
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f).get("results", {})
+    compare(results, baseline)
+    return 1 if any("error" in metrics for metrics in results.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
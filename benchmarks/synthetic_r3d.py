@@ -0,0 +1,44 @@
+"""Synthetic R3D clips for the benchmarks
+
+The clips follow the atom layout checked by src/r3d.py: a RED2 header atom,
+REDV frame atoms, the RDVO and RDVS frame index and an REOB end atom that
+points at it. The header carries the frame size and rate, each frame its
+timestamp, in the layout read by r3d.read_clip_info. Frame payloads are
+filler bytes.
+"""
+import struct
+
+HEADER_SIZE = 4096
+END_SIZE = 56
+TIMESCALE = 24000
+
+
+def atom(tag, size, fill=b"\0", fields=b""):
+    """One atom of the given total size, fields first and filler after them"""
+    return struct.pack(">I4s", size, tag) + fields + fill[:1] * (size - 8 - len(fields))
+
+
+def make_clip(frames=16, frame_size=64 * 1024, seed=0, fps=24, width=4096, height=2160):
+    """Bytes of a structurally valid clip, starting at timecode 01:00:00:00 plus seed seconds"""
+    fill = bytes([seed % 251 + 1])
+    name = f"A001_C{seed % 1000:03d}_0101XY".encode()
+    header = struct.pack(">BBHII32xIIHHHB", 2, 0, 0, TIMESCALE, 1, width, height, 0, fps * 1000, 1000, 0) + name
+    parts = [atom(b"RED2", HEADER_SIZE, fields=header)]
+    start = (3600 + seed) * TIMESCALE
+    offsets = []
+    for frame in range(frames):
+        offsets.append(HEADER_SIZE + frame * frame_size)
+        timestamp = struct.pack(">II", start + frame * TIMESCALE // fps, frame)
+        parts.append(atom(b"REDV", frame_size, fill, timestamp))
+    index_size = 8 + 4 * frames
+    offsets_at = HEADER_SIZE + frames * frame_size
+    parts.append(atom(b"RDVO", index_size, fields=struct.pack(f">{frames}I", *offsets)))
+    parts.append(atom(b"RDVS", index_size, fields=struct.pack(f">{frames}I", *[frame_size] * frames)))
+    end = struct.pack(">IIIIII", offsets_at, offsets_at + index_size, 0, 0, frames, 0)
+    parts.append(atom(b"REOB", END_SIZE, fields=end))
+    return b"".join(parts)
+
+
+def clip_frames_for_size(size, frame_size=64 * 1024):
+    """Number of frames that makes a clip of roughly size bytes"""
+    return max(1, (size - HEADER_SIZE - END_SIZE) // frame_size)
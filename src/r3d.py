@@ -0,0 +1,179 @@
+"""Minimal R3D container structure checks
+
+An R3D file is a sequence of atoms. Each atom starts with a big-endian
+32-bit size that includes the 8-byte atom header, followed by a four
+character tag. Files begin with a RED1 or RED2 header atom and end with an
+REOB, REOF or REOS atom that points back at the frame index.
+
+The header fields read by read_clip_info follow the RED1 layout as parsed by
+FFmpeg's libavformat/r3d.c. RED2 headers are read with the same layout and
+fields that don't look plausible are left out.
+"""
+import struct
+
+HEADER_TAGS = (b"RED1", b"RED2")
+END_TAGS = (b"REOB", b"REOF", b"REOS")
+KNOWN_TAGS = frozenset(HEADER_TAGS + END_TAGS + (
+    b"REDV",  # Video frame
+    b"REDA",  # Audio chunk
+    b"RDVO",  # Video frame offsets
+    b"RDVS",  # Video frame sizes
+    b"RDAO",  # Audio chunk offsets
+    b"RDAS",  # Audio chunk sizes
+))
+
+ATOM_HEADER = struct.Struct(">I4s")
+
+# Header atom fields from the start of the atom: version, time base, size, frame rate, audio channels
+HEADER_FIELDS = struct.Struct(">BBHII32xIIHHHB")
+HEADER_NAME_SIZE = 257
+# End atom: offsets of the RDVO, RDVS, RDAO and RDAS atoms, video and audio chunk counts
+END_FIELDS = struct.Struct(">IIIIII")
+END_ATOM_SIZE = 56
+# Frame atom: timestamp in the header's time base and frame number
+FRAME_FIELDS = struct.Struct(">II")
+
+# Atoms walked from the header looking for the first video frame
+FIRST_FRAME_SEARCH = 16
+
+STATUS_OK = "ok"
+STATUS_TRUNCATED = "truncated"
+STATUS_CORRUPT = "corrupt"
+
+
+def read_atom_header(f, offset):
+    """Return (size, tag) of the atom at offset, None at end of file"""
+    f.seek(offset)
+    data = f.read(ATOM_HEADER.size)
+    if len(data) < ATOM_HEADER.size:
+        return None
+    return ATOM_HEADER.unpack(data)
+
+
+def check_structure(f, file_size):
+    """Walk the atom chain of an open R3D file, return (status, detail)"""
+    header = read_atom_header(f, 0)
+    if header is None or header[1] not in HEADER_TAGS:
+        return STATUS_CORRUPT, "missing RED header atom"
+
+    offset = 0
+    last_tag = None
+    # Only the 8-byte atom headers are read, frame payloads are skipped
+    while offset < file_size:
+        header = read_atom_header(f, offset)
+        if header is None:
+            return STATUS_TRUNCATED, f"atom header cut off at offset {offset}"
+        size, tag = header
+        if size < ATOM_HEADER.size or tag not in KNOWN_TAGS:
+            return STATUS_CORRUPT, f"invalid atom {tag!r} of size {size} at offset {offset}"
+        if offset + size > file_size:
+            return STATUS_TRUNCATED, f"{tag.decode()} atom at offset {offset} runs past end of file"
+        offset += size
+        last_tag = tag
+
+    if last_tag not in END_TAGS:
+        return STATUS_TRUNCATED, "missing end atom"
+    return STATUS_OK, ""
+
+
+class ClipInfo:
+    """What the header, end and first frame atoms of a clip tell about it"""
+
+    def __init__(self):
+        self.version = None
+        self.width = None
+        self.height = None
+        self.fps = None
+        self.timescale = None
+        self.frames = None  # None without an end atom, in a truncated clip
+        self.start = None  # Timestamp of the first frame in seconds
+        self.name = None  # Clip name stored in the header
+        self.first_frame = None  # (offset, size) of the first REDV atom
+
+    @property
+    def duration(self):
+        """Length in seconds, None if unknown"""
+        if self.frames is None or not self.fps:
+            return None
+        return self.frames / self.fps
+
+    def timecode(self):
+        """Start as HH:MM:SS:FF, None if unknown"""
+        if self.start is None or not self.fps:
+            return None
+        rate = round(self.fps)
+        frames = round(self.start * self.fps)
+        seconds, frame = divmod(frames, rate)
+        minutes, second = divmod(seconds, 60)
+        hours, minute = divmod(minutes, 60)
+        return f"{hours % 24:02d}:{minute:02d}:{second:02d}:{frame:02d}"
+
+
+def _read_header_fields(f, info):
+    f.seek(0)
+    data = f.read(ATOM_HEADER.size + HEADER_FIELDS.size + HEADER_NAME_SIZE)
+    if len(data) < ATOM_HEADER.size + HEADER_FIELDS.size:
+        return
+    fields = HEADER_FIELDS.unpack_from(data, ATOM_HEADER.size)
+    info.version = fields[0]
+    timescale, width, height, rate_num, rate_den = fields[3], fields[5], fields[6], fields[8], fields[9]
+    if timescale:
+        info.timescale = timescale
+    # Cameras record at most 8K and at most a few hundred frames per second
+    if 0 < width <= 16384 and 0 < height <= 16384:
+        info.width, info.height = width, height
+    if rate_num and rate_den and rate_num / rate_den <= 1000:
+        info.fps = rate_num / rate_den
+    name = data[ATOM_HEADER.size + HEADER_FIELDS.size:].split(b"\0", 1)[0]
+    if name:
+        info.name = name.decode("ascii", "replace")
+
+
+def _read_frame_count(f, file_size):
+    """Video frames listed in the frame index the end atom points to, None if there is none"""
+    end = read_atom_header(f, file_size - END_ATOM_SIZE)
+    if end is None or end[1] not in END_TAGS:
+        return None
+    fields = f.read(END_FIELDS.size)
+    if len(fields) < END_FIELDS.size:
+        return None
+    offsets_at = END_FIELDS.unpack(fields)[0]
+    # The frame count is the number of 32-bit entries in the RDVO atom
+    index = read_atom_header(f, offsets_at) if 0 < offsets_at < file_size else None
+    if index is None or index[1] != b"RDVO" or index[0] < ATOM_HEADER.size:
+        return None
+    return (index[0] - ATOM_HEADER.size) // 4
+
+
+def _read_first_frame(f, file_size, info):
+    offset = 0
+    for _ in range(FIRST_FRAME_SEARCH):
+        header = read_atom_header(f, offset)
+        if header is None or header[0] < ATOM_HEADER.size or header[1] not in KNOWN_TAGS:
+            return
+        size, tag = header
+        if tag == b"REDV":
+            info.first_frame = (offset, size)
+            fields = f.read(FRAME_FIELDS.size)
+            if len(fields) == FRAME_FIELDS.size and info.timescale:
+                info.start = FRAME_FIELDS.unpack(fields)[0] / info.timescale
+            return
+        offset += size
+        if offset >= file_size:
+            return
+
+
+def read_clip_info(f, file_size):
+    """Read the clip information of an open R3D file, None if it has no RED header
+
+    Only the start of the header atom, the end atom, the frame index header
+    and the first atom headers are read, a few KB whatever the clip size.
+    """
+    header = read_atom_header(f, 0)
+    if header is None or header[1] not in HEADER_TAGS:
+        return None
+    info = ClipInfo()
+    _read_header_fields(f, info)
+    info.frames = _read_frame_count(f, file_size)
+    _read_first_frame(f, file_size, info)
+    return info
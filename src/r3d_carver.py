@@ -0,0 +1,265 @@
+"""Built-in R3D carving engine
+
+Scans a raw device or disk image for R3D header atoms and copies each clip
+out by walking its atom chain. The device is split into ranges that a
+process pool searches in parallel with bytes.find over large sector-aligned
+windows, so the scan runs close to sequential read speed without NumPy.
+"""
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import r3d
+from redundead_core import RecoveryBackend
+from redundead_devices import windows_disk_length
+from redundead_process import PRIORITIES, apply_priority
+
+SECTOR_SIZE = 4096
+WINDOW_SIZE = 16 * 1024 * 1024
+RANGE_SIZE = 256 * 1024 * 1024
+COPY_BLOCK_SIZE = 8 * 1024 * 1024
+CARVE_WORKERS = os.cpu_count() or 1
+
+# Header atoms larger than this are treated as false positives
+MAX_HEADER_SIZE = 1024 * 1024
+
+# The tag sits 4 bytes into the header atom, after the atom size
+SIGNATURE = b"RED"
+SIGNATURE_VERSIONS = (ord("1"), ord("2"))
+
+
+def device_path(source):
+    """Map a device id such as disk1 or a kernel name such as sdb to a path that can be opened"""
+    match = re.fullmatch(r"disk(\d+)", source)
+    if match and os.name == "nt":
+        return rf"\\.\PhysicalDrive{match.group(1)}"
+    # The sysfs and lsblk fallbacks list Linux drives by kernel name
+    if os.name != "nt" and os.sep not in source and os.path.exists(f"/dev/{source}"):
+        return f"/dev/{source}"
+    return source
+
+
+def device_size(path):
+    """Size in bytes of a device or image file, OSError if it is unknown or empty"""
+    if os.name == "nt" and path.startswith("\\\\.\\"):
+        size = windows_disk_length(path)
+    else:
+        with open(path, "rb", buffering=0) as f:
+            size = f.seek(0, os.SEEK_END)
+    if not size:
+        # An empty scan would look like a card without clips
+        raise OSError(f"Can't read the size of {path}")
+    return size
+
+
+def align_down(offset):
+    return offset - offset % SECTOR_SIZE
+
+
+# Run state shared with the pool workers, set by _init_worker
+_worker_state = None
+_worker_priority = "normal"
+
+
+def _init_worker(running, cancelled, priority):
+    """Hand the pause, cancel and priority controls to a pool worker"""
+    global _worker_state
+    _worker_state = (running, cancelled, priority)
+    _follow_priority()
+
+
+def _follow_priority():
+    """Apply the priority the backend asked for to this worker process"""
+    global _worker_priority
+    level = PRIORITIES[_worker_state[2].value]
+    if level != _worker_priority and apply_priority(os.getpid(), level):
+        _worker_priority = level
+
+
+def _worker_checkpoint():
+    """Wait while paused and pick up priority changes, True once cancelled"""
+    if _worker_state is None:
+        return False
+    running, cancelled, priority = _worker_state
+    running.wait()
+    _follow_priority()
+    return cancelled.is_set()
+
+
+def find_headers(path, start, end):
+    """Offsets of candidate R3D header atoms that start inside [start, end)"""
+    offsets = []
+    # Windows overlap by one sector so a header crossing a boundary is still seen whole
+    buffer = bytearray(WINDOW_SIZE + SECTOR_SIZE)
+    position = align_down(start)
+    with open(path, "rb", buffering=0) as f:
+        while position < end:
+            if _worker_checkpoint():
+                break
+            f.seek(position)
+            count = f.readinto(buffer)
+            if not count:
+                break
+            index = buffer.find(SIGNATURE, 4, count - 1)
+            while index >= 0:
+                header = position + index - 4
+                # Each header is reported by exactly one window and one range
+                if header - position >= WINDOW_SIZE or header >= end:
+                    break
+                if header >= start and buffer[index + 3] in SIGNATURE_VERSIONS:
+                    size = int.from_bytes(buffer[index - 4:index], "big")
+                    if r3d.ATOM_HEADER.size <= size <= MAX_HEADER_SIZE:
+                        offsets.append(header)
+                index = buffer.find(SIGNATURE, index + 1, count - 1)
+            position += WINDOW_SIZE
+    return offsets
+
+
+class BlockReader:
+    """File-like reader that only issues sector-aligned reads, as raw devices require"""
+
+    def __init__(self, f, block_size=1024 * 1024):
+        self.f = f
+        self.block_size = block_size
+        self.block_start = -1
+        self.block = b""
+        self.position = 0
+
+    def seek(self, position):
+        self.position = position
+
+    def read(self, size):
+        """Read size bytes at the current position through a one-block cache"""
+        block_start = self.position - self.position % self.block_size
+        end = self.position + size
+        if block_start != self.block_start or end > block_start + len(self.block):
+            self.f.seek(block_start)
+            length = max(self.block_size, end - block_start)
+            self.block = self.f.read(length + (-length % SECTOR_SIZE))
+            self.block_start = block_start
+        data = self.block[self.position - block_start:end - block_start]
+        self.position += len(data)
+        return data
+
+    def copy_to(self, out, offset, length):
+        """Copy length bytes starting at offset to out with large aligned reads"""
+        buffer = bytearray(COPY_BLOCK_SIZE)
+        view = memoryview(buffer)
+        position = align_down(offset)
+        end = offset + length
+        while position < end:
+            self.f.seek(position)
+            count = self.f.readinto(buffer)
+            if not count:
+                break
+            low = max(offset - position, 0)
+            high = min(end - position, count)
+            out.write(view[low:high])
+            position += count
+
+
+def clip_extent(reader, offset, limit):
+    """Walk the atoms of the clip at offset, return (length, complete)"""
+    position = offset
+    while position < limit:
+        header = r3d.read_atom_header(reader, position)
+        if header is None:
+            break
+        size, tag = header
+        if size < r3d.ATOM_HEADER.size or tag not in r3d.KNOWN_TAGS or position + size > limit:
+            break
+        if position > offset and tag in r3d.HEADER_TAGS:
+            # The next clip starts here
+            break
+        position += size
+        if tag in r3d.END_TAGS:
+            return position - offset, True
+    return position - offset, False
+
+
+class NativeCarverBackend(RecoveryBackend):
+    """Carves R3D clips directly from a device or image without REDundead"""
+    name = "native"
+    supports_resume = True
+
+    def __init__(self, workers=CARVE_WORKERS):
+        self.workers = workers
+        self.cancelled = threading.Event()
+        # Shared with the pool workers, which check them between scan windows
+        self.worker_running = multiprocessing.Event()
+        self.worker_running.set()
+        self.worker_cancelled = multiprocessing.Event()
+        self.priority = multiprocessing.Value("i", 0, lock=False)
+
+    def describe(self, source, output_folder, resume_offset=0):
+        return f'Built-in R3D carver: {device_path(source)} -> "{output_folder}" from offset {resume_offset}'
+
+    def total_bytes(self, source):
+        try:
+            return device_size(device_path(source))
+        except OSError:
+            return None
+
+    def run(self, source, output_folder, on_line, resume_offset=0):
+        """Scan ranges in parallel and carve clips in device order"""
+        path = device_path(source)
+        size = device_size(path)
+        start = align_down(resume_offset)
+        ranges = [(low, min(low + RANGE_SIZE, size)) for low in range(start, size, RANGE_SIZE)]
+        carved_until = 0
+
+        pool = ProcessPoolExecutor(self.workers, initializer=_init_worker,
+                                   initargs=(self.worker_running, self.worker_cancelled, self.priority))
+        with open(path, "rb", buffering=0) as f, pool:
+            reader = BlockReader(f)
+            futures = [pool.submit(find_headers, path, low, high) for low, high in ranges]
+            # Results are taken in range order so the scanned offset is a safe resume point,
+            # while the pool keeps searching the ranges ahead
+            for (low, high), future in zip(ranges, futures):
+                self.worker_running.wait()
+                if self.cancelled.is_set():
+                    pool.shutdown(cancel_futures=True)
+                    return 1
+                for offset in future.result():
+                    if offset < carved_until:
+                        continue
+                    length, complete = clip_extent(reader, offset, size)
+                    header_size = r3d.read_atom_header(reader, offset)[0]
+                    if length <= header_size:
+                        # A lone header atom is a false positive
+                        continue
+                    name = f"clip_{offset:012X}.R3D"
+                    with open(os.path.join(output_folder, name), "wb") as out:
+                        reader.copy_to(out, offset, length)
+                    carved_until = offset + length
+                    state = "" if complete else " (truncated)"
+                    on_line(f"Recovered {name} at offset {offset}, {length} bytes{state}", "stdout")
+                on_line(f"scanned {high}", "stdout")
+        return 0
+
+    def cancel(self):
+        """Stop before the next scan range is carved"""
+        self.cancelled.set()
+        self.worker_cancelled.set()
+        # A paused run has to wake up to notice
+        self.worker_running.set()
+
+    def pause(self):
+        """Hold the workers before their next scan window and the carving before its next range"""
+        if self.cancelled.is_set() or not self.worker_running.is_set():
+            return False
+        self.worker_running.clear()
+        return True
+
+    def resume(self):
+        if self.worker_running.is_set():
+            return False
+        self.worker_running.set()
+        return True
+
+    def set_priority(self, level):
+        """Workers apply the new priority before their next scan window"""
+        self.priority.value = PRIORITIES.index(level)
+        return True
@@ -15,6 +15,8 @@ echo Installing PyQt5...
 pip install PyQt5
 echo Installing pywin32...
 pip install pywin32
+echo Installing xxhash (faster clip verification)...
+pip install xxhash
 echo Installing PyInstaller...
 pip install pyinstaller
 echo [Success] Installation of dependent libraries completed.
@@ -0,0 +1,456 @@
+"""Ingest agent: recoveries on this machine driven over a local HTTP API
+
+The agent runs RecoveryJobs on a RecoveryScheduler, like the CLI, and lets
+other processes list devices, submit and control jobs and follow their
+progress. Every job records its events once, in an EventLog encoded as JSON
+lines. Each watcher streams the log from its own position, so ten watchers
+cost ten socket writes and no extra work for the job. A watcher that can't
+keep up gets several events per write, and one that falls more than
+EVENT_LOG_SIZE events behind skips ahead and is told how many it missed.
+Neither holds the recovery back or grows the agent's memory.
+
+    GET  /devices[?refresh=1]              devices, from the device cache
+    GET  /jobs                             every job and its state
+    POST /jobs                             {"drive", "target", "backend", "verify", "dedup", "image",
+                                            "adaptive", "priority", "subfolder"}, returns the job
+    GET  /jobs/<id>                        one job
+    POST /jobs/<id>/cancel|pause|resume    control a job
+    POST /jobs/<id>/priority               {"priority": "low"}
+    GET  /jobs/<id>/events?since=N         events from N on as a JSON lines stream, until the job ends
+
+Finished jobs stay listed, with their events, until FINISHED_JOBS_KEPT newer
+finished jobs exist. Older ones are dropped when the next job is submitted
+and answer 404 from then on.
+
+Every event holds its sequence number in "seq", so a watcher that lost the
+connection continues with since=seq+1. A blank line is sent as a heartbeat
+while a job is quiet. The agent listens on localhost only unless told
+otherwise, and with a token every request must carry it as a bearer token.
+"""
+import json
+import threading
+import urllib.error
+import urllib.request
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import islice
+from urllib.parse import parse_qs, urlsplit
+
+from redundead_core import (BACKENDS, MAX_CONCURRENT_JOBS, PRIORITIES, DiskCache, RecoveryJob, RecoveryScheduler,
+                            make_backend)
+from redundead_devices import DeviceRegistry
+
+AGENT_HOST = "127.0.0.1"
+AGENT_PORT = 8765
+
+# Events kept per job for watchers that are behind or reconnect
+EVENT_LOG_SIZE = 10000
+# Finished jobs kept with their event logs, the oldest are dropped beyond this
+FINISHED_JOBS_KEPT = 100
+
+# Seconds between heartbeats on a quiet event stream
+HEARTBEAT_INTERVAL = 15.0
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_PAUSED = "paused"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+FINISHED_STATES = (JOB_DONE, JOB_FAILED, JOB_CANCELLED)
+
+
+class AgentError(Exception):
+    """A request the agent refused, with the HTTP status to answer with"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class EventLog:
+    """Bounded, append-only log of one job's events, shared by all its watchers"""
+
+    def __init__(self, size=EVENT_LOG_SIZE):
+        self.events = deque(maxlen=size)  # Encoded JSON lines
+        self.first = 0  # Sequence number of the oldest event kept
+        self.next = 0  # Sequence number of the next event
+        self.closed = False
+        self.condition = threading.Condition()
+
+    def append(self, record):
+        """Number and encode an event once, for every watcher"""
+        with self.condition:
+            if self.closed:
+                return
+            record["seq"] = self.next
+            if len(self.events) == self.events.maxlen:
+                self.first += 1
+            self.events.append((json.dumps(record) + "\n").encode("utf-8"))
+            self.next += 1
+            self.condition.notify_all()
+
+    def close(self):
+        """No more events, streams end once they have sent the rest"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    def read(self, since, timeout):
+        """Events from since on, waiting up to timeout for one
+
+        Returns (encoded events, position to read from next, events missed
+        because they were dropped, True once the log is closed and read).
+        """
+        with self.condition:
+            if since >= self.next and not self.closed:
+                self.condition.wait(timeout)
+            missed = max(self.first - since, 0)
+            start = max(since, self.first)
+            events = list(islice(self.events, start - self.first, None))
+            return events, self.next, missed, self.closed and not events and since >= self.next
+
+
+class AgentJob:
+    """A RecoveryJob submitted to the agent, its state and its event log"""
+
+    def __init__(self, job_id, job):
+        self.id = job_id
+        self.job = job
+        self.drive = job.source_drive
+        self.state = JOB_QUEUED
+        self.progress = 0
+        self.mb_per_second = 0.0
+        self.eta_seconds = -1
+        self.clips = 0
+        self.message = ""
+        self.events = EventLog()
+        job.on_progress = self.on_progress
+        job.on_throughput = self.on_throughput
+        job.on_clips = self.on_clips
+        job.on_log = lambda message: self.emit("log", lines=message.split("\n"))
+        job.on_complete = self.on_complete
+
+    @property
+    def target_path(self):
+        # Read by the scheduler, which throttles jobs per target disk
+        return self.job.target_path
+
+    def run(self):
+        self.set_state(JOB_RUNNING)
+        self.job.run()
+
+    def cancel(self):
+        self.job.cancel()
+
+    def emit(self, event, **fields):
+        record = {"event": event, "job": self.id, "drive": self.drive}
+        record.update(fields)
+        self.events.append(record)
+
+    def set_state(self, state):
+        self.state = state
+        self.emit("state", state=state)
+
+    def on_progress(self, percent):
+        self.progress = percent
+        self.emit("progress", percent=percent)
+
+    def on_throughput(self, speed, eta):
+        self.mb_per_second = round(speed, 2)
+        self.eta_seconds = eta
+        self.emit("throughput", mb_per_second=self.mb_per_second, eta_seconds=eta)
+
+    def on_clips(self, clips):
+        self.clips = clips
+        self.emit("clips", clips=clips)
+
+    def on_complete(self, success, message):
+        self.message = message
+        state = JOB_DONE if success else JOB_CANCELLED if self.job.cancelled else JOB_FAILED
+        self.set_state(state)
+        self.emit("complete", success=success, message=message)
+        self.events.close()
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "drive": self.drive,
+            "target": self.job.target_path,
+            "folder": self.job.recovery_folder,
+            "backend": self.job.backend.name,
+            "state": self.state,
+            "progress": self.progress,
+            "mb_per_second": self.mb_per_second,
+            "eta_seconds": self.eta_seconds,
+            "clips": self.clips,
+            "message": self.message,
+            "events": self.events.next,
+        }
+
+
+class Agent:
+    """Devices and recovery jobs of this machine, independent of any connection"""
+
+    def __init__(self, max_jobs=MAX_CONCURRENT_JOBS, history=None, finished_kept=FINISHED_JOBS_KEPT):
+        self.scheduler = RecoveryScheduler(max_jobs)
+        self.finished_kept = finished_kept
+        self.history = history
+        self.disk_cache = DiskCache()
+        self.devices = DeviceRegistry()
+        self.devices.update(self.disk_cache.last_good)
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self.count = 0
+
+    def list_devices(self, refresh=False):
+        """Devices as dicts, concurrent requests share one scan"""
+        disks = self.disk_cache.get(force=refresh)
+        self.devices.update(disks)
+        return [disk.to_dict() for disk in disks]
+
+    def submit(self, drive, target, backend="redundead", verify=True, dedup=True, image=False,
+               priority="normal", subfolder=None, adaptive=True):
+        """Queue a recovery of drive into target, return the AgentJob"""
+        if not drive or not target:
+            raise AgentError("drive and target are required")
+        if backend not in BACKENDS:
+            raise AgentError(f"Unknown backend: {backend}")
+        if priority not in PRIORITIES:
+            raise AgentError(f"Unknown priority: {priority}")
+        if self.devices.overlaps([drive], target):
+            raise AgentError(f"{target} is on {drive}, the target must not be on a drive that is recovered")
+        job = RecoveryJob(drive, target, self.devices.size(drive), subfolder=subfolder, verify=verify,
+                          backend=make_backend(backend), image=image, priority=priority,
+                          history=self.history, device=self.devices.get(drive), dedup=dedup, adaptive=adaptive)
+        job.throttle = self.scheduler.throttle
+        job.unthrottle = self.scheduler.unthrottle
+        with self.lock:
+            self._drop_finished()
+            self.count += 1
+            agent_job = AgentJob(f"job{self.count}", job)
+            self.jobs[agent_job.id] = agent_job
+        agent_job.emit("state", state=JOB_QUEUED)
+        self.scheduler.submit(agent_job)
+        return agent_job
+
+    def _drop_finished(self):
+        """Forget the oldest finished jobs beyond finished_kept, call with the lock held"""
+        finished = [job_id for job_id, job in self.jobs.items() if job.state in FINISHED_STATES]
+        for job_id in finished[:max(len(finished) - self.finished_kept, 0)]:
+            del self.jobs[job_id]
+
+    def list_jobs(self):
+        with self.lock:
+            return list(self.jobs.values())
+
+    def get(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None:
+            raise AgentError(f"No job {job_id}", 404)
+        return job
+
+    def cancel(self, job_id):
+        """Cancel a job, a queued one is finished right away"""
+        job = self.get(job_id)
+        if self.scheduler.discard(job):
+            job.job.cancelled = True
+            job.on_complete(False, "Recovery cancelled")
+        elif job.state not in FINISHED_STATES:
+            job.cancel()
+        return job
+
+    def pause(self, job_id):
+        job = self.get(job_id)
+        if job.job.pause():
+            job.set_state(JOB_PAUSED)
+        return job
+
+    def resume(self, job_id):
+        job = self.get(job_id)
+        if job.job.resume():
+            job.set_state(JOB_RUNNING)
+        return job
+
+    def set_priority(self, job_id, level):
+        if level not in PRIORITIES:
+            raise AgentError(f"Unknown priority: {level}")
+        job = self.get(job_id)
+        job.job.set_priority(level)
+        return job
+
+    def shutdown(self, timeout=None):
+        """Cancel every job and wait for them to stop"""
+        for job in self.scheduler.cancel():
+            job.job.cancelled = True
+            job.on_complete(False, "Recovery cancelled")
+        return self.scheduler.wait(timeout)
+
+
+class AgentHandler(BaseHTTPRequestHandler):
+    """Maps the HTTP API to the Agent of the server"""
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def agent(self):
+        return self.server.agent
+
+    def log_message(self, format, *args):
+        # Requests are not logged, event streams would flood the console
+        pass
+
+    def send_json(self, value, status=200):
+        body = json.dumps(value).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        try:
+            value = json.loads(self.rfile.read(length))
+        except ValueError:
+            raise AgentError("Request body is not JSON")
+        if not isinstance(value, dict):
+            raise AgentError("Request body must be a JSON object")
+        return value
+
+    def handle_request(self, method):
+        url = urlsplit(self.path)
+        parts = [part for part in url.path.split("/") if part]
+        query = parse_qs(url.query)
+        try:
+            if self.server.token and self.headers.get("Authorization") != f"Bearer {self.server.token}":
+                raise AgentError("Missing or wrong token", 401)
+            if method == "GET" and parts == ["devices"]:
+                return self.send_json(self.agent.list_devices(query.get("refresh") == ["1"]))
+            if method == "GET" and parts == ["jobs"]:
+                return self.send_json([job.to_dict() for job in self.agent.list_jobs()])
+            if method == "POST" and parts == ["jobs"]:
+                options = self.read_json()
+                return self.send_json(self.agent.submit(**options).to_dict(), 201)
+            if len(parts) == 2 and parts[0] == "jobs" and method == "GET":
+                return self.send_json(self.agent.get(parts[1]).to_dict())
+            if len(parts) == 3 and parts[0] == "jobs":
+                job_id, action = parts[1], parts[2]
+                if method == "GET" and action == "events":
+                    since = int(query.get("since", ["0"])[0])
+                    return self.stream_events(self.agent.get(job_id), since)
+                if method == "POST" and action in ("cancel", "pause", "resume"):
+                    return self.send_json(getattr(self.agent, action)(job_id).to_dict())
+                if method == "POST" and action == "priority":
+                    level = self.read_json().get("priority")
+                    return self.send_json(self.agent.set_priority(job_id, level).to_dict())
+            raise AgentError(f"No such resource: {method} {url.path}", 404)
+        except AgentError as e:
+            self.send_json({"error": str(e)}, e.status)
+        except (TypeError, ValueError) as e:
+            # Unknown or malformed options
+            self.send_json({"error": str(e)}, 400)
+
+    def do_GET(self):
+        self.handle_request("GET")
+
+    def do_POST(self):
+        self.handle_request("POST")
+
+    def write_chunk(self, data):
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def stream_events(self, job, since):
+        """Send the job's events as chunked JSON lines until the job has ended"""
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            while True:
+                events, since, missed, ended = job.events.read(since, HEARTBEAT_INTERVAL)
+                if ended:
+                    break
+                if missed:
+                    gap = {"event": "gap", "job": job.id, "missed": missed}
+                    events.insert(0, (json.dumps(gap) + "\n").encode("utf-8"))
+                # Everything that piled up while the last write was under way goes out as one chunk
+                self.write_chunk(b"".join(events) if events else b"\n")
+            self.write_chunk(b"")
+        except (ConnectionError, OSError):
+            # The watcher went away, the job carries on
+            self.close_connection = True
+
+
+class AgentServer(ThreadingHTTPServer):
+    """HTTP server with one thread per connection in front of an Agent"""
+    daemon_threads = True
+
+    def __init__(self, agent, host=AGENT_HOST, port=AGENT_PORT, token=None):
+        super().__init__((host, port), AgentHandler)
+        self.agent = agent
+        self.token = token
+
+
+class AgentClient:
+    """Client of a local or remote agent"""
+
+    def __init__(self, url=f"http://{AGENT_HOST}:{AGENT_PORT}", token=None, timeout=30.0):
+        self.url = url.rstrip("/")
+        self.token = token
+        self.timeout = timeout
+
+    def _open(self, method, path, body=None, timeout=None):
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        request = urllib.request.Request(self.url + path, data=data, method=method)
+        if data is not None:
+            request.add_header("Content-Type", "application/json")
+        if self.token:
+            request.add_header("Authorization", f"Bearer {self.token}")
+        try:
+            return urllib.request.urlopen(request, timeout=timeout or self.timeout)
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read()).get("error", e.reason)
+            except ValueError:
+                message = e.reason
+            raise AgentError(message, e.code) from None
+
+    def _call(self, method, path, body=None):
+        with self._open(method, path, body) as response:
+            return json.loads(response.read())
+
+    def devices(self, refresh=False):
+        return self._call("GET", "/devices?refresh=1" if refresh else "/devices")
+
+    def jobs(self):
+        return self._call("GET", "/jobs")
+
+    def job(self, job_id):
+        return self._call("GET", f"/jobs/{job_id}")
+
+    def submit(self, drive, target, **options):
+        """Queue a recovery, options as accepted by Agent.submit, return the job"""
+        return self._call("POST", "/jobs", dict(options, drive=drive, target=target))
+
+    def cancel(self, job_id):
+        return self._call("POST", f"/jobs/{job_id}/cancel")
+
+    def pause(self, job_id):
+        return self._call("POST", f"/jobs/{job_id}/pause")
+
+    def resume(self, job_id):
+        return self._call("POST", f"/jobs/{job_id}/resume")
+
+    def set_priority(self, job_id, level):
+        return self._call("POST", f"/jobs/{job_id}/priority", {"priority": level})
+
+    def events(self, job_id, since=0):
+        """Yield the events of a job as dicts as they happen, until the job has ended"""
+        # Heartbeats arrive well within the timeout while the job is quiet
+        with self._open("GET", f"/jobs/{job_id}/events?since={since}", timeout=HEARTBEAT_INTERVAL * 4) as response:
+            for line in response:
+                if line.strip():
+                    yield json.loads(line)
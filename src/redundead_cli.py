@@ -0,0 +1,608 @@
+"""Command line entry point for REDundead-Helper
+
+Runs the same recovery core as the GUI without importing PyQt5 or pywin32,
+so it can be scripted on ingest stations or used over SSH.
+
+    python redundead_cli.py list [--json] [--watch]
+    python redundead_cli.py recover disk1 D:\\Recovery [--json] [--preset NAME]
+    python redundead_cli.py batch --jobs 2 D:\\Recovery disk1 disk2 [--json] [--preset NAME]
+    python redundead_cli.py watch --preset NAME [--json]
+    python redundead_cli.py preset save NAME --target D:\\Recovery [--folder {date}_{serial}] [--auto-start]
+    python redundead_cli.py preset list | delete NAME
+    python redundead_cli.py history [--serial S | --clip NAME | --trends model] [--json]
+    python redundead_cli.py dedup D:\\Recovery\\RecoveryFolder [--link | --delete] [--json]
+    python redundead_cli.py agent [--host 127.0.0.1] [--port 8765] [--token T] [--jobs 2]
+
+With --json every event is written to stdout as one JSON object per line.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+
+from redundead_core import (BACKENDS, MAX_CONCURRENT_JOBS, MAX_JOBS_PER_TARGET, PRIORITIES, DiskCache, RecoveryJob,
+                            RecoveryScheduler, default_history, default_settings, get_physical_disks, is_admin,
+                            job_folders, make_backend)
+from redundead_devices import DeviceRegistry
+from redundead_hotplug import HotplugWatcher
+from redundead_settings import FOLDER_FIELDS, VERBOSITY_LEVELS
+from redundead_space import format_bytes, preflight
+from redundead_trace import tracer
+
+
+class EventPrinter:
+    """Writes job events to stdout, as JSON lines or as plain log text"""
+    
+    def __init__(self, as_json):
+        self.as_json = as_json
+        self.lock = threading.Lock()
+        self.results = {}
+    
+    def attach(self, job):
+        """Route the callbacks of a job to this printer"""
+        drive = job.source_drive
+        job.on_progress = lambda percent: self.emit(drive, "progress", percent=percent)
+        job.on_throughput = lambda speed, eta: self.emit(
+            drive, "throughput", mb_per_second=round(speed, 2), eta_seconds=eta
+        )
+        job.on_clips = lambda clips: self.emit(drive, "clips", clips=clips)
+        job.on_log = lambda message: self.emit(drive, "log", lines=message.split("\n"))
+        job.on_complete = lambda success, message: self.complete(drive, success, message)
+    
+    def emit(self, drive, event, **fields):
+        """Print one event, plain mode only shows log lines and results"""
+        with self.lock:
+            if self.as_json:
+                record = {"event": event, "drive": drive}
+                record.update(fields)
+                sys.stdout.write(json.dumps(record) + "\n")
+            elif event == "log":
+                sys.stdout.write("\n".join(fields["lines"]) + "\n")
+            elif event == "complete":
+                state = "OK" if fields["success"] else "FAILED"
+                sys.stdout.write(f"{drive}: {state} - {fields['message']}\n")
+            else:
+                return
+            sys.stdout.flush()
+    
+    def complete(self, drive, success, message):
+        """Record the outcome of a job"""
+        self.results[drive] = success
+        self.emit(drive, "complete", success=success, message=message)
+
+
+def print_drives(disks, as_json):
+    """Write a device list to stdout"""
+    if as_json:
+        sys.stdout.write(json.dumps([disk.to_dict() for disk in disks]) + "\n")
+    else:
+        for disk in disks:
+            sys.stdout.write(f"{disk.id} - {disk.description}\n")
+    sys.stdout.flush()
+
+
+def list_drives(args):
+    """Print the devices REDundead can see, with --watch again after every change"""
+    if not args.watch:
+        disks = get_physical_disks()
+        print_drives(disks, args.json)
+        return 0 if disks else 1
+    
+    cache = DiskCache()
+    print_drives(cache.get(force=True), args.json)
+    
+    def changed(names):
+        disks, changed = cache.update(names)
+        if changed:
+            if not args.json:
+                sys.stdout.write("\n")
+            print_drives(disks, args.json)
+    
+    watcher = HotplugWatcher(changed)
+    watcher.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        watcher.stop()
+    return 0
+
+
+def apply_preset(args):
+    """Fill in what the command line left open from args.preset, False if it can't be used"""
+    preset = {}
+    if args.preset:
+        try:
+            preset = default_settings().preset(args.preset)
+        except (KeyError, ValueError) as e:
+            sys.stderr.write(f"{e.args[0]}\n")
+            return False
+    if args.target is None:
+        args.target = preset.get("target")
+        if not args.target:
+            sys.stderr.write("No target folder given, and no preset with one.\n")
+            return False
+    if args.jobs is None:
+        args.jobs = preset.get("jobs") or MAX_CONCURRENT_JOBS
+    args.folder = preset.get("folder")
+    args.no_verify = args.no_verify or not preset.get("verify", True)
+    args.verbosity = args.verbosity or preset.get("verbosity", "full")
+    return True
+
+
+def make_job(drive, target, devices, history, args, multiple):
+    """RecoveryJob for one drive with the options of the command line"""
+    folder, subfolder = job_folders(args.folder, drive, devices.get(drive), multiple)
+    return RecoveryJob(
+        drive,
+        target,
+        devices.size(drive),
+        subfolder=subfolder,
+        log_prefix=f"[{drive}] " if multiple and not args.json else "",
+        verify=not args.no_verify,
+        backend=make_backend(args.backend),
+        image=args.image,
+        priority=args.priority,
+        history=history,
+        device=devices.get(drive),
+        dedup=not args.no_dedup,
+        adaptive=not args.no_adaptive,
+        folder=folder,
+        verbosity=args.verbosity
+    )
+
+
+def run_jobs(drives, target, args):
+    """Recover every drive into target, at most args.jobs at a time"""
+    if not is_admin():
+        sys.stderr.write("REDundead requires administrator privileges to run.\n")
+        return 2
+    
+    # One device scan gives the sizes used for percent and ETA
+    devices = DeviceRegistry()
+    if not args.no_scan:
+        devices.update(get_physical_disks())
+        if devices.overlaps(drives, target):
+            sys.stderr.write(f"{target} is on {devices.device_for_path(target).id}, "
+                             f"the target must not be on a drive that is recovered.\n")
+            return 2
+    
+    history = None if args.no_history else default_history(lambda message: sys.stderr.write(message + "\n"))
+    if history:
+        drives = check_history(history, devices, drives, args.skip_recovered)
+        if not drives:
+            return 0
+    
+    needed, free = preflight(target, [devices.size(drive) for drive in drives], args.image)
+    if needed > free:
+        sys.stderr.write(
+            f"Warning: {target} has {format_bytes(free)} free, the recovery may write up to "
+            f"{format_bytes(needed)}. It stops before the disk is full and can be resumed.\n"
+        )
+    
+    printer = EventPrinter(args.json)
+    scheduler = RecoveryScheduler(args.jobs, args.jobs_per_target)
+    multiple = len(drives) > 1
+    for drive in drives:
+        job = make_job(drive, target, devices, history, args, multiple)
+        job.throttle = scheduler.throttle
+        job.unthrottle = scheduler.unthrottle
+        printer.attach(job)
+        scheduler.submit(job)
+    try:
+        scheduler.wait()
+    except KeyboardInterrupt:
+        # REDundead runs in its own process group and doesn't see Ctrl+C, stop it here
+        sys.stderr.write("Cancelling, the recovery can be resumed by running the same command again.\n")
+        scheduler.cancel()
+        scheduler.wait()
+        return 130
+    finally:
+        if history:
+            history.close()
+    
+    return 0 if all(printer.results.get(drive) for drive in drives) else 1
+
+
+def format_time(timestamp):
+    return time.strftime("%Y-%m-%d %H:%M", time.localtime(timestamp)) if timestamp else "-"
+
+
+def check_history(history, devices, drives, skip_recovered):
+    """Report drives recovered before, leave them out with skip_recovered
+
+    Only a serial number match counts as recovered, a drive without one is
+    never left out.
+    """
+    remaining = []
+    for drive in drives:
+        run = history.last_recovery(devices.get(drive))
+        if run:
+            action = "skipping it" if skip_recovered else "recovering it again"
+            sys.stderr.write(f"{drive} was already recovered on {format_time(run['started'])} "
+                             f"into {run['target']}, {action}.\n")
+            if skip_recovered:
+                continue
+        else:
+            run = history.similar_recovery(devices.get(drive))
+            if run:
+                sys.stderr.write(f"{drive} has no serial number, a drive of the same model and size was recovered "
+                                 f"on {format_time(run['started'])} into {run['target']}. It may be the same "
+                                 f"card, recovering it.\n")
+        remaining.append(drive)
+    return remaining
+
+
+def show_history(args):
+    """Print earlier runs, the recoveries of a clip, or throughput per reader model or day"""
+    history = default_history(lambda message: sys.stderr.write(message + "\n"))
+    if not history:
+        return 1
+    try:
+        if args.clip:
+            rows = history.find_clip(args.clip)
+            lines = [f"{format_time(row['recorded'])}  {row['device_id']}  {row['status']:10s} "
+                     f"{row['size']:>14d}  {row['hash'] or '-'}  {row['path']}" for row in rows]
+        elif args.trends:
+            rows = history.throughput(args.trends)
+            lines = [f"{row['grouping'] or '-':30s} {row['backend']:10s} {row['runs']:5d} runs  "
+                     f"{row['mb_per_second'] or 0:8.1f} MB/s  {row['clips']:6d} clips" for row in rows]
+        elif args.health:
+            rows = history.health_events(args.health)
+            lines = [f"{format_time(row['time'])}  {row['state']:8s} {row['mb_per_second'] or 0:8.1f} MB/s  p95 "
+                     + (f"{row['tail_latency_ms']:8.1f} ms" if row['tail_latency_ms'] is not None else "       - ms")
+                     + f"  {row['in_flight'] or 0:3d} in flight  {row['decision'] or '-'}" for row in rows]
+        elif args.run:
+            rows = history.clips(args.run)
+            lines = [f"{row['name']}  {row['status']:10s} {row['size']:>14d}  {row['hash'] or '-'}" for row in rows]
+        else:
+            if args.serial:
+                rows = history.runs_for_device(args.serial, limit=args.limit)
+            else:
+                rows = history.recent_runs(args.limit)
+            lines = [f"{format_time(row['started'])}  {row['run_id'][:12]}  {row['device_id']:8s} "
+                     f"{row['model'] or '-':24s} {row['status']:10s} {row['clips']:5d} clips  "
+                     f"{row['mb_per_second'] or 0:8.1f} MB/s  {row['target']}" for row in rows]
+    finally:
+        history.close()
+    if args.json:
+        sys.stdout.write(json.dumps(rows) + "\n")
+    elif lines:
+        sys.stdout.write("\n".join(lines) + "\n")
+    return 0
+
+
+def dedup(args):
+    """Report duplicate and partial clips of a folder, link or delete the duplicates"""
+    from redundead_dedup import deduplicate
+    action = "link" if args.link else "delete" if args.delete else "report"
+    result = deduplicate(args.folder, action, lambda message: sys.stderr.write(message + "\n"))
+    if args.json:
+        sys.stdout.write(json.dumps({"clips": result.clips, "bytes_saved": result.bytes_saved,
+                                     "already_linked": result.already_linked, "rows": result.rows()}) + "\n")
+    else:
+        for row in result.rows():
+            verb = "duplicate of" if row["kind"] == "duplicate" else "partial copy of"
+            action = f" ({row['action']})" if row["action"] else ""
+            sys.stdout.write(f"{row['path']}: {verb} {row['original']}{action}\n")
+        sys.stdout.write(result.summary() + "\n")
+    return 1 if result.errors else 0
+
+
+def serve_agent(args):
+    """Run the ingest agent until Ctrl+C"""
+    # Imported on demand, only the agent needs the HTTP server
+    from redundead_agent import AGENT_HOST, AGENT_PORT, Agent, AgentServer
+    if not is_admin():
+        sys.stderr.write("REDundead requires administrator privileges to run.\n")
+        return 2
+    host = args.host or AGENT_HOST
+    if host not in ("127.0.0.1", "localhost", "::1") and not args.token:
+        sys.stderr.write("Warning: the agent accepts jobs from the network without a token.\n")
+    history = None if args.no_history else default_history(lambda message: sys.stderr.write(message + "\n"))
+    agent = Agent(args.jobs, history)
+    server = AgentServer(agent, host, args.port or AGENT_PORT, args.token)
+    host, port = server.server_address[:2]
+    sys.stderr.write(f"Agent listening on http://{host}:{port}\n")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        sys.stderr.write("Stopping, running recoveries are cancelled and can be resumed.\n")
+        agent.shutdown()
+    finally:
+        server.server_close()
+        if history:
+            history.close()
+    return 0
+
+
+def watch(args):
+    """Recover every drive inserted from now on into the preset's target, until Ctrl+C"""
+    if not is_admin():
+        sys.stderr.write("REDundead requires administrator privileges to run.\n")
+        return 2
+    target = args.target
+    history = None if args.no_history else default_history(lambda message: sys.stderr.write(message + "\n"))
+    printer = EventPrinter(args.json)
+    scheduler = RecoveryScheduler(args.jobs, args.jobs_per_target)
+    cache = DiskCache()
+    devices = DeviceRegistry(cache.get(force=True))
+    known = {disk.id for disk in devices}
+    running = set()
+    lock = threading.Lock()
+    
+    def finished(drive, success, message):
+        with lock:
+            running.discard(drive)
+        printer.complete(drive, success, message)
+    
+    def start(drive):
+        """Queue the recovery of an inserted drive, call with the lock held"""
+        if drive in running:
+            return
+        if devices.overlaps([drive], target):
+            sys.stderr.write(f"{drive} holds the target {target}, not recovering it.\n")
+            return
+        if history and not check_history(history, devices, [drive], args.skip_recovered):
+            return
+        needed, free = preflight(target, [devices.size(drive)], args.image)
+        if needed > free:
+            sys.stderr.write(f"Warning: {target} has {format_bytes(free)} free, recovering {drive} may write "
+                             f"up to {format_bytes(needed)}. It stops before the disk is full.\n")
+        # Drives inserted one after another may run at the same time, each gets a folder of its own
+        job = make_job(drive, target, devices, history, args, True)
+        job.throttle = scheduler.throttle
+        job.unthrottle = scheduler.unthrottle
+        printer.attach(job)
+        job.on_complete = lambda success, message: finished(drive, success, message)
+        running.add(drive)
+        sys.stderr.write(f"{drive} inserted, recovering it into {job.recovery_folder}\n")
+        scheduler.submit(job)
+    
+    def changed(names):
+        disks, _ = cache.update(names)
+        with lock:
+            devices.update(disks)
+            for disk in disks:
+                if disk.id not in known:
+                    start(disk.id)
+            known.clear()
+            known.update(disk.id for disk in disks)
+    
+    watcher = HotplugWatcher(changed)
+    watcher.start()
+    sys.stderr.write(f"Recovering drives inserted from now on into {target}, press Ctrl+C to stop.\n")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        watcher.stop()
+        if not running:
+            return 0
+        sys.stderr.write("Cancelling, the recoveries can be resumed with the recover command.\n")
+        scheduler.cancel()
+        scheduler.wait()
+        return 130
+    finally:
+        if history:
+            history.close()
+
+
+def list_presets(args):
+    """Print the saved presets"""
+    settings = default_settings()
+    presets = {}
+    for name in settings.presets():
+        try:
+            presets[name] = settings.preset(name)
+        except ValueError as e:
+            sys.stderr.write(f"{e.args[0]}\n")
+    if args.json:
+        sys.stdout.write(json.dumps(presets) + "\n")
+        return 0
+    for name, preset in presets.items():
+        details = [f"target {preset['target'] or '-'}", f"folder {preset['folder'] or 'RecoveryFolder'}",
+                   f"{preset['jobs'] or MAX_CONCURRENT_JOBS} at once", "verify" if preset["verify"] else "no verify",
+                   f"{preset['verbosity']} log"]
+        if preset["auto_start"]:
+            details.append("auto-start")
+        sys.stdout.write(f"{name}: {', '.join(details)}\n")
+    return 0
+
+
+def save_preset(args):
+    """Add or replace a preset"""
+    values = {
+        "target": os.path.abspath(args.target) if args.target else None,
+        "folder": args.folder,
+        "jobs": args.jobs,
+        "verify": not args.no_verify,
+        "verbosity": args.verbosity,
+        "auto_start": args.auto_start,
+    }
+    try:
+        saved = default_settings().save_preset(args.name, values)
+    except ValueError as e:
+        sys.stderr.write(f"{e.args[0]}\n")
+        return 2
+    if not saved:
+        sys.stderr.write("The settings file could not be written.\n")
+        return 1
+    return 0
+
+
+def delete_preset(args):
+    """Remove a preset"""
+    try:
+        default_settings().delete_preset(args.name)
+    except KeyError as e:
+        sys.stderr.write(f"{e.args[0]}\n")
+        return 1
+    return 0
+
+
+def recover(args):
+    """Recover a single drive"""
+    if not apply_preset(args):
+        return 2
+    return run_jobs([args.drive], args.target, args)
+
+
+def batch(args):
+    """Recover several drives in parallel"""
+    if not apply_preset(args):
+        return 2
+    return run_jobs(args.drives, args.target, args)
+
+
+def watch_drives(args):
+    """Recover inserted drives with a preset"""
+    if not apply_preset(args):
+        return 2
+    return watch(args)
+
+
+def build_parser():
+    """Build the argument parser with list, recover and batch subcommands"""
+    parser = argparse.ArgumentParser(
+        prog="redundead-helper",
+        description="Recover R3D files with REDundead from the command line."
+    )
+    parser.add_argument("--trace", metavar="PATH",
+                        help="write a Chrome trace of the run to PATH (also REDUNDEAD_TRACE)")
+    parser.add_argument("--profile", action="store_true",
+                        help="also write cProfile and tracemalloc results next to the trace "
+                             "(also REDUNDEAD_PROFILE=1)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    list_parser = commands.add_parser("list", help="list devices")
+    list_parser.add_argument("--json", action="store_true", help="print devices as JSON")
+    list_parser.add_argument("--watch", action="store_true",
+                             help="keep running and print the list again when a drive is inserted or removed")
+    list_parser.set_defaults(func=list_drives)
+    
+    history_parser = commands.add_parser("history", help="show earlier recoveries")
+    history_filter = history_parser.add_mutually_exclusive_group()
+    history_filter.add_argument("--serial", help="runs of the drive with this serial number")
+    history_filter.add_argument("--run", metavar="RUN_ID", help="clips recovered by one run")
+    history_filter.add_argument("--health", metavar="RUN_ID",
+                                help="read health changes of one run and the decisions taken")
+    history_filter.add_argument("--clip", metavar="NAME", help="every recovery of a clip, e.g. A001_C002_0101XY_001.R3D")
+    history_filter.add_argument("--trends", choices=("model", "day"),
+                                help="average scan speed of finished runs per reader model or per day")
+    history_parser.add_argument("--limit", type=int, default=20, help="number of runs shown")
+    history_parser.add_argument("--json", action="store_true", help="print rows as JSON")
+    history_parser.set_defaults(func=show_history)
+    
+    dedup_parser = commands.add_parser("dedup", help="find duplicate and partial clips in a folder")
+    dedup_parser.add_argument("folder", help="folder with recovered clips, usually RecoveryFolder")
+    dedup_action = dedup_parser.add_mutually_exclusive_group()
+    dedup_action.add_argument("--link", action="store_true",
+                              help="replace duplicates by hard links to the oldest copy")
+    dedup_action.add_argument("--delete", action="store_true", help="delete duplicates, keeping the oldest copy")
+    dedup_parser.add_argument("--json", action="store_true", help="print the result as JSON")
+    dedup_parser.set_defaults(func=dedup)
+    
+    agent_parser = commands.add_parser("agent", help="serve an HTTP API for recoveries on this machine")
+    agent_parser.add_argument("--host", help="address to listen on, 127.0.0.1 by default")
+    agent_parser.add_argument("--port", type=int, help="port to listen on, 8765 by default")
+    agent_parser.add_argument("--token", default=os.environ.get("REDUNDEAD_AGENT_TOKEN"),
+                              help="require this bearer token on every request (also REDUNDEAD_AGENT_TOKEN)")
+    agent_parser.add_argument("--jobs", type=int, default=MAX_CONCURRENT_JOBS,
+                              help="number of drives recovered at once")
+    agent_parser.add_argument("--no-history", action="store_true",
+                              help="don't record the agent's runs in the recovery history")
+    agent_parser.set_defaults(func=serve_agent)
+    
+    preset_parser = commands.add_parser("preset", help="save, list or delete recovery presets")
+    preset_commands = preset_parser.add_subparsers(dest="preset_command", required=True)
+    preset_list = preset_commands.add_parser("list", help="list the saved presets")
+    preset_list.add_argument("--json", action="store_true", help="print presets as JSON")
+    preset_list.set_defaults(func=list_presets)
+    preset_save = preset_commands.add_parser("save", help="add or replace a preset")
+    preset_save.add_argument("name")
+    preset_save.add_argument("--target", help="folder that receives the recovery folders")
+    preset_save.add_argument("--folder", metavar="TEMPLATE",
+                             help="name of the recovery folder, RecoveryFolder by default, with the fields "
+                                  + ", ".join("{" + field + "}" for field in FOLDER_FIELDS)
+                                  + ", e.g. {date}_{serial}")
+    preset_save.add_argument("--jobs", type=int, help="number of drives recovered at once")
+    preset_save.add_argument("--no-verify", action="store_true",
+                             help="skip hashing and structure checks of recovered clips")
+    preset_save.add_argument("--verbosity", choices=VERBOSITY_LEVELS, default="full",
+                             help="quiet shows only the helper's own messages, the full log is still written")
+    preset_save.add_argument("--auto-start", action="store_true",
+                             help="in the GUI, recover drives inserted while the preset is selected right away")
+    preset_save.set_defaults(func=save_preset)
+    preset_delete = preset_commands.add_parser("delete", help="delete a preset")
+    preset_delete.add_argument("name")
+    preset_delete.set_defaults(func=delete_preset)
+    
+    recover_parser = commands.add_parser("recover", help="recover one drive")
+    recover_parser.add_argument("drive", help="device identifier such as disk1, or an image file")
+    recover_parser.add_argument("target", nargs="?",
+                                help="folder that receives RecoveryFolder, the preset's target by default")
+    recover_parser.set_defaults(func=recover, jobs=1)
+    
+    batch_parser = commands.add_parser("batch", help="recover several drives in parallel")
+    batch_parser.add_argument("target", help="folder that receives RecoveryFolder/<diskN>")
+    batch_parser.add_argument("drives", nargs="+", help="device identifiers such as disk1 disk2")
+    batch_parser.add_argument("--jobs", type=int, help="number of drives recovered at once")
+    batch_parser.set_defaults(func=batch)
+    
+    for sub in (recover_parser, batch_parser):
+        sub.add_argument("--no-scan", action="store_true",
+                         help="skip the device scan, progress falls back to REDundead's own output")
+    
+    watch_parser = commands.add_parser("watch", help="recover every drive inserted from now on")
+    watch_parser.add_argument("--target", help="folder that receives the recovery folders, "
+                                               "the preset's target by default")
+    watch_parser.add_argument("--jobs", type=int, help="number of drives recovered at once")
+    watch_parser.set_defaults(func=watch_drives)
+    
+    for sub in (recover_parser, batch_parser, watch_parser):
+        sub.add_argument("--preset", help="take the target, folder name, jobs, verification and log "
+                                          "verbosity from this preset")
+        sub.add_argument("--verbosity", choices=VERBOSITY_LEVELS,
+                         help="quiet leaves REDundead's own output to the log file")
+        sub.add_argument("--json", action="store_true", help="print progress events as JSON lines")
+        sub.add_argument("--backend", choices=BACKENDS, default="redundead",
+                         help="recovery engine, native carves R3D clips without REDundead")
+        sub.add_argument("--image", action="store_true",
+                         help="copy each drive to a sparse image under <target>/Images first, "
+                              "then recover from the image")
+        sub.add_argument("--no-verify", action="store_true",
+                         help="skip hashing and structure checks of recovered clips")
+        sub.add_argument("--no-dedup", action="store_true",
+                         help="keep duplicate clips instead of hard-linking them to one copy")
+        sub.add_argument("--no-adaptive", action="store_true",
+                         help="only log the read health of slow or stalled drives, don't switch to imaging "
+                              "or start fewer drives at once")
+        sub.add_argument("--jobs-per-target", type=int, default=MAX_JOBS_PER_TARGET,
+                         help="maximum jobs writing to the same target disk")
+        sub.add_argument("--no-history", action="store_true",
+                         help="don't look up or record this run in the recovery history")
+        sub.add_argument("--skip-recovered", action="store_true",
+                         help="leave out drives the history shows as recovered before")
+        sub.add_argument("--priority", choices=PRIORITIES, default="normal",
+                         help="CPU and I/O priority of the recovery, background leaves the "
+                              "workstation responsive")
+    return parser
+
+
+def main(argv=None):
+    # Needed by the native carver's process pool in frozen Windows builds
+    multiprocessing.freeze_support()
+    args = build_parser().parse_args(argv)
+    tracer.configure(args.trace, args.profile)
+    try:
+        return args.func(args)
+    finally:
+        tracer.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,1077 @@
+"""Qt-free recovery core shared by the GUI and the command line
+
+Holds drive enumeration, the REDundead process wrapper and the job scheduler.
+Only the standard library is imported here so the CLI starts quickly and runs
+without PyQt5 or pywin32.
+"""
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+
+from redundead_devices import Device, attach_volumes, probe_device
+from redundead_health import HEALTH_OK, HealthMonitor
+from redundead_journal import STAGING_FOLDER_NAME, ClipWatcher, RecoveryJournal, merge_staging
+from redundead_process import PRIORITIES, ProcessController, split_command
+from redundead_providers import SIZE_UNITS, default_providers, enumerate_devices
+from redundead_pump import OutputPump, text_consumer
+from redundead_settings import SETTINGS_FILE, VERBOSITY_LEVELS, Settings, folder_name, template_fields
+from redundead_space import WriteMonitor, format_bytes, preflight
+from redundead_trace import tracer
+
+# Command used to launch REDundead, REDUNDEAD_COMMAND can point to a stand-in
+REDUNDEAD_COMMAND = os.environ.get("REDUNDEAD_COMMAND", "REDundead")
+
+# Recovered clips are written below this folder in the target path, unless a preset names it
+RECOVERY_FOLDER_NAME = "RecoveryFolder"
+
+# Parallel recovery limits, jobs writing to the same target disk are throttled
+MAX_CONCURRENT_JOBS = 2
+MAX_JOBS_PER_TARGET = 2
+
+# Log lines are delivered to consumers in batches, the full log is written to disk
+LOG_FLUSH_INTERVAL = 0.05
+LOG_FLUSH_LINES = 500
+LOG_MAX_BLOCKS = 5000
+LOG_FILE_NAME = "redundead_helper.log"
+
+# REDundead has no documented start offset option. When a build supports one,
+# set REDUNDEAD_RESUME_ARGUMENT to its syntax, for example "--offset {offset}"
+REDUNDEAD_RESUME_ARGUMENT = os.environ.get("REDUNDEAD_RESUME_ARGUMENT", "")
+
+# Device scans are cached while the set of attached devices stays the same
+DISK_CACHE_TTL = 30.0
+DISK_SCAN_TIMEOUT = 15.0
+DISK_CACHE_FILE = "drives.json"
+
+# Throughput samples go to the recovery history at most this often
+HISTORY_METRIC_INTERVAL = 10.0
+
+def _ignore(*args):
+    """Default callback that drops the event"""
+
+
+def is_admin():
+    """Check if running with admin privileges, always True outside Windows"""
+    if os.name != "nt":
+        return True
+    try:
+        import ctypes
+        return bool(ctypes.windll.shell32.IsUserAnAdmin())
+    except Exception:
+        return False
+
+
+def app_data_dir():
+    """Per-user folder for caches and settings"""
+    if os.name == "nt":
+        base = os.environ.get("APPDATA") or os.path.expanduser("~")
+        return os.path.join(base, "REDundead-Helper")
+    base = os.environ.get("XDG_CONFIG_HOME") or os.path.join(os.path.expanduser("~"), ".config")
+    return os.path.join(base, "redundead-helper")
+
+
+def default_settings():
+    """Settings file in the per-user folder"""
+    return Settings(os.path.join(app_data_dir(), SETTINGS_FILE))
+
+
+def default_thumbnail_cache():
+    """Thumbnail cache of the results view in the per-user folder"""
+    # Imported on demand, only the results view shows thumbnails
+    from redundead_preview import THUMBNAIL_FOLDER, ThumbnailCache
+    return ThumbnailCache(os.path.join(app_data_dir(), THUMBNAIL_FOLDER))
+
+
+def default_history(log=None):
+    """Open the recovery history in the per-user folder, None if it can't be used"""
+    # Imported on demand, SQLite is not needed to show the window
+    from redundead_history import HISTORY_FILE, open_history
+    return open_history(os.path.join(app_data_dir(), HISTORY_FILE), log)
+
+
+def job_folders(template, drive, device=None, multiple=False):
+    """Folder and subfolder of a drive's recovery for a preset's folder template, None for the defaults
+
+    The drives of a multi-drive run share the folder and get a subfolder
+    each, unless the template names the disk.
+    """
+    if not template:
+        return None, drive if multiple else None
+    folder = folder_name(template, drive, device.serial if device else "")
+    return folder, drive if multiple and "disk" not in template_fields(template) else None
+
+
+def device_signature():
+    """Cheap fingerprint of the attached physical devices, None if unavailable"""
+    try:
+        if os.name == "nt":
+            import ctypes
+            # Lists every DOS device name without spawning a process
+            size = 65536
+            buffer = ctypes.create_unicode_buffer(size)
+            length = ctypes.windll.kernel32.QueryDosDeviceW(None, buffer, size)
+            if not length:
+                return None
+            names = buffer[:length].split("\0")
+            return frozenset(name for name in names if name.startswith("PhysicalDrive"))
+        return frozenset(os.listdir("/sys/block"))
+    except Exception:
+        return None
+
+
+def signature_ids(signature):
+    """Device ids of the drives in a device signature, diskN for PhysicalDriveN on Windows"""
+    if os.name == "nt":
+        return {"disk" + name[len("PhysicalDrive"):] for name in signature}
+    return set(signature)
+
+
+@tracer.traced("get_physical_disks")
+def get_physical_disks(log=None, timeout=None):
+    """Get available physical disks, REDundead's own table first, log receives diagnostics"""
+    disks = enumerate_devices(default_providers(REDUNDEAD_COMMAND), log, timeout)
+    if not disks:
+        print("Failed to get the device list from REDundead or any fallback", file=sys.stderr)
+    return attach_volumes(disks)
+
+
+class DiskCache:
+    """TTL cache of the device list, keyed by the set of attached devices"""
+    
+    def __init__(self, ttl=DISK_CACHE_TTL, timeout=DISK_SCAN_TIMEOUT, path=None):
+        self.ttl = ttl
+        self.timeout = timeout
+        self.path = path or os.path.join(app_data_dir(), DISK_CACHE_FILE)
+        self.lock = threading.Lock()
+        self.disks = None
+        self.signature = None
+        self.scanned_at = 0.0
+        # Last good list from a previous session, shown before the first scan ends
+        self.last_good = self._load()
+    
+    def _load(self):
+        """Read the last good device list from disk"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                disks = json.load(f)
+            return [Device.from_dict(disk) for disk in disks]
+        except (OSError, ValueError, TypeError, KeyError, AttributeError):
+            return []
+    
+    def _save(self, disks):
+        """Write the device list to disk, replacing the old file atomically"""
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temp_path = self.path + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump([disk.to_dict() for disk in disks], f)
+            os.replace(temp_path, self.path)
+        except OSError:
+            pass
+    
+    def get(self, log=None, force=False):
+        """Return the device list, scanning only when the device set changed or the TTL ran out"""
+        # Concurrent callers wait for the scan in progress and reuse its result
+        with self.lock:
+            signature = device_signature()
+            fresh = (
+                self.disks is not None
+                and signature == self.signature
+                and time.monotonic() - self.scanned_at < self.ttl
+            )
+            if fresh and not force:
+                return self.disks
+            
+            return self._scan(signature, log)
+    
+    def update(self, names=None, log=None):
+        """Bring the list up to date after a hot-plug notification, return (devices, changed)
+        
+        Drives that left the device signature are dropped, new ones and the
+        ones the notification named are read on their own with probe_device,
+        every listed one when it named none. A full scan only runs before the
+        first one or when the list's ids aren't the system's disk names, as
+        when REDundead numbers the drives its own way.
+        """
+        with self.lock:
+            signature = device_signature()
+            listed = {disk.id for disk in self.disks} if self.disks is not None else None
+            if (listed is None or signature is None or self.signature is None
+                    or not listed <= signature_ids(self.signature)):
+                return self._scan(signature, log), True
+            
+            current = signature_ids(signature)
+            added = current - signature_ids(self.signature)
+            removed = listed - current
+            probe = added | (set(names) & current if names is not None else listed & current)
+            probed = {}
+            for device_id in probe:
+                device = probe_device(device_id)
+                if device is not None:
+                    probed[device_id] = device
+            
+            disks = []
+            for disk in self.disks:
+                if disk.id in removed:
+                    continue
+                device = probed.pop(disk.id, None)
+                if device is not None:
+                    # The scan's model and serial are kept, REDundead may name the drive differently
+                    disk = Device(disk.id, device.size_bytes, disk.model or device.model,
+                                  disk.serial or device.serial, device.volumes, device.partitions)
+                disks.append(disk)
+            disks.extend(probed[device_id] for device_id in sorted(probed))
+            
+            changed = disks != self.disks
+            if changed:
+                self._store(disks, signature)
+                if log:
+                    for device_id in sorted(probed):
+                        log(f"{device_id} attached")
+                    for device_id in sorted(removed):
+                        log(f"{device_id} removed")
+            else:
+                self.signature = signature
+            return disks, changed
+    
+    def _scan(self, signature, log):
+        """Run a full enumeration, the last good list if it fails"""
+        disks = get_physical_disks(log, self.timeout)
+        if not disks:
+            # Keep showing the last good list when a scan fails or times out
+            return self.last_good
+        self._store(disks, signature)
+        return disks
+    
+    def _store(self, disks, signature):
+        """Remember a device list as current and as the last good one"""
+        self.disks = disks
+        self.signature = signature
+        self.scanned_at = time.monotonic()
+        self.last_good = disks
+        self._save(disks)
+
+
+def _number_after(line, keyword):
+    """Return the integer token following keyword in line, None if absent"""
+    index = line.find(keyword)
+    if index < 0:
+        return None
+    token = line[index + len(keyword):].lstrip(" :=").split(" ", 1)[0].rstrip(",;")
+    try:
+        return int(token, 0)
+    except ValueError:
+        return None
+
+
+def _percent_before(line, index):
+    """Return the number that ends right before the '%' at index"""
+    start = index
+    while start > 0 and (line[start - 1].isdigit() or line[start - 1] == "."):
+        start -= 1
+    try:
+        return float(line[start:index])
+    except ValueError:
+        return None
+
+
+class ProgressParser:
+    """Incremental parser for REDundead stdout, constant work per line"""
+    
+    def __init__(self, total_bytes=None, clock=time.monotonic, sample_interval=1.0):
+        self.total_bytes = total_bytes
+        self.clock = clock
+        self.sample_interval = sample_interval
+        self.offset = 0
+        self.clips_found = 0
+        self.percent = 0.0
+        self.rate = 0.0  # Smoothed bytes per second
+        self._sample_time = clock()
+        self._sample_offset = 0
+        self._reported_percent = -1
+    
+    def feed(self, line):
+        """Parse one stdout line, return True if there is new progress to report"""
+        changed = False
+        
+        # Fast path: plain substring checks, lines without markers cost one scan each
+        if "offset" in line:
+            offset = _number_after(line, "offset")
+            if offset is not None and offset > self.offset:
+                self.offset = offset
+                changed = self._update_offset()
+        elif "scanned" in line:
+            scanned = _number_after(line, "scanned")
+            if scanned is not None and scanned > self.offset:
+                self.offset = scanned
+                changed = self._update_offset()
+        
+        if ".R3D" in line or ".r3d" in line:
+            self.clips_found += 1
+            changed = True
+        
+        # Without a known device size, fall back to a percentage printed by REDundead
+        if not self.total_bytes:
+            index = line.find("%")
+            if index > 0:
+                percent = _percent_before(line, index)
+                if percent is not None and percent > self.percent:
+                    self.percent = min(percent, 100.0)
+                    changed = self._percent_changed() or changed
+        
+        return changed
+    
+    def _update_offset(self):
+        """Refresh percent and throughput after the scan offset moved"""
+        changed = False
+        if self.total_bytes:
+            self.percent = min(self.offset * 100.0 / self.total_bytes, 100.0)
+            changed = self._percent_changed()
+        
+        now = self.clock()
+        elapsed = now - self._sample_time
+        if elapsed >= self.sample_interval:
+            rate = (self.offset - self._sample_offset) / elapsed
+            # Exponential smoothing keeps the ETA from jumping on bursty output
+            self.rate = rate if not self.rate else 0.7 * self.rate + 0.3 * rate
+            self._sample_time = now
+            self._sample_offset = self.offset
+            changed = True
+        return changed
+    
+    def _percent_changed(self):
+        """True when the whole-number percentage moved"""
+        percent = int(self.percent)
+        if percent == self._reported_percent:
+            return False
+        self._reported_percent = percent
+        return True
+    
+    def mb_per_second(self):
+        """Current scan speed in MB/s"""
+        return self.rate / SIZE_UNITS["MB"]
+    
+    def eta_seconds(self):
+        """Estimated seconds until the scan ends, -1 when unknown"""
+        if not self.total_bytes or self.rate <= 0:
+            return -1
+        return int(max(self.total_bytes - self.offset, 0) / self.rate)
+
+
+class LogSink:
+    """Collects log lines and delivers them in batches, the full log goes to disk"""
+    
+    def __init__(self, emit, log_path=None, interval=LOG_FLUSH_INTERVAL, max_batch=LOG_FLUSH_LINES):
+        self.emit = emit
+        self.interval = interval
+        self.max_batch = max_batch
+        self.lines = []
+        self.shown = []
+        self.lock = threading.Lock()
+        self.log_file = open(log_path, "a", encoding="utf-8") if log_path else None
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._flush_loop, daemon=True)
+        self.thread.start()
+    
+    def write(self, line, show=True):
+        """Queue one line, flushing right away once a full batch is waiting
+
+        A line with show False only goes to the log file.
+        """
+        with self.lock:
+            self.lines.append(line)
+            if show:
+                self.shown.append(line)
+            full = len(self.lines) >= self.max_batch
+        if full:
+            self.flush()
+    
+    def flush(self):
+        """Deliver all queued lines as one newline-joined message"""
+        with self.lock:
+            if not self.lines:
+                return
+            tracer.counter("log_sink_batch", lines=len(self.lines))
+            if self.log_file:
+                self.log_file.write("\n".join(self.lines) + "\n")
+            # Emit under the lock so batches from different threads stay in order
+            if self.shown:
+                self.emit("\n".join(self.shown))
+            self.lines = []
+            self.shown = []
+    
+    def _flush_loop(self):
+        """Flush on a fixed timer until closed"""
+        while not self.stopped.wait(self.interval):
+            self.flush()
+    
+    def close(self):
+        """Stop the timer, deliver what is left and close the log file"""
+        self.stopped.set()
+        self.thread.join()
+        self.flush()
+        if self.log_file:
+            self.log_file.close()
+            self.log_file = None
+
+
+class RecoveryBackend:
+    """Interface of a recovery engine driven by RecoveryJob
+    
+    A backend reports its progress as output lines in the format the
+    ProgressParser understands, so journal, verification and logging work
+    the same for every engine.
+    """
+    name = ""
+    supports_resume = False
+    
+    def describe(self, source, output_folder, resume_offset=0):
+        """Human readable description of the run, written to the log"""
+        raise NotImplementedError
+    
+    def total_bytes(self, source):
+        """Size of the source in bytes, None if the backend can't tell"""
+        return None
+    
+    def run(self, source, output_folder, on_line, resume_offset=0):
+        """Recover clips into output_folder, report lines through on_line(line, stream), return exit code"""
+        raise NotImplementedError
+    
+    def cancel(self):
+        """Stop a running recovery early, from another thread"""
+    
+    def pause(self):
+        """Suspend a running recovery, True if it was paused"""
+        return False
+    
+    def resume(self):
+        """Continue a paused recovery, True if it was resumed"""
+        return False
+    
+    def set_priority(self, level):
+        """Change CPU and I/O priority to one of PRIORITIES, True if applied"""
+        return False
+
+
+class REDundeadBackend(RecoveryBackend):
+    """Runs the external REDundead executable"""
+    name = "redundead"
+    supports_resume = bool(REDUNDEAD_RESUME_ARGUMENT)
+    
+    def __init__(self, executable=REDUNDEAD_COMMAND):
+        self.executable = executable
+        self.controller = ProcessController()
+        self.process = None
+        self.pump = None
+        # Extra consumers of the raw output, they share the pump's buffer with the job
+        self.consumers = []
+    
+    def arguments(self, source, output_folder, resume_offset=0):
+        """Argument list of the REDundead process"""
+        arguments = split_command(self.executable)
+        if self.supports_resume and resume_offset:
+            arguments += split_command(REDUNDEAD_RESUME_ARGUMENT.format(offset=resume_offset))
+        # Directly use the obtained device identifier
+        return arguments + [source, output_folder]
+    
+    def describe(self, source, output_folder, resume_offset=0):
+        return subprocess.list2cmdline(self.arguments(source, output_folder, resume_offset))
+    
+    def run(self, source, output_folder, on_line, resume_offset=0):
+        """Executes REDundead and forwards its output"""
+        # No shell in between, so cancel, pause and priority reach REDundead itself
+        process = self.process = self.controller.start(
+            self.arguments(source, output_folder, resume_offset),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            bufsize=0
+        )
+        
+        # Both pipes are drained concurrently, so a quiet pipe never blocks a busy one.
+        # Output stays raw bytes until a consumer needs text, on_line gets it decoded once
+        self.pump = OutputPump(process, [text_consumer(on_line), *self.consumers],
+                               on_error=lambda message: on_line(message, "stderr"))
+        self.pump.start()
+        return self.pump.wait()
+    
+    def cancel(self):
+        """Stop REDundead, killing it if it doesn't exit within the grace period"""
+        self.controller.cancel()
+    
+    def pause(self):
+        return self.controller.pause()
+    
+    def resume(self):
+        return self.controller.resume()
+    
+    def set_priority(self, level):
+        return self.controller.set_priority(level)
+
+
+BACKENDS = ("redundead", "native")
+
+
+def make_backend(name="redundead"):
+    """Create a recovery backend by name"""
+    if name == "native":
+        # Imported on demand, the carver pulls in multiprocessing
+        from r3d_carver import NativeCarverBackend
+        return NativeCarverBackend()
+    if name == "redundead":
+        return REDundeadBackend()
+    raise ValueError(f"Unknown recovery backend: {name}")
+
+
+class RecoveryJob:
+    """Runs a recovery backend for one drive and reports progress through callbacks"""
+    
+    def __init__(self, source_drive, target_path, total_bytes=None, subfolder=None,
+                 log_prefix="", verify=True, backend=None, image=False, priority="normal",
+                 history=None, device=None, dedup=True, adaptive=True, folder=None, verbosity="full"):
+        # source_drive is already in the correct format (such as "disk0").
+        self.source_drive = source_drive  
+        self.target_path = target_path
+        # Each drive of a multi-drive run gets its own RecoveryFolder/<diskN>, folder replaces RecoveryFolder
+        self.recovery_folder = os.path.join(target_path, folder or RECOVERY_FOLDER_NAME)
+        if subfolder:
+            self.recovery_folder = os.path.join(self.recovery_folder, subfolder)
+        self.log_prefix = log_prefix
+        if verbosity not in VERBOSITY_LEVELS:
+            raise ValueError(f"Unknown log verbosity: {verbosity}")
+        # Quiet leaves the engine's own output to the log file
+        self.quiet = verbosity == "quiet"
+        self.verify = verify
+        # Hard-link duplicate clips of the folder once the recovery is done
+        self.dedup = dedup
+        self.backend = backend or REDundeadBackend()
+        # Image the drive first and recover from the image, for failing cards
+        self.image = image
+        # Switch to imaging and lower the concurrency when the drive reads slowly or stalls
+        self.adaptive = adaptive
+        self.restart_imaged = False
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority: {priority}")
+        self.priority = priority
+        self.parser = ProgressParser(total_bytes)
+        self.sink = None
+        self.journal = None
+        self.verifier = None
+        self.imager = None
+        self.monitor = None
+        self.health = None
+        self.paused = False
+        self.cancelled = False
+        self.stop_reason = None
+        # Optional RecoveryHistory, and the Device record identifying the card in it
+        self.history = history
+        self.device = device
+        self.run_id = None
+        self.last_metric = 0.0
+        self.start_offset = 0  # Scan offset this run started from, after a resume
+        # Counter names in the trace, one graph per drive
+        self.trace_lines = f"lines {source_drive}"
+        self.trace_scan = f"scan {source_drive}"
+        
+        # Callbacks, set to GUI signals or CLI printers by the caller
+        self.on_progress = _ignore      # (percent)
+        self.on_throughput = _ignore    # (MB/s, ETA in seconds or -1)
+        self.on_clips = _ignore         # (clips found)
+        self.on_log = _ignore           # (newline-separated batch of lines)
+        self.on_complete = _ignore      # (success, message)
+        # Set by the caller to the scheduler's throttle and unthrottle, called with the job,
+        # they return the new limit or None
+        self.throttle = None
+        self.unthrottle = None
+    
+    def log(self, message, show=True):
+        """Send a message to the log sink, or straight to on_log before it exists"""
+        if self.sink:
+            self.sink.write(message, show)
+        elif show:
+            self.on_log(message)
+    
+    def handle_line(self, line, stream):
+        """Forward a line to the log and feed stdout to the progress parser"""
+        if stream == "stderr":
+            self.log(f"{self.log_prefix}Error: {line}")
+            return
+        self.log(f"{self.log_prefix}{line}", not self.quiet)
+        tracer.rate(self.trace_lines)
+        
+        parser = self.parser
+        percent, rate, clips_found = int(parser.percent), parser.rate, parser.clips_found
+        if parser.feed(line):
+            # Hold 100% back until REDundead has actually exited
+            if int(parser.percent) != percent:
+                self.on_progress(min(int(parser.percent), 99))
+            if parser.rate != rate:
+                self.on_throughput(parser.mb_per_second(), parser.eta_seconds())
+                tracer.counter(self.trace_scan, mb_per_second=parser.mb_per_second())
+                if self.run_id and time.monotonic() - self.last_metric >= HISTORY_METRIC_INTERVAL:
+                    self.last_metric = time.monotonic()
+                    self.history.record_metric(self.run_id, parser.offset, parser.mb_per_second())
+            if parser.clips_found != clips_found:
+                self.on_clips(parser.clips_found)
+            if self.journal:
+                self.journal.checkpoint(parser.offset)
+    
+    def clip_closed(self, name, path, size):
+        """Verify and journal a clip once REDundead has finished writing it"""
+        if self.journal.was_finished(name, size):
+            # Verified by the interrupted run, no need to read it again
+            self.log(f"{self.log_prefix}Already recovered: {name}")
+            return
+        if self.verifier:
+            self.verifier.submit(name, path, size)
+        else:
+            from redundead_verify import unverified_row
+            self.record_clip(unverified_row(name, size))
+    
+    def clip_verified(self, row):
+        """Journal the verification result of one clip"""
+        self.record_clip(row)
+        detail = f" ({row['detail']})" if row["detail"] else ""
+        self.log(f"{self.log_prefix}Verified {row['name']}: {row['status']}{detail}")
+    
+    def record_clip(self, row):
+        """Write a clip's manifest row to the journal and the history"""
+        self.journal.record_clip(row)
+        if self.run_id:
+            self.history.record_clip(self.run_id, row, os.path.join(self.recovery_folder, row["name"]))
+    
+    def start_history(self, started):
+        """Record the start of this run in the history"""
+        device = self.device or Device(self.source_drive, self.parser.total_bytes)
+        self.run_id = self.history.start_run(
+            device.id, self.source_drive, self.target_path, self.backend.name,
+            device.serial, device.model, device.size_bytes, started
+        )
+    
+    def finish_history(self, status, message, started):
+        """Record the outcome and average scan speed of this run"""
+        if not self.run_id:
+            return
+        elapsed = time.time() - started
+        scanned = self.parser.offset - self.start_offset
+        self.history.finish_run(
+            self.run_id, status, message, scanned, self.parser.clips_found,
+            scanned / elapsed / SIZE_UNITS["MB"] if elapsed > 0 else None
+        )
+        
+    def check_space(self):
+        """Warn up front if the target may not hold everything the job can write"""
+        needed, free = preflight(self.target_path, [self.parser.total_bytes], self.image)
+        if needed > free:
+            self.log(
+                f"{self.log_prefix}Warning: target has {format_bytes(free)} free, "
+                f"recovering {self.source_drive} may write up to {format_bytes(needed)}"
+            )
+    
+    def write_warning(self, message):
+        """Log a warning from the write monitor"""
+        self.log(f"{self.log_prefix}Warning: {message}")
+    
+    def target_full(self, free):
+        """Stop the recovery before the target disk fills up, it can be resumed later"""
+        self.stop_reason = (
+            f"Target disk is almost full ({format_bytes(free)} free). "
+            f"Free up space and start the recovery again to resume."
+        )
+        self.log(f"{self.log_prefix}{self.stop_reason}")
+        self.backend.cancel()
+    
+    def start_health(self):
+        """Start watching the read health of the source drive"""
+        self.health = HealthMonitor(self.source_drive, self.health_changed)
+        if not self.health.start():
+            self.health = None
+            self.log(f"{self.log_prefix}Read health: the system keeps no I/O statistics for {self.source_drive}")
+    
+    def stop_health(self):
+        """Stop the health monitor and log how the drive read over the run"""
+        if self.health:
+            self.health.stop()
+            self.log(f"{self.log_prefix}{self.health.summary()}")
+            self.health = None
+    
+    def health_changed(self, state, sample):
+        """Log a change of the source drive's read health and adapt the recovery to it
+        
+        A slow or stalled drive makes the scheduler start fewer drives at
+        once, until it reads well again or its job ends, and a drive read
+        directly is imaged instead: the imager reads large blocks, skips
+        unreadable areas and retries them sector by sector at the end.
+        Every decision goes to the run's history.
+        """
+        self.log(f"{self.log_prefix}Read health of {self.health.source}: {state}, {sample.describe()}")
+        decisions = []
+        if state == HEALTH_OK:
+            limit = self.unthrottle(self) if self.unthrottle else None
+            if limit:
+                decisions.append(("restore_concurrency", f"running up to {limit} recoveries at once again"))
+        elif self.adaptive:
+            # Lowered once per job, a drive going from slow to stalled doesn't lower it again
+            limit = self.throttle(self) if self.throttle else None
+            if limit:
+                decisions.append(("lower_concurrency", f"running at most {limit} recoveries at once"))
+            if not self.image and not self.stop_reason:
+                decisions.append(("image_first", "stopping to image the drive, then recovering from the image"))
+        for decision, detail in decisions or [("", "")]:
+            if detail:
+                self.log(f"{self.log_prefix}Decision: {detail}")
+            if self.run_id:
+                self.history.record_health(self.run_id, state, decision, detail, sample.mb_per_second,
+                                           sample.latency, sample.tail_latency, sample.in_flight)
+        if any(decision == "image_first" for decision, _ in decisions):
+            self.restart_imaged = True
+            self.stop_reason = f"Read health {state}, switching to imaging"
+            self.backend.cancel()
+    
+    def cancel(self):
+        """Stop the recovery from another thread, a later run resumes where it stopped"""
+        # A cancel during a switch to imaging stops the job instead
+        if self.stop_reason and not self.restart_imaged:
+            return
+        self.restart_imaged = False
+        self.cancelled = True
+        self.stop_reason = "Recovery cancelled"
+        self.log(f"{self.log_prefix}{self.stop_reason}")
+        if self.imager:
+            self.imager.cancel()
+        self.backend.cancel()
+    
+    def pause(self):
+        """Suspend imaging or the recovery engine, True if the job is now paused"""
+        if self.paused or self.stop_reason:
+            return False
+        imaging = self.imager is not None and self.imager.pause()
+        if not imaging and not self.backend.pause():
+            return False
+        self.paused = True
+        if self.monitor:
+            # A paused job writes nothing, which is not a stall
+            self.monitor.paused = True
+        if self.health:
+            self.health.paused = True
+        self.log(f"{self.log_prefix}Paused")
+        return True
+    
+    def resume(self):
+        """Continue a paused job, True if it was paused"""
+        if not self.paused:
+            return False
+        if self.imager:
+            self.imager.resume()
+        self.backend.resume()
+        self.paused = False
+        if self.monitor:
+            self.monitor.paused = False
+        if self.health:
+            self.health.paused = False
+        self.log(f"{self.log_prefix}Resumed")
+        return True
+    
+    def set_priority(self, level):
+        """Change the CPU and I/O priority of the recovery engine, True if applied"""
+        if level not in PRIORITIES:
+            raise ValueError(f"Unknown priority: {level}")
+        self.priority = level
+        if not self.backend.set_priority(level):
+            self.log(f"{self.log_prefix}Warning: could not change the priority to {level}, "
+                     f"raising it again may need admin rights")
+            return False
+        self.log(f"{self.log_prefix}Priority: {level}")
+        return True
+    
+    def deduplicate(self, folder):
+        """Link duplicate clips of the folder to one copy and report partial clips"""
+        # Imported on demand, only needed once a recovery has finished
+        from redundead_dedup import deduplicate
+        try:
+            result = deduplicate(folder, "link", self.log)
+        except OSError as e:
+            # The clips are recovered either way, deduplication is a bonus
+            self.log(f"{self.log_prefix}Deduplication failed: {e}")
+            return
+        self.log(f"{self.log_prefix}{result.summary()}")
+    
+    def acquire_image(self):
+        """Copy the drive to a sparse image, then point the recovery at the image"""
+        # Imported on demand, imaging pulls in the carver
+        from redundead_image import DiskImager, image_paths
+        image_path, map_path = image_paths(self.target_path, self.source_drive)
+        size = self.device.size_bytes if self.device and self.device.size_bytes else self.parser.total_bytes
+        imager = self.imager = DiskImager(self.source_drive, image_path, map_path, size=size)
+        self.log(f"{self.log_prefix}Imaging {self.source_drive} to {image_path}")
+        unreadable = imager.run(self.handle_line)
+        self.imager = None
+        if unreadable:
+            self.log(f"{self.log_prefix}Image finished, {unreadable} bytes unreadable, see {map_path}")
+        else:
+            self.log(f"{self.log_prefix}Image finished without read errors")
+        
+        self.source_drive = image_path
+        self.parser = ProgressParser(imager.size)
+        self.on_progress(0)
+        if not isinstance(self.backend, REDundeadBackend):
+            return
+        # REDundead reads drives only, the image is carved by the built-in engine
+        self.log(f"{self.log_prefix}Recovering from the image with the built-in R3D carver")
+        self.backend = make_backend("native")
+    
+    def run(self):
+        """Executes REDundead command and sends progress updates"""
+        with tracer.span("recovery", drive=self.source_drive), tracer.profiled(f"job_{self.source_drive}"):
+            # A drive found failing is recovered again from an image, resuming from the journal
+            while self._run():
+                self.restart_imaged = False
+                self.stop_reason = None
+                self.image = True
+                self.sink = self.journal = self.verifier = self.monitor = None
+                self.run_id = None
+        # The other drives may run at full concurrency again
+        if self.unthrottle:
+            self.unthrottle(self)
+    
+    def _run(self):
+        """Body of run, timed and profiled as one recovery, True if it should start over imaging"""
+        # Imported on demand, hashing and the history database are only needed once a job runs
+        from redundead_history import RUN_CANCELLED, RUN_DONE, RUN_FAILED
+        from redundead_verify import ClipVerifier, summarize, write_manifest
+        started = time.time()
+        try:
+            # Make sure the destination folder exists
+            recovery_folder = self.recovery_folder
+            if not os.path.exists(recovery_folder):
+                os.makedirs(recovery_folder)
+            self.sink = LogSink(self.on_log, os.path.join(recovery_folder, LOG_FILE_NAME))
+            self.check_space()
+            self.start_health()
+            
+            if self.image:
+                with tracer.span("acquire_image"):
+                    self.acquire_image()
+                # The image is read from the target from here on
+                self.stop_health()
+            if self.stop_reason:
+                raise RuntimeError(self.stop_reason)
+            if self.history:
+                self.start_history(started)
+            
+            # Pick up the journal of an interrupted run of this folder
+            self.journal = RecoveryJournal(recovery_folder)
+            output_folder = recovery_folder
+            resume_offset = 0
+            if self.journal.open():
+                self.log(
+                    f"{self.log_prefix}Resuming interrupted recovery: {len(self.journal.finished)} clips finished, "
+                    f"last offset {self.journal.offset}"
+                )
+                # Finished clips stay untouched, the new run writes next to them
+                output_folder = os.path.join(recovery_folder, STAGING_FOLDER_NAME)
+                os.makedirs(output_folder, exist_ok=True)
+                if self.backend.supports_resume:
+                    resume_offset = self.journal.offset
+                    self.parser.offset = resume_offset
+            
+            if not self.parser.total_bytes:
+                self.parser.total_bytes = self.backend.total_bytes(self.source_drive)
+            
+            # Clips are hashed and checked while REDundead keeps scanning
+            if self.verify:
+                self.verifier = ClipVerifier(self.clip_verified)
+                for row in self.journal.finished.values():
+                    self.verifier.add(row)
+            
+            self.log(self.backend.describe(self.source_drive, output_folder, resume_offset))
+            
+            # Write speed and free space are sampled from the watcher's scans
+            monitor = self.monitor = WriteMonitor(self.target_path, lambda: self.parser.offset,
+                                                  self.write_warning, self.target_full)
+            watcher = ClipWatcher(output_folder, self.clip_closed, on_scan=monitor.sample)
+            watcher.start()
+            if self.priority != "normal":
+                self.set_priority(self.priority)
+            self.start_offset = self.parser.offset
+            try:
+                with tracer.span("backend_run", backend=self.backend.name):
+                    return_code = self.backend.run(self.source_drive, output_folder, self.handle_line, resume_offset)
+            finally:
+                # Also when the backend raises, a stray watcher would keep sampling and cancelling
+                watcher.stop()
+            if self.stop_reason:
+                # Leaves the journal open-ended, so the next run resumes
+                raise RuntimeError(self.stop_reason)
+            if return_code != 0:
+                # A crash or a pulled card, the journal stays open-ended as well
+                self.log(f"{self.log_prefix}Process return code: {return_code}")
+                pump = getattr(self.backend, "pump", None)
+                error_tail = "\n".join(pump.error_tail()) if pump else ""
+                raise RuntimeError(error_tail or f"Command execution failed, return code: {return_code}")
+            
+            if output_folder != recovery_folder:
+                with tracer.span("merge_staging"):
+                    merge_staging(output_folder, recovery_folder, self.journal, self.log)
+            if self.verifier:
+                with tracer.span("verify_wait"):
+                    rows = self.verifier.close()
+                write_manifest(recovery_folder, rows)
+                counts = ", ".join(f"{count} {status}" for status, count in sorted(summarize(rows).items()))
+                self.log(f"{self.log_prefix}Verification: {counts or 'no clips'}")
+            self.journal.close(complete=True)
+            self.stop_health()
+            if self.dedup:
+                with tracer.span("dedup"):
+                    self.deduplicate(recovery_folder)
+            self.finish_history(RUN_DONE, "Success", started)
+            self.sink.close()
+            
+            self.on_progress(100)
+            self.on_complete(True, "Success")
+                
+        except Exception as e:
+            error_details = traceback.format_exc()
+            if self.verifier:
+                self.verifier.cancel()
+            if self.journal:
+                self.journal.close(complete=False)
+            self.stop_health()
+            self.finish_history(RUN_CANCELLED if self.cancelled else RUN_FAILED, str(e), started)
+            if self.sink:
+                self.sink.close()
+            if self.restart_imaged:
+                return True
+            self.on_log(f"Exception: {str(e)}\n{error_details}")
+            self.on_complete(False, str(e))
+
+
+def target_key(path):
+    """Identify the disk a path lives on, so jobs sharing a target can be throttled"""
+    try:
+        return os.stat(path).st_dev
+    except OSError:
+        return os.path.splitdrive(os.path.abspath(path))[0] or path
+
+
+class RecoveryScheduler:
+    """Runs recovery workers on a bounded pool of threads"""
+    
+    def __init__(self, max_jobs=MAX_CONCURRENT_JOBS, max_jobs_per_target=MAX_JOBS_PER_TARGET):
+        self.max_jobs = max_jobs
+        self.max_jobs_per_target = max_jobs_per_target
+        self.pending = deque()
+        self.active = 0
+        self.active_per_target = {}
+        self.running = set()
+        # Jobs whose drive read badly, the configured limit comes back once none is left
+        self.configured_jobs = max_jobs
+        self.throttled = set()
+        self.held = False
+        self.condition = threading.Condition()
+    
+    def submit(self, worker):
+        """Queue a worker and start it as soon as a slot is free"""
+        with self.condition:
+            self.pending.append((worker, target_key(worker.target_path)))
+            self._dispatch()
+    
+    def _dispatch(self):
+        """Start queued workers while both limits allow, call with the lock held"""
+        if self.held:
+            return
+        for job in list(self.pending):
+            if self.active >= self.max_jobs:
+                break
+            worker, key = job
+            # Skip jobs whose target disk is already saturated, later ones may fit
+            if self.active_per_target.get(key, 0) >= self.max_jobs_per_target:
+                continue
+            self.pending.remove(job)
+            self.active += 1
+            self.active_per_target[key] = self.active_per_target.get(key, 0) + 1
+            self.running.add(worker)
+            thread = threading.Thread(target=self._run, args=(worker, key), daemon=True)
+            thread.start()
+    
+    def _run(self, worker, key):
+        """Run one worker and hand its slot to the next queued job"""
+        try:
+            worker.run()
+        finally:
+            with self.condition:
+                self.active -= 1
+                self.active_per_target[key] -= 1
+                self.running.discard(worker)
+                self._dispatch()
+                self.condition.notify_all()
+    
+    def hold(self, held):
+        """Keep queued workers from starting while held, for a paused batch"""
+        with self.condition:
+            self.held = held
+            self._dispatch()
+    
+    def throttle(self, job):
+        """Start fewer jobs at once after job's drive read badly, once per job
+
+        Return the new limit or None if unchanged.
+        """
+        with self.condition:
+            if job in self.throttled:
+                return None
+            self.throttled.add(job)
+            limit = max(1, min(self.max_jobs, self.active) - 1)
+            if limit >= self.max_jobs:
+                return None
+            self.max_jobs = limit
+            return limit
+    
+    def unthrottle(self, job):
+        """Withdraw the throttle of job, return the restored limit or None if unchanged"""
+        with self.condition:
+            if job not in self.throttled:
+                return None
+            self.throttled.discard(job)
+            if self.throttled or self.max_jobs == self.configured_jobs:
+                return None
+            self.max_jobs = self.configured_jobs
+            self._dispatch()
+            return self.max_jobs
+    
+    def discard(self, worker):
+        """Take a worker out of the queue before it starts, False if it isn't queued"""
+        with self.condition:
+            for job in self.pending:
+                if job[0] is worker:
+                    self.pending.remove(job)
+                    self.condition.notify_all()
+                    return True
+            return False
+    
+    def cancel(self):
+        """Drop queued workers and cancel the running ones, return the dropped workers"""
+        with self.condition:
+            dropped = [worker for worker, key in self.pending]
+            self.pending.clear()
+            running = list(self.running)
+            self.condition.notify_all()
+        for worker in running:
+            worker.cancel()
+        return dropped
+    
+    def wait(self, timeout=None):
+        """Block until every submitted worker has finished, False if timeout ran out first"""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self.condition:
+            while self.pending or self.active:
+                remaining = 0.5 if deadline is None else min(deadline - time.monotonic(), 0.5)
+                if remaining <= 0:
+                    return False
+                # Short waits keep Ctrl+C working on Windows, where lock waits can't be interrupted
+                self.condition.wait(remaining)
+            return True
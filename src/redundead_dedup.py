@@ -0,0 +1,285 @@
+"""Duplicate and partial clip detection for recovery folders
+
+Carving a card that was formatted several times finds the same clip more
+than once, and repeated runs into one RecoveryFolder add further copies.
+Clips are grouped by size, then by a fingerprint of their first and last
+SAMPLE_SIZE bytes, and only clips that still match are compared by full
+hash. The hash the verification wrote to the manifest is used when the clip
+hasn't changed since, so a verified folder is deduplicated without reading
+whole clips again. Exact duplicates are hard-linked to the oldest copy,
+which keeps every name, or deleted.
+
+A partial clip holds the start of a longer clip and nothing else, as a
+truncated carve of the same footage does. Partial clips are found by
+grouping on the first block and comparing samples of the shorter clip with
+the same offsets of the longer one. They are only reported, in dedup.csv
+next to the manifest.
+"""
+import csv
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from redundead_journal import CLIP_EXTENSIONS, STAGING_FOLDER_NAME
+from redundead_space import format_bytes
+from redundead_verify import HASH_ALGORITHM, MANIFEST_JSON, VERIFY_WORKERS, hash_file
+
+# Bytes sampled at the start and at the end of every clip
+SAMPLE_SIZE = 16 * 1024
+
+# Blocks of a shorter clip compared with a longer one, besides its first and last
+PREFIX_SAMPLES = 8
+
+DEDUP_REPORT = "dedup.csv"
+DEDUP_ACTIONS = ("report", "link", "delete")
+REPORT_FIELDS = ("kind", "path", "size", "original", "action")
+
+
+class ClipFile:
+    """A recovered clip and the fingerprints computed for it so far"""
+    __slots__ = ("path", "size", "mtime", "file_id", "head", "tail", "hash")
+
+    def __init__(self, path, size, mtime):
+        self.path = path
+        self.size = size
+        self.mtime = mtime
+        self.file_id = None  # (device, inode), hard links of one file share it
+        self.head = None
+        self.tail = None
+        self.hash = None  # Full hash, from the manifest or computed here
+
+
+class DedupResult:
+    """What deduplicate() found in a folder and what it did about it"""
+
+    def __init__(self, folder, action):
+        self.folder = folder
+        self.action = action
+        self.clips = 0
+        self.duplicates = []  # (duplicate, original) ClipFile pairs
+        self.partials = []  # (partial clip, longer clip) pairs
+        self.already_linked = 0
+        self.bytes_saved = 0
+        self.errors = {}  # Path of a duplicate that could not be handled -> error
+
+    def summary(self):
+        """One line for the log"""
+        verb = {"report": "found", "link": "linked", "delete": "deleted"}[self.action]
+        text = f"Deduplication: {self.clips} clips, {len(self.duplicates)} duplicates {verb}"
+        if self.bytes_saved:
+            text += f" ({format_bytes(self.bytes_saved)} saved)"
+        if self.errors:
+            text += f", {len(self.errors)} failed"
+        text += f", {len(self.partials)} partial clips"
+        if self.duplicates or self.partials:
+            text += f", see {DEDUP_REPORT}"
+        return text
+
+    def rows(self):
+        """Report rows with paths relative to the folder"""
+        def relative(clip):
+            return os.path.relpath(clip.path, self.folder)
+        action = {"report": "", "link": "linked", "delete": "deleted"}[self.action]
+        rows = [{"kind": "duplicate", "path": relative(clip), "size": clip.size,
+                 "original": relative(original),
+                 "action": f"failed: {self.errors[clip.path]}" if clip.path in self.errors else action}
+                for clip, original in self.duplicates]
+        rows += [{"kind": "partial", "path": relative(clip), "size": clip.size,
+                  "original": relative(longer), "action": ""}
+                 for clip, longer in self.partials]
+        return rows
+
+
+def _group(items, key):
+    groups = {}
+    for item in items:
+        groups.setdefault(key(item), []).append(item)
+    return groups
+
+
+def _read_manifest(folder, hashes):
+    """Add the hashes of a folder's manifest by path, as (size, hash, manifest mtime)"""
+    path = os.path.join(folder, MANIFEST_JSON)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            rows = json.load(f)
+        written = os.path.getmtime(path)
+    except (OSError, ValueError):
+        return
+    for row in rows:
+        # A hash of another algorithm can't be compared with one computed here
+        if isinstance(row, dict) and row.get("hash") and row.get("algorithm") == HASH_ALGORITHM:
+            hashes[os.path.normpath(os.path.join(folder, row["name"]))] = (row.get("size"), row["hash"], written)
+
+
+def find_clips(folder):
+    """Clips below folder, with the manifest hash of those unchanged since verification"""
+    clips = []
+    hashes = {}
+    pending = [folder]
+    while pending:
+        current = pending.pop()
+        _read_manifest(current, hashes)
+        try:
+            entries = list(os.scandir(current))
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                # The staging folder belongs to a run that hasn't finished
+                if entry.name != STAGING_FOLDER_NAME:
+                    pending.append(entry.path)
+            elif entry.is_file(follow_symlinks=False) and entry.name.lower().endswith(CLIP_EXTENSIONS):
+                stat = entry.stat(follow_symlinks=False)
+                clips.append(ClipFile(entry.path, stat.st_size, stat.st_mtime))
+    for clip in clips:
+        known = hashes.get(os.path.normpath(clip.path))
+        if known and known[0] == clip.size and clip.mtime <= known[2]:
+            clip.hash = known[1]
+    return clips
+
+
+def _fingerprint(data):
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def _read_head(clip):
+    """Fingerprint the first SAMPLE_SIZE bytes, None if the clip can't be read"""
+    try:
+        with open(clip.path, "rb", buffering=0) as f:
+            clip.head = _fingerprint(f.read(SAMPLE_SIZE))
+    except OSError:
+        clip.head = None
+
+
+def _read_tail(clip):
+    """Fingerprint the last SAMPLE_SIZE bytes and identify the file behind the name"""
+    try:
+        stat = os.stat(clip.path)
+        clip.file_id = (stat.st_dev, stat.st_ino)
+        with open(clip.path, "rb", buffering=0) as f:
+            f.seek(max(clip.size - SAMPLE_SIZE, 0))
+            clip.tail = _fingerprint(f.read(SAMPLE_SIZE))
+    except OSError:
+        clip.tail = None
+
+
+def _full_hash(clip):
+    if clip.hash is None:
+        try:
+            clip.hash = hash_file(clip.path)
+        except OSError:
+            pass
+
+
+def _exact_duplicates(clips, pool, result):
+    """Record exact duplicates, return one clip per distinct content"""
+    unique = []
+    by_size = _group(clips, lambda clip: clip.size)
+    candidates = [clip for group in by_size.values() if len(group) > 1 for clip in group]
+    list(pool.map(_read_tail, candidates))
+    for group in by_size.values():
+        if len(group) == 1:
+            unique.extend(group)
+            continue
+        # Hard links of one file, for example from an earlier deduplication, are one clip
+        files = []
+        for links in _group(group, lambda clip: clip.file_id or id(clip)).values():
+            files.append(links[0])
+            result.already_linked += len(links) - 1
+        samples = _group(files, lambda clip: (clip.head, clip.tail) if clip.head and clip.tail else id(clip))
+        for same in samples.values():
+            if len(same) > 1 and same[0].size > 2 * SAMPLE_SIZE:
+                # The samples cover part of the clip, only the full hash is proof
+                list(pool.map(_full_hash, same))
+                confirmed = _group(same, lambda clip: clip.hash or id(clip)).values()
+            else:
+                confirmed = [same]
+            for copies in confirmed:
+                # The oldest copy stays the original
+                copies.sort(key=lambda clip: (clip.mtime, clip.path))
+                unique.append(copies[0])
+                result.duplicates.extend((copy, copies[0]) for copy in copies[1:])
+    return unique
+
+
+def _is_prefix(short, long):
+    """True if the sampled blocks of short match long at the same offsets"""
+    last = short.size - SAMPLE_SIZE
+    offsets = [last * index // (PREFIX_SAMPLES + 1) for index in range(1, PREFIX_SAMPLES + 1)] + [last]
+    try:
+        with open(short.path, "rb", buffering=0) as a, open(long.path, "rb", buffering=0) as b:
+            for offset in offsets:
+                a.seek(offset)
+                b.seek(offset)
+                if a.read(SAMPLE_SIZE) != b.read(SAMPLE_SIZE):
+                    return False
+    except OSError:
+        return False
+    return True
+
+
+def _partials(unique, result):
+    """Record clips whose content is the start of a longer clip"""
+    # A shorter clip has no full first block to group by
+    candidates = [clip for clip in unique if clip.size > SAMPLE_SIZE and clip.head]
+    for group in _group(candidates, lambda clip: clip.head).values():
+        if len(group) < 2:
+            continue
+        group.sort(key=lambda clip: clip.size)
+        for index, clip in enumerate(group):
+            # Report the longest clip that contains it
+            for longer in reversed(group[index + 1:]):
+                if longer.size > clip.size and _is_prefix(clip, longer):
+                    result.partials.append((clip, longer))
+                    break
+
+
+def _replace_with_link(duplicate, original):
+    """Replace duplicate by a hard link to original, atomically"""
+    temp_path = duplicate.path + ".dedup"
+    try:
+        os.link(original.path, temp_path)
+        os.replace(temp_path, duplicate.path)
+    except OSError:
+        if os.path.lexists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def write_report(folder, rows):
+    """Write the duplicates and partial clips as dedup.csv"""
+    with open(os.path.join(folder, DEDUP_REPORT), "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=REPORT_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def deduplicate(folder, action="report", log=None, workers=VERIFY_WORKERS):
+    """Find duplicate and partial clips below folder, link or delete the duplicates"""
+    if action not in DEDUP_ACTIONS:
+        raise ValueError(f"Unknown deduplication action: {action}")
+    result = DedupResult(folder, action)
+    clips = find_clips(folder)
+    result.clips = len(clips)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="dedup") as pool:
+        list(pool.map(_read_head, clips))
+        unique = _exact_duplicates(clips, pool, result)
+    _partials(unique, result)
+
+    if action != "report":
+        for duplicate, original in result.duplicates:
+            try:
+                if action == "link":
+                    _replace_with_link(duplicate, original)
+                else:
+                    os.remove(duplicate.path)
+                result.bytes_saved += duplicate.size
+            except OSError as e:
+                result.errors[duplicate.path] = str(e)
+                if log:
+                    log(f"Could not {action} duplicate {duplicate.path}: {e}")
+    if result.duplicates or result.partials:
+        write_report(folder, result.rows())
+    return result
@@ -0,0 +1,369 @@
+"""Device records and a registry indexed by device id and mount point
+
+REDundead identifies drives as diskN. The registry also knows which mounted
+volumes live on each drive, so checking whether a target folder sits on one
+of the source drives is a dictionary lookup instead of a string comparison
+between a path and a device name.
+"""
+import ctypes
+import os
+import re
+import struct
+
+from redundead_space import format_bytes
+
+
+class Device:
+    """One physical drive with its size in bytes and its mounted volumes"""
+    __slots__ = ("id", "size_bytes", "model", "serial", "volumes", "partitions")
+
+    def __init__(self, id, size_bytes=None, model="", serial="", volumes=(), partitions=()):
+        self.id = id  # REDundead device id such as disk1
+        self.size_bytes = size_bytes
+        self.model = model
+        self.serial = serial
+        self.volumes = tuple(volumes)  # Mount points such as E:\ or /media/card
+        self.partitions = tuple(partitions)
+
+    @property
+    def description(self):
+        """Size and model as shown in the drive list, e.g. 1.8 TB - RED MINI-MAG 2TB"""
+        parts = [format_bytes(self.size_bytes)] if self.size_bytes else []
+        if self.model:
+            parts.append(self.model)
+        if self.volumes:
+            parts.append(", ".join(self.volumes))
+        return " - ".join(parts)
+
+    def to_dict(self):
+        """Plain dict for JSON output and the device cache"""
+        return {
+            "id": self.id,
+            "size_bytes": self.size_bytes,
+            "model": self.model,
+            "serial": self.serial,
+            "volumes": list(self.volumes),
+            "partitions": list(self.partitions),
+            "description": self.description,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build a device from to_dict output, or from the older name/description dicts"""
+        model = data.get("model")
+        if model is None:
+            # Older caches kept "954 GB - Model" as one string
+            model = data.get("description", "").split(" - ", 1)[-1]
+        return cls(
+            data.get("id") or data["name"],
+            data.get("size_bytes"),
+            model,
+            data.get("serial") or "",
+            data.get("volumes") or (),
+            data.get("partitions") or (),
+        )
+
+    def __eq__(self, other):
+        return isinstance(other, Device) and self.to_dict() == other.to_dict()
+
+    def __hash__(self):
+        # Equal devices share their id, which also survives a rescan that updates the volumes
+        return hash(self.id)
+
+    def __repr__(self):
+        return f"Device({self.id!r}, {self.size_bytes!r}, {self.model!r})"
+
+
+def mount_point(path):
+    """Mount point of the volume holding path, the drive root on Windows"""
+    if os.name == "nt":
+        drive = os.path.splitdrive(os.path.abspath(path))[0]
+        return drive.upper() + "\\" if drive else None
+    path = os.path.realpath(path)
+    # The target folder may not exist yet, its nearest existing parent decides
+    while not os.path.ismount(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return path
+
+
+def _normalize(volume):
+    """Lookup key of a mount point"""
+    if os.name == "nt":
+        return volume.rstrip("\\/").upper() + "\\"
+    return volume.rstrip("/") or "/"
+
+
+class DeviceRegistry:
+    """Devices indexed by id and by the mount points of their volumes"""
+
+    def __init__(self, devices=()):
+        self.by_id = {}
+        self.by_mount = {}
+        self.update(devices)
+
+    def update(self, devices):
+        """Replace the registered devices"""
+        self.by_id = {device.id: device for device in devices}
+        self.by_mount = {
+            _normalize(volume): device for device in devices for volume in device.volumes
+        }
+
+    def __iter__(self):
+        return iter(self.by_id.values())
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def get(self, device_id):
+        """Device with this id, or None"""
+        return self.by_id.get(device_id)
+
+    def size(self, device_id):
+        """Size in bytes of a device, None if unknown"""
+        device = self.by_id.get(device_id)
+        return device.size_bytes if device else None
+
+    def device_for_path(self, path):
+        """Device holding path, None if it is on a volume the registry doesn't know"""
+        mount = mount_point(path)
+        return self.by_mount.get(_normalize(mount)) if mount else None
+
+    def overlaps(self, device_ids, path):
+        """True if path lies on one of the given devices"""
+        device = self.device_for_path(path)
+        return device is not None and device.id in device_ids
+
+
+# Virtual block devices that never hold a card
+VIRTUAL_PREFIXES = ("loop", "ram", "zram", "dm-", "md", "sr", "fd", "nbd")
+
+# Windows storage IOCTLs, used to map drive letters to physical drives
+IOCTL_STORAGE_GET_DEVICE_NUMBER = 0x2D1080
+IOCTL_STORAGE_QUERY_PROPERTY = 0x2D1400
+IOCTL_DISK_GET_DRIVE_GEOMETRY_EX = 0x700A0
+IOCTL_DISK_PERFORMANCE = 0x70020
+IOCTL_DISK_GET_LENGTH_INFO = 0x7405C
+GENERIC_READ = 0x80000000
+FILE_SHARE_READ_WRITE = 0x3
+OPEN_EXISTING = 3
+INVALID_HANDLE_VALUE = ctypes.c_void_p(-1).value
+
+
+def _windows_ioctl(path, code, in_buffer=None, out_size=12, access=0):
+    """Run a DeviceIoControl query on a device path, return the output bytes or None"""
+    kernel32 = ctypes.windll.kernel32
+    kernel32.CreateFileW.restype = ctypes.c_void_p
+    # No access rights are needed for storage queries, so this works without admin
+    handle = kernel32.CreateFileW(path, access, FILE_SHARE_READ_WRITE, None, OPEN_EXISTING, 0, None)
+    if handle in (None, INVALID_HANDLE_VALUE):
+        return None
+    try:
+        out = ctypes.create_string_buffer(out_size)
+        returned = ctypes.c_ulong(0)
+        in_length = len(in_buffer) if in_buffer else 0
+        ok = kernel32.DeviceIoControl(ctypes.c_void_p(handle), code, in_buffer, in_length,
+                                      out, out_size, ctypes.byref(returned), None)
+        return out.raw[:returned.value] if ok else None
+    finally:
+        kernel32.CloseHandle(ctypes.c_void_p(handle))
+
+
+def windows_disk_length(path):
+    """Size in bytes of a raw Windows disk such as \\\\.\\PhysicalDrive1, None if it can't be read"""
+    # Seeking to the end of a raw disk handle gives 0, the length IOCTL needs read access
+    data = _windows_ioctl(path, IOCTL_DISK_GET_LENGTH_INFO, out_size=8, access=GENERIC_READ)
+    return int.from_bytes(data, "little") if data and len(data) == 8 else None
+
+
+def _windows_volumes():
+    """Map disk numbers to the drive letters of their volumes"""
+    volumes = {}
+    mask = ctypes.windll.kernel32.GetLogicalDrives()
+    for index in range(26):
+        if not mask & (1 << index):
+            continue
+        letter = chr(ord("A") + index)
+        # STORAGE_DEVICE_NUMBER: DeviceType, DeviceNumber, PartitionNumber
+        data = _windows_ioctl(rf"\\.\{letter}:", IOCTL_STORAGE_GET_DEVICE_NUMBER)
+        if data and len(data) >= 12:
+            number = int.from_bytes(data[4:8], "little")
+            volumes.setdefault(f"disk{number}", []).append(f"{letter}:\\")
+    return volumes
+
+
+def _windows_descriptor(device_id):
+    """STORAGE_DEVICE_DESCRIPTOR of a disk, None if the disk can't be opened"""
+    number = device_id[len("disk"):]
+    # STORAGE_PROPERTY_QUERY: StorageDeviceProperty, PropertyStandardQuery
+    query = bytes(12)
+    return _windows_ioctl(rf"\\.\PhysicalDrive{number}", IOCTL_STORAGE_QUERY_PROPERTY, query, 1024)
+
+
+def _descriptor_string(data, field):
+    """String a STORAGE_DEVICE_DESCRIPTOR points to with the offset at byte field"""
+    if not data or len(data) < field + 4:
+        return ""
+    offset = int.from_bytes(data[field:field + 4], "little")
+    if not offset or offset >= len(data):
+        return ""
+    return data[offset:].split(b"\0", 1)[0].decode("ascii", "replace").strip()
+
+
+def _windows_serial(device_id):
+    """Serial number from the storage device descriptor of a disk"""
+    return _descriptor_string(_windows_descriptor(device_id), 24)  # SerialNumberOffset
+
+
+def _windows_device(device_id):
+    """Size and model of one disk from storage IOCTLs, None if it is gone"""
+    descriptor = _windows_descriptor(device_id)
+    if descriptor is None:
+        return None
+    number = device_id[len("disk"):]
+    # DISK_GEOMETRY_EX: a 24 byte DISK_GEOMETRY, then DiskSize. Fails for a reader without a card
+    geometry = _windows_ioctl(rf"\\.\PhysicalDrive{number}", IOCTL_DISK_GET_DRIVE_GEOMETRY_EX, out_size=256)
+    size = int.from_bytes(geometry[24:32], "little") if geometry and len(geometry) >= 32 else None
+    # VendorIdOffset and ProductIdOffset
+    model = " ".join(filter(None, (_descriptor_string(descriptor, 12), _descriptor_string(descriptor, 16))))
+    return Device(device_id, size, model, _descriptor_string(descriptor, 24))
+
+
+def _linux_volumes():
+    """Map kernel disk names to their mount points and partitions"""
+    volumes = {}
+    partitions = {}
+    try:
+        with open("/proc/mounts", "r", encoding="utf-8") as f:
+            mounts = [line.split()[:2] for line in f]
+    except OSError:
+        return volumes, partitions
+    for source, target in mounts:
+        if not source.startswith("/dev/"):
+            continue
+        name = os.path.basename(os.path.realpath(source))
+        # A partition's sysfs entry sits inside the one of its disk
+        disk = name
+        if os.path.exists(f"/sys/class/block/{name}/partition"):
+            disk = os.path.basename(os.path.realpath(f"/sys/class/block/{name}/.."))
+            partitions.setdefault(disk, []).append(name)
+        # /proc/mounts escapes spaces and other special characters as octal
+        target = re.sub(r"\\([0-7]{3})", lambda match: chr(int(match.group(1), 8)), target)
+        volumes.setdefault(disk, []).append(target)
+    return volumes, partitions
+
+
+def _read_sysfs(path):
+    """Contents of a sysfs attribute, empty if it can't be read"""
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+
+def linux_device(name):
+    """Device for a kernel disk name read from sysfs, None for virtual or missing devices"""
+    base = f"/sys/block/{name}"
+    if name.startswith(VIRTUAL_PREFIXES) or not os.path.isdir(base):
+        return None
+    sectors = _read_sysfs(f"{base}/size")
+    # The size file counts 512 byte sectors regardless of the device's sector size
+    size = int(sectors) * 512 if sectors.isdigit() else None
+    model = " ".join(filter(None, (_read_sysfs(f"{base}/device/vendor"), _read_sysfs(f"{base}/device/model"))))
+    return Device(name, size, model, _read_sysfs(f"{base}/device/serial"))
+
+
+def _linux_serial(device_id):
+    """Serial number from sysfs, empty if the driver doesn't expose one"""
+    for name in ("serial", "wwid"):
+        try:
+            with open(f"/sys/block/{device_id}/device/{name}", "r", encoding="utf-8") as f:
+                return f.read().strip()
+        except OSError:
+            continue
+    return ""
+
+
+def attach_volumes(devices):
+    """Fill in the mounted volumes, partitions and serial numbers of devices"""
+    try:
+        if os.name == "nt":
+            volumes, partitions, serial = _windows_volumes(), {}, _windows_serial
+        else:
+            (volumes, partitions), serial = _linux_volumes(), _linux_serial
+    except Exception:
+        # Volume information is optional, the device list still works without it
+        return devices
+    for device in devices:
+        device.volumes = tuple(volumes.get(device.id, device.volumes))
+        device.partitions = tuple(partitions.get(device.id, device.partitions))
+        if not device.serial:
+            try:
+                device.serial = serial(device.id)
+            except Exception:
+                pass
+    return devices
+
+
+def probe_device(device_id):
+    """Read one drive without running a process, None if it is gone or not a drive
+
+    Used after a hot-plug notification, where a full enumeration would run
+    every provider again for the sake of one drive.
+    """
+    try:
+        device = _windows_device(device_id) if os.name == "nt" else linux_device(device_id)
+    except Exception:
+        return None
+    return attach_volumes([device])[0] if device is not None else None
+
+
+class IOCounters:
+    """Cumulative read counters of a drive, as kept by the operating system"""
+    __slots__ = ("reads", "bytes_read", "read_seconds", "in_flight")
+
+    def __init__(self, reads, bytes_read, read_seconds, in_flight):
+        self.reads = reads  # Reads completed
+        self.bytes_read = bytes_read
+        self.read_seconds = read_seconds  # Time the completed reads took, summed
+        self.in_flight = in_flight  # Requests issued but not completed yet
+
+
+def _linux_io_counters(name):
+    """Counters of a kernel disk name from /proc/diskstats"""
+    with open("/proc/diskstats", "r", encoding="utf-8") as f:
+        for line in f:
+            fields = line.split()
+            if len(fields) >= 12 and fields[2] == name:
+                # Reads completed, sectors read, milliseconds spent reading, then I/Os in progress
+                return IOCounters(int(fields[3]), int(fields[5]) * 512, int(fields[6]) / 1000, int(fields[11]))
+    return None
+
+
+def _windows_io_counters(device_id):
+    """Counters of a disk from IOCTL_DISK_PERFORMANCE"""
+    number = device_id[len("disk"):]
+    data = _windows_ioctl(rf"\\.\PhysicalDrive{number}", IOCTL_DISK_PERFORMANCE, out_size=88)
+    if not data or len(data) < 52:
+        return None
+    # DISK_PERFORMANCE: BytesRead, BytesWritten, ReadTime, WriteTime, IdleTime, ReadCount, WriteCount, QueueDepth
+    bytes_read, _, read_time, _, _, reads, _, queue_depth = struct.unpack_from("<qqqqqIII", data)
+    # ReadTime counts 100 ns units
+    return IOCounters(reads, bytes_read, read_time / 1e7, queue_depth)
+
+
+def io_counters(source):
+    """Read counters of a drive given as device id, kernel name or device path
+
+    None for image files and where the system keeps no statistics.
+    """
+    try:
+        if os.name == "nt":
+            return _windows_io_counters(source) if re.fullmatch(r"disk\d+", source) else None
+        name = os.path.basename(os.path.realpath(source)) if os.sep in source else source
+        return _linux_io_counters(name)
+    except (OSError, ValueError, struct.error):
+        return None
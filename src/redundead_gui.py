@@ -1,15 +1,29 @@
-import sys
 import os
-import subprocess
-import ctypes
-import win32api
+import sys
 import threading
+import time
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                            QHBoxLayout, QLabel, QPushButton, QListWidget, 
-                           QFileDialog, QProgressBar, QMessageBox, QDialog,
-                           QRadioButton, QButtonGroup, QTextEdit)
-from PyQt5.QtCore import Qt, pyqtSignal, QObject
-from PyQt5.QtGui import QFont
+                           QListWidgetItem, QFileDialog, QProgressBar, QMessageBox, QDialog,
+                           QRadioButton, QButtonGroup, QTextEdit, QSpinBox,
+                           QTableWidget, QTableWidgetItem, QHeaderView,
+                           QAbstractItemView, QCheckBox, QComboBox, QInputDialog, QLineEdit)
+from PyQt5.QtCore import Qt, pyqtSignal, QObject, QTimer
+from PyQt5.QtGui import QTextCursor
+
+from redundead_core import (BACKENDS, LOG_MAX_BLOCKS, MAX_CONCURRENT_JOBS, PRIORITIES, RECOVERY_FOLDER_NAME,
+                            DiskCache, RecoveryJob, RecoveryScheduler, default_history, default_settings,
+                            is_admin, job_folders, make_backend)
+from redundead_devices import DeviceRegistry
+from redundead_hotplug import HotplugWatcher
+from redundead_process import CANCEL_GRACE
+from redundead_settings import PRESET_DEFAULTS, template_fields
+from redundead_space import format_bytes, preflight
+from redundead_trace import tracer
+
+# Interval of the event loop lag probe when tracing
+LAG_PROBE_INTERVAL = 100
+
 
 # Multi language
 class Translations:
@@ -23,9 +37,10 @@ class Translations:
             "language_zh": "中文",
             "language_en": "English",
             "confirm": "确认",
-            "step1_title": "步骤1: 请选择需要恢复数据的驱动器",
+            "step1_title": "步骤1: 请选择需要恢复数据的驱动器 (可多选)",
             "step2_title": "步骤2: 请选择恢复数据的保存位置",
             "step3_title": "步骤3: 数据恢复进度",
+            "step4_title": "步骤4: 恢复的片段",
             "refresh_drives": "刷新驱动器列表",
             "target_path": "目标路径:",
             "not_selected": "未选择",
@@ -44,11 +59,63 @@ class Translations:
             "source_target_same": "目标路径不能在源驱动器上",
             "admin_required": "权限不足",
             "admin_message": "REDundead需要管理员权限才能运行。\n请右键点击本程序，选择'以管理员身份运行'。",
-            "recovering": "正在从 {source} 恢复数据到 {target}\\RecoveryFolder...",
+            "recovering": "正在从 {source} 恢复数据到 {target}...",
             "success": "成功",
             "error": "错误",
             "recovery_failed": "恢复失败: {message}",
-            "log_output": "日志输出"
+            "log_output": "日志输出",
+            "recovery_stats": "速度: {speed:.1f} MB/s    剩余时间: {eta}    已找到片段: {clips}",
+            "concurrency": "同时恢复的驱动器数:",
+            "col_drive": "驱动器",
+            "col_progress": "进度",
+            "col_speed": "速度",
+            "col_eta": "剩余时间",
+            "col_clips": "片段",
+            "col_status": "状态",
+            "status_queued": "等待中",
+            "status_running": "恢复中",
+            "status_done": "完成",
+            "status_failed": "失败",
+            "jobs_finished": "{total} 个恢复任务中 {ok} 个成功",
+            "verify_clips": "校验恢复的片段 (哈希与结构检查)",
+            "dedup_clips": "将重复的片段硬链接为同一份，并标记不完整的副本",
+            "show_results": "查看恢复的片段",
+            "results_listing": "正在列出恢复的片段...",
+            "results_summary": "{folder} 中有 {count} 个片段",
+            "col_clip": "片段",
+            "col_size": "大小",
+            "col_duration": "时长",
+            "col_timecode": "时间码",
+            "backend": "恢复引擎:",
+            "backend_redundead": "REDundead",
+            "backend_native": "内置 R3D 扫描恢复",
+            "image_first": "先将驱动器制作为镜像文件, 再从镜像恢复 (适用于损坏的存储卡)",
+            "low_space": "目标磁盘只有 {free} 可用空间, 所选驱动器最多可能写入 {needed}。\n空间不足时恢复会暂停, 释放空间后可继续。是否仍要继续?",
+            "pause": "暂停",
+            "resume": "继续",
+            "cancel": "取消恢复",
+            "priority": "优先级:",
+            "priority_normal": "正常",
+            "priority_low": "低",
+            "priority_background": "后台 (不影响其他程序)",
+            "status_paused": "已暂停",
+            "cancelled": "已取消, 再次开始恢复可从中断处继续",
+            "cancel_confirm": "确定要取消正在进行的恢复吗? 之后可从中断处继续。",
+            "close_confirm": "恢复仍在进行中。关闭窗口将取消恢复, 之后可从中断处继续。是否关闭?",
+            "already_recovered": "以下驱动器之前已恢复过:\n{drives}\n是否仍要再次恢复?",
+            "recovered_on": "{drive}: {date} 恢复到 {target}, {clips} 个片段",
+            "preset": "预设:",
+            "no_preset": "无",
+            "save_preset": "保存为预设...",
+            "preset_name": "预设名称:",
+            "auto_start": "使用此预设自动恢复新插入的驱动器",
+            "folder_template": "恢复文件夹名称, 可使用 {date}, {serial}, {disk}:",
+            "quiet_log": "只显示助手自身的消息 (REDundead 的输出仍写入日志文件)",
+            "auto_no_target": "预设没有目标文件夹, 插入的驱动器不会自动恢复",
+            "auto_busy": "正在恢复, 插入的 {drives} 未自动开始",
+            "auto_holds_target": "{drive} 包含目标文件夹, 未恢复",
+            "auto_recovered_before": "{drive} 之前已恢复过, 未自动恢复",
+            "similar_recovered": "{drive} 没有序列号, {date} 曾将相同型号和容量的驱动器恢复到 {target}, 可能是同一张卡"
         }
         
         # English
@@ -58,9 +125,10 @@ class Translations:
             "language_zh": "中文",
             "language_en": "English",
             "confirm": "Confirm",
-            "step1_title": "Step 1: Select the drive to recover data from",
+            "step1_title": "Step 1: Select the drives to recover data from",
             "step2_title": "Step 2: Select destination location",
             "step3_title": "Step 3: Recovery progress",
+            "step4_title": "Step 4: Recovered clips",
             "refresh_drives": "Refresh Drives",
             "target_path": "Target path:",
             "not_selected": "Not selected",
@@ -79,11 +147,63 @@ class Translations:
             "source_target_same": "Target path cannot be on source drive",
             "admin_required": "Admin Rights Required",
             "admin_message": "REDundead requires administrator privileges to run.\nPlease right-click the program and select 'Run as administrator'.",
-            "recovering": "Recovering data from {source} to {target}\\RecoveryFolder...",
+            "recovering": "Recovering data from {source} to {target}...",
             "success": "Success",
             "error": "Error",
             "recovery_failed": "Recovery failed: {message}",
-            "log_output": "Log output"
+            "log_output": "Log output",
+            "recovery_stats": "Speed: {speed:.1f} MB/s    ETA: {eta}    Clips found: {clips}",
+            "concurrency": "Parallel recoveries:",
+            "col_drive": "Drive",
+            "col_progress": "Progress",
+            "col_speed": "Speed",
+            "col_eta": "ETA",
+            "col_clips": "Clips",
+            "col_status": "Status",
+            "status_queued": "Queued",
+            "status_running": "Recovering",
+            "status_done": "Done",
+            "status_failed": "Failed",
+            "jobs_finished": "{ok} of {total} recoveries succeeded",
+            "verify_clips": "Verify recovered clips (hash and structure check)",
+            "dedup_clips": "Hard-link duplicate clips to one copy and flag partial copies",
+            "show_results": "Show recovered clips",
+            "results_listing": "Listing recovered clips...",
+            "results_summary": "{count} clips in {folder}",
+            "col_clip": "Clip",
+            "col_size": "Size",
+            "col_duration": "Duration",
+            "col_timecode": "Timecode",
+            "backend": "Recovery engine:",
+            "backend_redundead": "REDundead",
+            "backend_native": "Built-in R3D carver",
+            "image_first": "Image the drives first and recover from the image (for failing cards)",
+            "low_space": "The target disk has {free} free, the selected drives may write up to {needed}.\nThe recovery stops before the disk is full and can be resumed after freeing space. Continue anyway?",
+            "pause": "Pause",
+            "resume": "Resume",
+            "cancel": "Cancel Recovery",
+            "priority": "Priority:",
+            "priority_normal": "Normal",
+            "priority_low": "Low",
+            "priority_background": "Background (keeps other programs responsive)",
+            "status_paused": "Paused",
+            "cancelled": "Cancelled, starting the recovery again resumes where it stopped",
+            "cancel_confirm": "Cancel the running recovery? It can be resumed later.",
+            "close_confirm": "A recovery is still running. Closing the window cancels it, it can be resumed later. Close anyway?",
+            "already_recovered": "These drives were recovered before:\n{drives}\nRecover them again?",
+            "recovered_on": "{drive}: {date} into {target}, {clips} clips",
+            "preset": "Preset:",
+            "no_preset": "None",
+            "save_preset": "Save as Preset...",
+            "preset_name": "Preset name:",
+            "auto_start": "Recover inserted drives right away with this preset",
+            "folder_template": "Recovery folder name, may use {date}, {serial}, {disk}:",
+            "quiet_log": "Only show the helper's own messages (REDundead's output still goes to the log file)",
+            "auto_no_target": "The preset has no target folder, inserted drives are not recovered automatically",
+            "auto_busy": "A recovery is running, {drives} not started automatically",
+            "auto_holds_target": "{drive} holds the target folder, not recovering it",
+            "auto_recovered_before": "{drive} was recovered before, not recovering it automatically",
+            "similar_recovered": "{drive} has no serial number, a drive of the same model and size was recovered on {date} into {target}, it may be the same card"
         }
         
         # Default is English
@@ -149,107 +269,92 @@ class LanguageDialog(QDialog):
         self.accept()
 
 
+class DriveScanner(QObject):
+    """Enumerates drives on a background thread so the window never blocks
+    
+    Also follows hot-plug notifications, updating the list for the drives
+    that changed without running a full scan.
+    """
+    drives_ready = pyqtSignal(list)
+    drives_inserted = pyqtSignal(list)  # Ids of the drives a hot-plug update added
+    log_update = pyqtSignal(str)
+    
+    def __init__(self):
+        super().__init__()
+        self.cache = DiskCache()
+        self.scanning = False
+        self.watcher = HotplugWatcher(self.device_changed)
+    
+    def start(self, force=False):
+        """Start a scan unless one is already running, return False if skipped"""
+        if self.scanning:
+            return False
+        self.scanning = True
+        thread = threading.Thread(target=self.run, args=(force,), daemon=True)
+        thread.start()
+        return True
+    
+    def run(self, force):
+        """Scan through the cache and hand the result to the GUI thread"""
+        try:
+            disks = self.cache.get(self.log_update.emit, force)
+        finally:
+            self.scanning = False
+        self.drives_ready.emit(disks)
+    
+    def device_changed(self, names):
+        """Hot-plug callback, runs on the watcher thread after a burst of notifications"""
+        before = self.cache.disks
+        disks, changed = self.cache.update(names, self.log_update.emit)
+        if changed:
+            self.drives_ready.emit(disks)
+            # Without an earlier list every drive would look inserted
+            known = {disk.id for disk in before} if before is not None else None
+            inserted = [disk.id for disk in disks if known is not None and disk.id not in known]
+            if inserted:
+                self.drives_inserted.emit(inserted)
+    
+    def stop(self):
+        """Stop following hot-plug notifications"""
+        self.watcher.stop()
+
+
 class RecoveryWorker(QObject):
     """Background worker thread responsible for performing data recovery operations"""
     progress_update = pyqtSignal(int)
+    throughput_update = pyqtSignal(float, int)  # MB/s, ETA in seconds (-1 if unknown)
+    clips_update = pyqtSignal(int)
     log_update = pyqtSignal(str)
     operation_complete = pyqtSignal(bool, str)
     
-    def __init__(self, source_drive, target_path):
+    def __init__(self, source_drive, target_path, total_bytes=None, subfolder=None, log_prefix="",
+                 verify=True, backend="redundead", image=False, priority="normal", history=None, device=None,
+                 dedup=True, folder=None, verbosity="full"):
         super().__init__()
-        # source_drive is already in the correct format (such as "disk0").
-        self.source_drive = source_drive  
+        # The recovery itself lives in the Qt-free core, its callbacks become signals
+        self.job = RecoveryJob(source_drive, target_path, total_bytes, subfolder, log_prefix, verify,
+                               make_backend(backend), image, priority, history, device, dedup,
+                               folder=folder, verbosity=verbosity)
+        self.job.on_progress = self.progress_update.emit
+        self.job.on_throughput = self.throughput_update.emit
+        self.job.on_clips = self.clips_update.emit
+        self.job.on_log = self.emit_log
+        self.log_batches = 0  # Batches emitted, compared with batches shown for the queue depth
+        self.job.on_complete = self.operation_complete.emit
         self.target_path = target_path
-        
+    
+    def emit_log(self, message):
+        """Send a log batch to the GUI thread"""
+        self.log_batches += 1
+        self.log_update.emit(message)
+    
     def run(self):
         """Executes REDundead command and sends progress updates"""
-        try:
-            # Make sure the destination folder exists
-            recovery_folder = os.path.join(self.target_path, "RecoveryFolder")
-            if not os.path.exists(recovery_folder):
-                os.makedirs(recovery_folder)
-            
-            # Directly use the obtained device identifier
-            command = f'REDundead {self.source_drive} "{recovery_folder}"'
-            self.log_update.emit(f"{command}")
-            
-            # Execute commands using subprocess
-            process = subprocess.Popen(
-                command, 
-                shell=True, 
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                bufsize=1,
-                universal_newlines=True
-            )
-            
-            # Store output
-            stdout_output = ""
-            stderr_output = ""
-            progress_value = 0
-            
-            # Non-blocking read output
-            import time
-            
-            while True:
-                # Check if the process has ended
-                return_code = process.poll()
-                
-                # Try reading from stdout
-                stdout_line = ""
-                if process.stdout:
-                    stdout_line = process.stdout.readline()
-                    if stdout_line:
-                        stdout_output += stdout_line
-                        self.log_update.emit(f"{stdout_line.strip()}")
-                        
-                        # stdout_line can be parsed here to update the actual progress
-                        # For example, if the output contains progress information
-                
-                # Try reading from stderr
-                stderr_line = ""
-                if process.stderr:
-                    stderr_line = process.stderr.readline()
-                    if stderr_line:
-                        stderr_output += stderr_line
-                        self.log_update.emit(f"Error: {stderr_line.strip()}")
-                
-                # Exit loop if process has ended and no more output
-                if return_code is not None and not (stdout_line or stderr_line):
-                    break
-                    
-                # Simulate progress update (0-95%)
-                if progress_value < 95:
-                    progress_value += 1
-                    self.progress_update.emit(progress_value)
-                
-                time.sleep(0.1)  # Shorter delay for better responsiveness
-            
-            # Collect remaining output
-            stdout_remainder, stderr_remainder = process.communicate()
-            if stdout_remainder:
-                stdout_output += stdout_remainder
-                self.log_update.emit(f"Final output: {stdout_remainder.strip()}")
-            if stderr_remainder:
-                stderr_output += stderr_remainder
-                self.log_update.emit(f"Final error: {stderr_remainder.strip()}")
-            
-            # Post-process after command completion
-            # if return_code == 0:
-            self.progress_update.emit(100)
-            self.operation_complete.emit(True, "Success")
-            # else:
-            #     self.progress_update.emit(100)
-            #     error_msg = stderr_output if stderr_output else f"Command execution failed, return code: {return_code}"
-            #     self.log_update.emit(f"Process return code: {return_code}")
-            #     self.operation_complete.emit(False, error_msg)
-                
-        except Exception as e:
-            import traceback
-            error_details = traceback.format_exc()
-            self.log_update.emit(f"Exception: {str(e)}\n{error_details}")
-            self.operation_complete.emit(False, str(e))
+        self.job.run()
+    
+    def cancel(self):
+        """Stop the recovery, called by the scheduler from the GUI thread"""
+        self.job.cancel()
 
 
 class REDundeadGUI(QMainWindow):
@@ -261,23 +366,52 @@ class REDundeadGUI(QMainWindow):
         # Create translation object
         self.tr = Translations()
         
-        # Show language selection dialog
-        lang_dialog = LanguageDialog(self)
-        if lang_dialog.exec_():
-            self.tr.set_language(lang_dialog.selected_language)
+        # Ask for the language on the first launch only, the choice is remembered
+        self.settings = default_settings()
+        language = self.settings.get("language")
+        if language is None:
+            lang_dialog = LanguageDialog(self)
+            if lang_dialog.exec_():
+                language = lang_dialog.selected_language
+                self.settings.set("language", language)
+        self.tr.set_language(language)
         
         self.initUI()
         self.current_step = 1
-        self.source_drive = None
+        self.source_drives = []
         self.target_path = None
-        self.recovery_worker = None
-        self.recovery_thread = None
+        self.results_folder = None
+        self.jobs = []
+        self.scheduler = None
+        # Set while a run started by inserting a drive, it ends without a message box
+        self.auto_run = False
+        self.paused = False
+        self.closing = False
+        # Earlier runs, so a card recovered before is recognized, opened on first use
+        self.history = None
+        self.history_opened = False
+        self.log_batches_shown = 0
+        # The preset chosen last time, its target and options fill in step 2
+        self.apply_preset()
+        
+        # Measure how late timers fire, a busy GUI thread shows up as lag in the trace
+        if tracer.enabled:
+            self.lag_expected = time.perf_counter() + LAG_PROBE_INTERVAL / 1000
+            self.lag_timer = QTimer(self)
+            self.lag_timer.timeout.connect(self.probe_lag)
+            self.lag_timer.start(LAG_PROBE_INTERVAL)
         
     def initUI(self):
         """Initialize UI"""
         self.setWindowTitle(self.tr.get("app_title"))
         self.setGeometry(300, 300, 600, 400)
         
+        # Steps 2 to 4 are built when first shown, log messages wait for step 3
+        self.step2_widget = None
+        self.step3_widget = None
+        self.step4_widget = None
+        self.pending_log = []
+        
         # Main window widget and layout
         self.central_widget = QWidget()
         self.setCentralWidget(self.central_widget)
@@ -292,13 +426,72 @@ class REDundeadGUI(QMainWindow):
         self.step1_layout.addWidget(self.step1_label)
         
         self.drive_list = QListWidget()
+        self.drive_list.setSelectionMode(QAbstractItemView.ExtendedSelection)
         self.step1_layout.addWidget(self.drive_list)
-        self.refresh_drives()  # Populate drive list
+        
+        # Failing cards are read once into <target>/Images, retries then hit the image
+        self.image_checkbox = QCheckBox(self.tr.get("image_first"))
+        self.step1_layout.addWidget(self.image_checkbox)
+        
+        # A preset holds the target and options, with auto-start inserted drives need no further clicks
+        self.preset = None
+        self.preset_layout = QHBoxLayout()
+        self.preset_label = QLabel(self.tr.get("preset"))
+        self.preset_layout.addWidget(self.preset_label)
+        self.preset_combo = QComboBox()
+        self.load_presets(self.settings.get("preset"))
+        self.preset_combo.currentIndexChanged.connect(self.preset_changed)
+        self.preset_layout.addWidget(self.preset_combo)
+        self.preset_layout.addStretch(1)
+        self.step1_layout.addLayout(self.preset_layout)
+        self.auto_start_checkbox = QCheckBox(self.tr.get("auto_start"))
+        self.auto_start_checkbox.setEnabled(False)
+        self.step1_layout.addWidget(self.auto_start_checkbox)
         
         self.refresh_button = QPushButton(self.tr.get("refresh_drives"))
         self.refresh_button.clicked.connect(self.refresh_drives)
         self.step1_layout.addWidget(self.refresh_button)
         
+        # Show the last known drives right away, then rescan in the background
+        self.devices = DeviceRegistry()
+        self.drive_scanner = DriveScanner()
+        self.drive_scanner.drives_ready.connect(self.apply_drives)
+        self.drive_scanner.log_update.connect(self.log_message)
+        self.drive_scanner.drives_inserted.connect(self.auto_start)
+        self.apply_drives(self.drive_scanner.cache.last_good)
+        self.refresh_drives()  # Populate drive list
+        # Inserted and removed cards show up without pressing refresh
+        self.drive_scanner.watcher.start()
+        
+        # Navigation buttons
+        self.nav_layout = QHBoxLayout()
+        
+        self.back_button = QPushButton(self.tr.get("back"))
+        self.back_button.clicked.connect(self.go_back)
+        self.nav_layout.addWidget(self.back_button)
+        
+        self.next_button = QPushButton(self.tr.get("next"))
+        self.next_button.clicked.connect(self.go_next)
+        self.nav_layout.addWidget(self.next_button)
+        
+        self.start_button = QPushButton(self.tr.get("start_recovery"))
+        self.start_button.clicked.connect(self.start_recovery)
+        self.start_button.setVisible(False)
+        self.nav_layout.addWidget(self.start_button)
+        
+        self.finish_button = QPushButton(self.tr.get("finish"))
+        self.finish_button.clicked.connect(self.close)
+        self.finish_button.setVisible(False)
+        self.nav_layout.addWidget(self.finish_button)
+        
+        self.main_layout.addLayout(self.nav_layout)
+        
+        # Initially show step 1
+        self.main_layout.insertWidget(0, self.step1_widget)
+        self.back_button.setEnabled(False)
+    
+    def build_step2(self):
+        """Build the target path step"""
         # Step 2: Select target path
         self.step2_widget = QWidget()
         self.step2_layout = QVBoxLayout(self.step2_widget)
@@ -320,6 +513,49 @@ class REDundeadGUI(QMainWindow):
         
         self.step2_layout.addLayout(self.path_selection_layout)
         
+        self.folder_label = QLabel(self.tr.get("folder_template"))
+        self.step2_layout.addWidget(self.folder_label)
+        self.folder_edit = QLineEdit(RECOVERY_FOLDER_NAME)
+        self.step2_layout.addWidget(self.folder_edit)
+        
+        self.concurrency_layout = QHBoxLayout()
+        self.concurrency_label = QLabel(self.tr.get("concurrency"))
+        self.concurrency_layout.addWidget(self.concurrency_label)
+        self.concurrency_spin = QSpinBox()
+        self.concurrency_spin.setRange(1, 8)
+        self.concurrency_spin.setValue(MAX_CONCURRENT_JOBS)
+        self.concurrency_layout.addWidget(self.concurrency_spin)
+        self.concurrency_layout.addStretch(1)
+        self.step2_layout.addLayout(self.concurrency_layout)
+        
+        self.backend_layout = QHBoxLayout()
+        self.backend_label = QLabel(self.tr.get("backend"))
+        self.backend_layout.addWidget(self.backend_label)
+        self.backend_combo = QComboBox()
+        for name in BACKENDS:
+            self.backend_combo.addItem(self.tr.get(f"backend_{name}"), name)
+        self.backend_layout.addWidget(self.backend_combo)
+        self.backend_layout.addStretch(1)
+        self.step2_layout.addLayout(self.backend_layout)
+        
+        self.verify_checkbox = QCheckBox(self.tr.get("verify_clips"))
+        self.verify_checkbox.setChecked(True)
+        self.step2_layout.addWidget(self.verify_checkbox)
+        
+        self.dedup_checkbox = QCheckBox(self.tr.get("dedup_clips"))
+        self.dedup_checkbox.setChecked(True)
+        self.step2_layout.addWidget(self.dedup_checkbox)
+        
+        self.quiet_checkbox = QCheckBox(self.tr.get("quiet_log"))
+        self.step2_layout.addWidget(self.quiet_checkbox)
+        
+        self.save_preset_button = QPushButton(self.tr.get("save_preset"))
+        self.save_preset_button.clicked.connect(self.save_preset)
+        self.step2_layout.addWidget(self.save_preset_button)
+        self.fill_step2(self.preset or PRESET_DEFAULTS)
+    
+    def build_step3(self):
+        """Build the recovery progress step"""
         # Step 3: Recovery progress
         self.step3_widget = QWidget()
         self.step3_layout = QVBoxLayout(self.step3_widget)
@@ -336,6 +572,40 @@ class REDundeadGUI(QMainWindow):
         self.progress_bar.setValue(0)
         self.step3_layout.addWidget(self.progress_bar)
 
+        self.stats_label = QLabel(self.tr.get("recovery_stats").format(speed=0, eta="--:--:--", clips=0))
+        self.step3_layout.addWidget(self.stats_label)
+
+        # Pause, cancel and priority apply to every job of the run
+        self.control_layout = QHBoxLayout()
+        self.pause_button = QPushButton(self.tr.get("pause"))
+        self.pause_button.clicked.connect(self.toggle_pause)
+        self.pause_button.setEnabled(False)
+        self.control_layout.addWidget(self.pause_button)
+        self.cancel_button = QPushButton(self.tr.get("cancel"))
+        self.cancel_button.clicked.connect(self.cancel_recovery)
+        self.cancel_button.setEnabled(False)
+        self.control_layout.addWidget(self.cancel_button)
+        self.control_layout.addStretch(1)
+        self.priority_label = QLabel(self.tr.get("priority"))
+        self.control_layout.addWidget(self.priority_label)
+        self.priority_combo = QComboBox()
+        for name in PRIORITIES:
+            self.priority_combo.addItem(self.tr.get(f"priority_{name}"), name)
+        self.priority_combo.currentIndexChanged.connect(self.change_priority)
+        self.control_layout.addWidget(self.priority_combo)
+        self.step3_layout.addLayout(self.control_layout)
+
+        # One row per drive with its own progress, speed and status
+        self.job_table = QTableWidget(0, 6)
+        self.job_table.setHorizontalHeaderLabels([
+            self.tr.get(key) for key in
+            ("col_drive", "col_progress", "col_speed", "col_eta", "col_clips", "col_status")
+        ])
+        self.job_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.job_table.verticalHeader().setVisible(False)
+        self.job_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.step3_layout.addWidget(self.job_table)
+
         # Add log output area
         self.log_label = QLabel(self.tr.get("log_output"))
         self.step3_layout.addWidget(self.log_label)
@@ -343,153 +613,50 @@ class REDundeadGUI(QMainWindow):
         self.log_text = QTextEdit()
         self.log_text.setReadOnly(True)
         self.log_text.setMinimumHeight(150)
+        # Cap the document so long runs can't grow it without limit
+        self.log_text.document().setMaximumBlockCount(LOG_MAX_BLOCKS)
         self.step3_layout.addWidget(self.log_text)
 
-        # Navigation buttons
-        self.nav_layout = QHBoxLayout()
-        
-        self.back_button = QPushButton(self.tr.get("back"))
-        self.back_button.clicked.connect(self.go_back)
-        self.nav_layout.addWidget(self.back_button)
-        
-        self.next_button = QPushButton(self.tr.get("next"))
-        self.next_button.clicked.connect(self.go_next)
-        self.nav_layout.addWidget(self.next_button)
-        
-        self.start_button = QPushButton(self.tr.get("start_recovery"))
-        self.start_button.clicked.connect(self.start_recovery)
-        self.start_button.setVisible(False)
-        self.nav_layout.addWidget(self.start_button)
-        
-        self.finish_button = QPushButton(self.tr.get("finish"))
-        self.finish_button.clicked.connect(self.close)
-        self.finish_button.setVisible(False)
-        self.nav_layout.addWidget(self.finish_button)
-        
-        self.main_layout.addLayout(self.nav_layout)
-        
-        # Initially show step 1
-        self.main_layout.insertWidget(0, self.step1_widget)
-        self.step2_widget.setVisible(False)
-        self.step3_widget.setVisible(False)
-        self.back_button.setEnabled(False)
+        # Messages logged before the step was built, such as drive scan diagnostics
+        if self.pending_log:
+            self.log_text.append("\n".join(self.pending_log))
+            self.pending_log = []
         
     def refresh_drives(self):
-        """Refresh available disk list"""
-        self.drive_list.clear()
-        disks = self.get_physical_disks()
-        for disk in disks:
-            self.drive_list.addItem(f"{disk['name']} - {disk['description']}")
-    
-    def get_physical_disks(self):
-        """Get available physical disks using REDundead command"""
-        disks = []
-        try:
-            # Use REDundead command directly to get device list
-            result = subprocess.run(
-                ['REDundead'], 
-                capture_output=True, 
-                text=True, 
-                shell=True
-            )
-            
-            output = result.stdout
-            
-            # Add output to log
-            if hasattr(self, 'log_text'):
-                self.log_text.append(f"REDundead device list output:\n{output}")
-            
-            # Parse output to get device list
-            lines = output.strip().split('\n')
-            device_section_started = False
-            
-            for line in lines:
-                # Find device list header line
-                if "Device    Size       Name" in line:
-                    device_section_started = True
-                    continue
-                    
-                # Start parsing device list section
-                if device_section_started and line.strip():
-                    # Check if there is a device identifier starting with "disk"
-                    parts = line.strip().split()
-                    if parts and parts[0].startswith('disk'):
-                        # Extract device information
-                        device_id = parts[0]  # e.g. 'disk0'
-                        size = parts[1] + " " + parts[2]  # e.g. '954 GB'
-                        
-                        # Names may contain spaces and require special handling
-                        name_parts = parts[3:]
-                        device_name = ' '.join(name_parts)
-                        
-                        # Create disk dictionary and add to list
-                        disk = {
-                            'name': device_id,
-                            'description': f"{size} - {device_name}"
-                        }
-                        disks.append(disk)
-            
-            # Fallback if no devices found
-            if not disks:
-                error_msg = "Failed to parse device list from REDundead output"
-                print(error_msg)
-                if hasattr(self, 'log_text'):
-                    self.log_text.append(error_msg)
-                    self.log_text.append("Attempting to use fallback method")
-                
-                # Use an alternate method to obtain disk information
-                return self.get_physical_disks_fallback()
-                
-        except Exception as e:
-            error_msg = f"Error executing REDundead command: {str(e)}"
-            print(error_msg)
-            if hasattr(self, 'log_text'):
-                self.log_text.append(error_msg)
-                self.log_text.append("Using fallback method")
-            
-            # Fallback method when errors occur
-            return self.get_physical_disks_fallback()
+        """Refresh available disk list in the background"""
+        if self.drive_scanner.start():
+            self.refresh_button.setEnabled(False)
+    
+    def apply_drives(self, disks):
+        """Update the drive list in place, keeping the selection of unchanged drives"""
+        self.refresh_button.setEnabled(not self.drive_scanner.scanning)
+        # Sizes for progress and ETA, volumes for the target check
+        self.devices.update(disks)
+        texts = {disk.id: f"{disk.id} - {disk.description}" for disk in disks}
         
-        return disks
-
-    def get_physical_disks_fallback(self):
-        """Fallback method: Get physical disk info using wmic command"""
-        disks = []
-        try:
-            # Use wmic command to obtain physical disk information
-            result = subprocess.run(
-                ['wmic', 'diskdrive', 'get', 'index,caption,size'], 
-                capture_output=True, text=True, shell=True
-            )
-            
-            lines = result.stdout.strip().split('\n')
-            # Skip header row
-            for line in lines[1:]:
-                parts = line.strip().split()
-                if not parts:
-                    continue
-                
-                try:
-                    index = parts[0]
-                    if index.isdigit():
-                        # Concatenate the rest as a description
-                        description = ' '.join(parts[1:])
-                        
-                        # Create Disk Item
-                        disk = {
-                            'name': f"disk{index}",
-                            'description': description
-                        }
-                        disks.append(disk)
-                except:
-                    pass
-        except Exception as e:
-            error_msg = f"Fallback method error: {e}"
-            print(error_msg)
-            if hasattr(self, 'log_text'):
-                self.log_text.append(error_msg)
-        
-        return disks
+        # Remove drives that are gone and refresh the text of the rest
+        for row in reversed(range(self.drive_list.count())):
+            item = self.drive_list.item(row)
+            name = item.data(Qt.UserRole)
+            if name not in texts:
+                self.drive_list.takeItem(row)
+            elif item.text() != texts[name]:
+                item.setText(texts[name])
+        
+        # Add new drives in the order they were reported
+        present = {self.drive_list.item(row).data(Qt.UserRole) for row in range(self.drive_list.count())}
+        for row, disk in enumerate(disks):
+            if disk.id not in present:
+                item = QListWidgetItem(texts[disk.id])
+                item.setData(Qt.UserRole, disk.id)
+                self.drive_list.insertItem(min(row, self.drive_list.count()), item)
+    
+    def log_message(self, message):
+        """Append a diagnostic message to the log view, or keep it until the view is built"""
+        if self.step3_widget is None:
+            self.pending_log.append(message)
+        else:
+            self.log_text.append(message)
     
     def browse_target_path(self):
         """Open dialog to select target path"""
@@ -498,6 +665,118 @@ class REDundeadGUI(QMainWindow):
             self.target_path = folder
             self.selected_path_label.setText(folder)
     
+    def load_presets(self, selected=None):
+        """List the saved presets in the preset box and select one by name"""
+        self.preset_combo.blockSignals(True)
+        self.preset_combo.clear()
+        self.preset_combo.addItem(self.tr.get("no_preset"), None)
+        for name in self.settings.presets():
+            self.preset_combo.addItem(name, name)
+        index = self.preset_combo.findData(selected)
+        self.preset_combo.setCurrentIndex(max(index, 0))
+        self.preset_combo.blockSignals(False)
+    
+    def preset_changed(self):
+        """Remember the chosen preset for the next launch and apply it"""
+        self.settings.set("preset", self.preset_combo.currentData())
+        self.apply_preset()
+    
+    def apply_preset(self):
+        """Take the target and options of the selected preset"""
+        self.preset = None
+        name = self.preset_combo.currentData()
+        if name:
+            try:
+                self.preset = self.settings.preset(name)
+            except (KeyError, ValueError) as e:
+                self.log_message(e.args[0])
+        self.auto_start_checkbox.setEnabled(self.preset is not None)
+        self.auto_start_checkbox.setChecked(bool(self.preset and self.preset["auto_start"]))
+        if self.preset and self.preset["target"]:
+            self.target_path = self.preset["target"]
+        if self.step2_widget is not None:
+            self.fill_step2(self.preset or PRESET_DEFAULTS)
+    
+    def fill_step2(self, preset):
+        """Set the options of step 2 from a preset"""
+        if self.target_path:
+            self.selected_path_label.setText(self.target_path)
+        self.folder_edit.setText(preset["folder"] or RECOVERY_FOLDER_NAME)
+        self.concurrency_spin.setValue(preset["jobs"] or MAX_CONCURRENT_JOBS)
+        self.verify_checkbox.setChecked(preset["verify"])
+        self.quiet_checkbox.setChecked(preset["verbosity"] == "quiet")
+    
+    def save_preset(self):
+        """Save the target and options of step 2 as a preset"""
+        name, ok = QInputDialog.getText(self, self.tr.get("save_preset"), self.tr.get("preset_name"),
+                                        text=self.preset_combo.currentData() or "")
+        name = name.strip()
+        if not ok or not name:
+            return
+        values = {
+            "target": self.target_path,
+            "folder": self.folder_edit.text().strip() or None,
+            "jobs": self.concurrency_spin.value(),
+            "verify": self.verify_checkbox.isChecked(),
+            "verbosity": "quiet" if self.quiet_checkbox.isChecked() else "full",
+            "auto_start": self.auto_start_checkbox.isChecked(),
+        }
+        try:
+            self.settings.save_preset(name, values)
+        except ValueError as e:
+            QMessageBox.warning(self, self.tr.get("warning"), e.args[0])
+            return
+        self.settings.set("preset", name)
+        self.load_presets(name)
+        self.apply_preset()
+    
+    def auto_start(self, drives):
+        """Recover inserted drives right away with the selected preset, without asking anything"""
+        if self.preset is None or not self.auto_start_checkbox.isChecked():
+            return
+        if any(not job['done'] for job in self.jobs):
+            self.log_message(self.tr.get("auto_busy").format(drives=", ".join(drives)))
+            return
+        target = self.preset["target"]
+        if not target:
+            self.log_message(self.tr.get("auto_no_target"))
+            return
+        messages = []
+        history = self.recovery_history()
+        for drive in list(drives):
+            if self.devices.overlaps([drive], target):
+                messages.append(self.tr.get("auto_holds_target").format(drive=drive))
+            elif history and history.last_recovery(self.devices.get(drive)):
+                messages.append(self.tr.get("auto_recovered_before").format(drive=drive))
+            else:
+                # A drive without a serial number is recovered, with a hint if a similar one was before
+                hint = self.similar_hint(history, drive)
+                if hint:
+                    messages.append(hint)
+                continue
+            drives.remove(drive)
+        if drives:
+            self.source_drives = drives
+            self.target_path = target
+            if self.step2_widget is None:
+                self.build_step2()
+            self.fill_step2(self.preset)
+            if self.step3_widget is None:
+                self.build_step3()
+            # Straight to the progress step, from wherever the window was
+            current = {1: self.step1_widget, 2: self.step2_widget, 3: self.step3_widget, 4: self.step4_widget}
+            current[self.current_step].setVisible(False)
+            self.main_layout.insertWidget(0, self.step3_widget)
+            self.step3_widget.setVisible(True)
+            self.current_step = 3
+            self.next_button.setVisible(False)
+            self.finish_button.setVisible(False)
+            self.start_button.setVisible(True)
+            self.auto_run = True
+            self.start_recovery()
+        for message in messages:
+            self.log_message(message)
+    
     def go_back(self):
         """Navigate to previous step"""
         if self.current_step == 2:
@@ -515,21 +794,32 @@ class REDundeadGUI(QMainWindow):
             self.step2_widget.setVisible(True)
             self.current_step = 2
             self.back_button.setEnabled(True)
+            self.next_button.setText(self.tr.get("next"))
             self.next_button.setVisible(True)
             self.start_button.setVisible(True)
             self.finish_button.setVisible(False)
+        elif self.current_step == 4:
+            self.step4_widget.setVisible(False)
+            self.main_layout.insertWidget(0, self.step3_widget)
+            self.step3_widget.setVisible(True)
+            self.current_step = 3
+            self.next_button.setVisible(True)
 
     def go_next(self):
         """Navigate to next step"""
         if self.current_step == 1:
             # From step 1 to step 2
-            if not self.drive_list.currentItem():
+            selected_items = self.drive_list.selectedItems()
+            if not selected_items:
                 QMessageBox.warning(self, self.tr.get("warning"), self.tr.get("select_drive"))
                 return
                 
-            selected_drive = self.drive_list.currentItem().text().split(" - ")[0]
-            self.source_drive = selected_drive
+            self.source_drives = [item.data(Qt.UserRole) for item in selected_items]
+            if not self.confirm_recovered_again():
+                return
             
+            if self.step2_widget is None:
+                self.build_step2()
             self.step1_widget.setVisible(False)
             self.main_layout.insertWidget(0, self.step2_widget)
             self.step2_widget.setVisible(True)
@@ -543,12 +833,36 @@ class REDundeadGUI(QMainWindow):
             if not self.target_path:
                 QMessageBox.warning(self, self.tr.get("warning"), self.tr.get("select_folder_warning"))
                 return
+            try:
+                template_fields(self.folder_edit.text())
+            except ValueError as e:
+                QMessageBox.warning(self, self.tr.get("warning"), e.args[0])
+                return
                 
             # Check that the destination path is not on the source drive
-            if self.target_path.startswith(self.source_drive):
+            if self.devices.overlaps(self.source_drives, self.target_path):
                 QMessageBox.warning(self, self.tr.get("warning"), self.tr.get("source_target_same"))
                 return
+            
+            # Pre-flight check against the worst case the selected drives can produce
+            needed, free = preflight(
+                self.target_path,
+                [self.devices.size(drive) for drive in self.source_drives],
+                self.image_checkbox.isChecked()
+            )
+            if needed > free:
+                answer = QMessageBox.question(
+                    self,
+                    self.tr.get("warning"),
+                    self.tr.get("low_space").format(free=format_bytes(free), needed=format_bytes(needed)),
+                    QMessageBox.Yes | QMessageBox.No,
+                    QMessageBox.No
+                )
+                if answer != QMessageBox.Yes:
+                    return
                 
+            if self.step3_widget is None:
+                self.build_step3()
             self.step2_widget.setVisible(False)
             self.main_layout.insertWidget(0, self.step3_widget)
             self.step3_widget.setVisible(True)
@@ -556,13 +870,75 @@ class REDundeadGUI(QMainWindow):
             self.back_button.setEnabled(True)
             self.next_button.setVisible(False)
             self.start_button.setVisible(True)
+            self.auto_run = False
+            
+        elif self.current_step == 3:
+            # From step 3 to the recovered clips
+            if self.step4_widget is None:
+                # Imported on demand, the preview code is only needed once a recovery is done
+                from redundead_results import ResultsWidget
+                self.step4_widget = ResultsWidget(self.tr)
+            self.step3_widget.setVisible(False)
+            self.main_layout.insertWidget(0, self.step4_widget)
+            self.step4_widget.setVisible(True)
+            self.step4_widget.load(self.results_folder)
+            self.current_step = 4
+            self.next_button.setVisible(False)
+    
+    def confirm_recovered_again(self):
+        """Ask before recovering drives the history shows as recovered, True to go on"""
+        history = self.recovery_history()
+        if not history:
+            return True
+        lines = []
+        hints = []
+        for drive in self.source_drives:
+            run = history.last_recovery(self.devices.get(drive))
+            if run:
+                lines.append(self.tr.get("recovered_on").format(
+                    drive=drive, date=time.strftime("%Y-%m-%d %H:%M", time.localtime(run['started'])),
+                    target=run['target'], clips=run['clips']
+                ))
+            else:
+                hint = self.similar_hint(history, drive)
+                if hint:
+                    hints.append(hint)
+        if not lines:
+            # Only similar drives, nothing to decide
+            if hints:
+                QMessageBox.information(self, self.tr.get("warning"), "\n".join(hints))
+            return True
+        text = self.tr.get("already_recovered").format(drives="\n".join(lines))
+        if hints:
+            text = "\n".join(hints) + "\n\n" + text
+        answer = QMessageBox.question(
+            self,
+            self.tr.get("warning"),
+            text,
+            QMessageBox.Yes | QMessageBox.No,
+            QMessageBox.No
+        )
+        return answer == QMessageBox.Yes
+    
+    def similar_hint(self, history, drive):
+        """Hint that a drive without a serial number may have been recovered before, None if not"""
+        run = history.similar_recovery(self.devices.get(drive)) if history else None
+        if not run:
+            return None
+        return self.tr.get("similar_recovered").format(
+            drive=drive, date=time.strftime("%Y-%m-%d %H:%M", time.localtime(run['started'])), target=run['target']
+        )
+    
+    def recovery_history(self):
+        """Open the recovery history on first use, None if it can't be used"""
+        if not self.history_opened:
+            self.history_opened = True
+            self.history = default_history(self.log_message)
+        return self.history
     
     def is_admin(self):
         """Check if running with admin privileges"""
-        try:
-            return ctypes.windll.shell32.IsUserAnAdmin()
-        except:
-            return False
+        return is_admin()
     
     def start_recovery(self):
         """Start data recovery process"""
@@ -578,57 +954,294 @@ class REDundeadGUI(QMainWindow):
         # Disable navigation buttons
         self.back_button.setEnabled(False)
         self.start_button.setEnabled(False)
+        self.next_button.setVisible(False)
         
         # Clear log
         self.log_text.clear()
         
-        # Update UI
-        self.recovery_info_label.setText(
-            self.tr.get("recovering").format(source=self.source_drive, target=self.target_path)
-        )
+        # Corrected progress bar value
+        self.progress_bar.setValue(0)
+        self.job_table.setRowCount(len(self.source_drives))
+        self.jobs = []
+        self.paused = False
+        self.log_batches_shown = 0
+        self.pause_button.setText(self.tr.get("pause"))
+        self.pause_button.setEnabled(True)
+        self.cancel_button.setEnabled(True)
         
-        # Create recovery worker thread
-        self.recovery_worker = RecoveryWorker(self.source_drive, self.target_path)
-        self.recovery_worker.progress_update.connect(self.update_progress)
-        self.recovery_worker.log_update.connect(self.update_log)  # Connection log update signal
-        self.recovery_worker.operation_complete.connect(self.recovery_finished)
+        # Several drives write to RecoveryFolder/<diskN> and tag their log lines
+        multiple = len(self.source_drives) > 1
+        self.scheduler = RecoveryScheduler(self.concurrency_spin.value())
+        for row, drive in enumerate(self.source_drives):
+            folder, subfolder = job_folders(self.folder_edit.text().strip(), drive, self.devices.get(drive), multiple)
+            worker = RecoveryWorker(
+                drive,
+                self.target_path,
+                self.devices.size(drive),
+                subfolder=subfolder,
+                log_prefix=f"[{drive}] " if multiple else "",
+                verify=self.verify_checkbox.isChecked(),
+                backend=self.backend_combo.currentData(),
+                image=self.image_checkbox.isChecked(),
+                priority=self.priority_combo.currentData(),
+                history=self.recovery_history(),
+                device=self.devices.get(drive),
+                dedup=self.dedup_checkbox.isChecked(),
+                folder=folder,
+                verbosity="quiet" if self.quiet_checkbox.isChecked() else "full"
+            )
+            # A slow or stalled drive makes the queue start fewer drives at once
+            worker.job.throttle = self.scheduler.throttle
+            worker.job.unthrottle = self.scheduler.unthrottle
+            worker.progress_update.connect(lambda value, row=row: self.update_progress(row, value))
+            worker.throughput_update.connect(
+                lambda speed, eta, row=row: self.update_throughput(row, speed, eta)
+            )
+            worker.clips_update.connect(lambda count, row=row: self.update_clips(row, count))
+            worker.log_update.connect(self.show_job_log)  # Connection log update signal
+            worker.operation_complete.connect(
+                lambda success, message, row=row: self.recovery_finished(row, success, message)
+            )
+            
+            job = {
+                'drive': drive,
+                'worker': worker,
+                'progress': 0,
+                'speed': 0.0,
+                'eta': -1,
+                'clips': 0,
+                'status': "status_queued",
+                'done': False,
+                'success': False
+            }
+            self.jobs.append(job)
+            
+            job_progress = QProgressBar()
+            job_progress.setRange(0, 100)
+            self.job_table.setCellWidget(row, 1, job_progress)
+            self.job_table.setItem(row, 0, QTableWidgetItem(drive))
+            for column in range(2, 6):
+                self.job_table.setItem(row, column, QTableWidgetItem())
+            self.update_job_row(row)
         
-        # Corrected progress bar value
-        self.recovery_worker.progress_bar_value = 0
+        self.update_stats_label()
         
-        # Starting a Thread
-        self.recovery_thread = threading.Thread(target=self.recovery_worker.run)
-        self.recovery_thread.daemon = True  # Make sure the thread exits when the main program exits
-        self.recovery_thread.start()
+        # The folder holding every job's clips, shown here and listed by the results step
+        self.results_folder = os.path.commonpath([job['worker'].job.recovery_folder for job in self.jobs])
+        self.recovery_info_label.setText(
+            self.tr.get("recovering").format(source=", ".join(self.source_drives), target=self.results_folder)
+        )
+        
+        # Starting the workers, the scheduler keeps at most N running at once
+        for job in self.jobs:
+            self.scheduler.submit(job['worker'])
 
+    def toggle_pause(self):
+        """Pause every running job and hold the queued ones, or resume them"""
+        pause = not self.paused
+        if pause:
+            # Nothing new starts while the jobs are paused
+            self.scheduler.hold(True)
+        for row, job in enumerate(self.jobs):
+            if job['done']:
+                continue
+            recovery = job['worker'].job
+            if pause and recovery.pause():
+                job['status'] = "status_paused"
+            elif not pause and recovery.resume():
+                job['status'] = "status_running"
+            self.update_job_row(row)
+        # The batch counts as paused only if a job is paused or held back, whatever was asked
+        waiting = ("status_paused", "status_queued") if pause else ("status_paused",)
+        self.paused = any(not job['done'] and job['status'] in waiting for job in self.jobs)
+        self.scheduler.hold(self.paused)
+        self.pause_button.setText(self.tr.get("resume" if self.paused else "pause"))
+    
+    def cancel_recovery(self):
+        """Cancel queued and running jobs after asking"""
+        reply = QMessageBox.question(self, self.tr.get("warning"), self.tr.get("cancel_confirm"),
+                                     QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+        if reply == QMessageBox.Yes:
+            self.cancel_jobs()
+    
+    def cancel_jobs(self):
+        """Cancel every job, queued jobs are finished right away"""
+        if not self.scheduler:
+            return
+        self.pause_button.setEnabled(False)
+        self.cancel_button.setEnabled(False)
+        dropped = self.scheduler.cancel()
+        for row, job in enumerate(self.jobs):
+            if job['worker'] in dropped:
+                self.recovery_finished(row, False, self.tr.get("cancelled"))
+    
+    def change_priority(self, index):
+        """Apply the selected priority to every job that hasn't finished"""
+        level = self.priority_combo.itemData(index)
+        for job in self.jobs:
+            if not job['done']:
+                job['worker'].job.set_priority(level)
+    
+    def closeEvent(self, event):
+        """Cancel running jobs before closing, so no REDundead process outlives the window"""
+        if not any(not job['done'] for job in self.jobs):
+            self.stop_background()
+            event.accept()
+            return
+        reply = QMessageBox.question(self, self.tr.get("warning"), self.tr.get("close_confirm"),
+                                     QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+        if reply != QMessageBox.Yes:
+            event.ignore()
+            return
+        self.closing = True
+        self.cancel_jobs()
+        # Long enough for REDundead to exit or be killed after its grace period
+        self.scheduler.wait(CANCEL_GRACE + 2)
+        self.stop_background()
+        event.accept()
+    
+    def stop_background(self):
+        """Stop the hot-plug watcher and drop the thumbnail loads still queued by the results step"""
+        self.drive_scanner.stop()
+        if self.step4_widget is not None:
+            self.step4_widget.shutdown()
+    
     # Add a new method to update the log
+    def probe_lag(self):
+        """Record how late the lag probe timer fired"""
+        now = time.perf_counter()
+        tracer.counter("event_loop_lag", ms=max(now - self.lag_expected, 0) * 1000)
+        self.lag_expected = now + LAG_PROBE_INTERVAL / 1000
+    
+    def show_job_log(self, message):
+        """Show a log batch from a worker, tracking batches still queued for the GUI thread"""
+        self.log_batches_shown += 1
+        if tracer.enabled:
+            emitted = sum(job['worker'].log_batches for job in self.jobs)
+            tracer.counter("log_signal_queue", depth=emitted - self.log_batches_shown)
+        self.update_log(message)
+    
+    @tracer.traced("update_log")
     def update_log(self, message):
         """Changelog text box"""
-        self.log_text.append(message)
+        # One insert per batch, messages may hold many newline-separated lines
+        cursor = QTextCursor(self.log_text.document())
+        cursor.movePosition(QTextCursor.End)
+        if not self.log_text.document().isEmpty():
+            message = "\n" + message
+        cursor.insertText(message)
         # Scroll to bottom
         scrollbar = self.log_text.verticalScrollBar()
         scrollbar.setValue(scrollbar.maximum())
     
-    def update_progress(self, value):
-        """Update progress bar"""
-        self.progress_bar.setValue(value)
+    def update_progress(self, row, value):
+        """Update progress of one job and the overall progress bar"""
+        job = self.jobs[row]
+        job['progress'] = value
+        if self.paused and not job['done'] and job['status'] == "status_queued" and job['worker'].job.pause():
+            # Was already starting when the batch was paused
+            job['status'] = "status_paused"
+        if not job['done'] and job['status'] != "status_paused":
+            job['status'] = "status_running"
+        self.update_job_row(row)
+        self.progress_bar.setValue(sum(job['progress'] for job in self.jobs) // len(self.jobs))
     
-    def recovery_finished(self, success, message):
-        """Handle recovery completion"""
-        if success:
-            self.recovery_info_label.setText(message)
-            QMessageBox.information(self, self.tr.get("success"), message)
+    def update_throughput(self, row, speed, eta):
+        """Update scan speed and remaining time of one job"""
+        self.jobs[row]['speed'] = speed
+        self.jobs[row]['eta'] = eta
+        self.update_job_row(row)
+        self.update_stats_label()
+    
+    def update_clips(self, row, count):
+        """Update number of clips found by one job"""
+        self.jobs[row]['clips'] = count
+        self.update_job_row(row)
+        self.update_stats_label()
+    
+    def format_eta(self, eta):
+        """Format seconds as HH:MM:SS"""
+        if eta < 0:
+            return "--:--:--"
+        minutes, seconds = divmod(eta, 60)
+        hours, minutes = divmod(minutes, 60)
+        return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+    
+    def update_job_row(self, row):
+        """Render one job in the job table"""
+        job = self.jobs[row]
+        self.job_table.cellWidget(row, 1).setValue(job['progress'])
+        self.job_table.item(row, 2).setText(f"{job['speed']:.1f} MB/s")
+        self.job_table.item(row, 3).setText(self.format_eta(job['eta']))
+        self.job_table.item(row, 4).setText(str(job['clips']))
+        self.job_table.item(row, 5).setText(self.tr.get(job['status']))
+    
+    def update_stats_label(self):
+        """Render total speed, longest ETA and clip count across jobs"""
+        running = [job for job in self.jobs if not job['done']]
+        speed = sum(job['speed'] for job in running)
+        eta = max((job['eta'] for job in running), default=-1)
+        clips = sum(job['clips'] for job in self.jobs)
+        self.stats_label.setText(
+            self.tr.get("recovery_stats").format(speed=speed, eta=self.format_eta(eta), clips=clips)
+        )
+    
+    def recovery_finished(self, row, success, message):
+        """Handle completion of one job, report once all jobs are done"""
+        job = self.jobs[row]
+        job['done'] = True
+        job['success'] = success
+        job['status'] = "status_done" if success else "status_failed"
+        if not success:
+            self.update_log(f"[{job['drive']}] " + self.tr.get("recovery_failed").format(message=message))
+        self.update_job_row(row)
+        self.update_stats_label()
+        
+        if self.closing or not all(job['done'] for job in self.jobs):
+            return
+        
+        if len(self.jobs) == 1:
+            if success:
+                self.recovery_info_label.setText(message)
+            else:
+                self.recovery_info_label.setText(self.tr.get("recovery_failed").format(message=message))
+            self.report_finished(success, message)
         else:
-            self.recovery_info_label.setText(self.tr.get("recovery_failed").format(message=message))
-            QMessageBox.critical(self, self.tr.get("error"), message)
+            succeeded = sum(1 for job in self.jobs if job['success'])
+            summary = self.tr.get("jobs_finished").format(ok=succeeded, total=len(self.jobs))
+            self.recovery_info_label.setText(summary)
+            self.report_finished(succeeded == len(self.jobs), summary)
         
         # Update IO
+        self.pause_button.setEnabled(False)
+        self.cancel_button.setEnabled(False)
         self.finish_button.setVisible(True)
+        self.next_button.setText(self.tr.get("show_results"))
+        self.next_button.setVisible(True)
         self.start_button.setVisible(False)
         self.back_button.setEnabled(True)
+    
+    def report_finished(self, success, message):
+        """Show the outcome of the run, only in the log when it started on its own"""
+        if self.auto_run:
+            self.update_log(message)
+        elif success:
+            QMessageBox.information(self, self.tr.get("success"), message)
+        else:
+            QMessageBox.critical(self, self.tr.get("error"), message)
 
 
 if __name__ == "__main__":
+    # Imported here, building the window needs neither
+    import ctypes
+    import multiprocessing
+    
+    # Needed by the native carver's process pool in frozen Windows builds
+    multiprocessing.freeze_support()
+    
+    # REDUNDEAD_TRACE and REDUNDEAD_PROFILE turn on telemetry, written when the app exits
+    tracer.configure()
+    
     # Restart with admin rights if needed
     if not ctypes.windll.shell32.IsUserAnAdmin():
         # Try restarting as an administrator
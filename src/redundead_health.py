@@ -0,0 +1,143 @@
+"""Read health of the source drive during a recovery
+
+HealthMonitor samples the drive's I/O counters every HEALTH_INTERVAL
+seconds, from /proc/diskstats on Linux and IOCTL_DISK_PERFORMANCE on
+Windows. Each sample gives the read throughput, the average latency of the
+reads completed since the last one and the reads still in flight. The 95th
+percentile of the latencies over the last HEALTH_WINDOW samples is the tail
+latency. The drive is
+
+    ok       while reads complete at a normal latency
+    slow     once the tail latency stayed above SLOW_LATENCY for SLOW_SECONDS
+    stalled  once reads were in flight for STALL_SECONDS without one completing
+
+Every change of state is passed to on_change together with the sample that
+caused it. The monitor only observes, the recovery job decides what to do
+about a slow or stalled drive.
+"""
+import threading
+import time
+from collections import deque
+
+from redundead_devices import io_counters
+
+HEALTH_INTERVAL = 1.0
+# Samples the tail latency is taken over
+HEALTH_WINDOW = 30
+
+# Thresholds, a healthy card reader answers reads in a few milliseconds
+SLOW_LATENCY = 0.2
+SLOW_SECONDS = 20.0
+STALL_SECONDS = 10.0
+
+# Health states
+HEALTH_OK = "ok"
+HEALTH_SLOW = "slow"
+HEALTH_STALLED = "stalled"
+
+
+def percentile(values, fraction):
+    """Value below which fraction of values lie, nearest rank"""
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+class HealthSample:
+    """Read throughput and latency of one interval"""
+    __slots__ = ("seconds", "mb_per_second", "latency", "tail_latency", "in_flight")
+
+    def __init__(self, seconds, mb_per_second, latency, tail_latency, in_flight):
+        self.seconds = seconds  # Since the monitor started
+        self.mb_per_second = mb_per_second
+        self.latency = latency  # Average seconds per read of the interval, None without reads
+        self.tail_latency = tail_latency  # 95th percentile over the window, None before the first read
+        self.in_flight = in_flight
+
+    def describe(self):
+        """Short text for the log, e.g. 12.3 MB/s, 95% of reads within 4 ms, 1 in flight"""
+        tail = f"{self.tail_latency * 1000:.0f} ms" if self.tail_latency is not None else "-"
+        return f"{self.mb_per_second:.1f} MB/s, 95% of reads within {tail}, {self.in_flight} in flight"
+
+
+class HealthMonitor:
+    """Samples the read counters of a drive on a thread and reports changes of its health"""
+
+    def __init__(self, source, on_change, interval=HEALTH_INTERVAL, clock=time.monotonic, counters=io_counters):
+        self.source = source
+        self.on_change = on_change  # (state, HealthSample), called on the monitor's thread
+        self.interval = interval
+        self.clock = clock
+        self.counters = counters
+        self.state = HEALTH_OK
+        self.latencies = deque(maxlen=HEALTH_WINDOW)
+        self.worst_tail = None
+        self.state_seconds = {HEALTH_OK: 0.0, HEALTH_SLOW: 0.0, HEALTH_STALLED: 0.0}
+        self.paused = False  # Set while the job is paused, idle reads are not a stall
+        self.stopped = threading.Event()
+        self.thread = None
+        self.last = None
+        self.started = self.last_time = self.last_read = clock()
+        self.slow_since = None
+
+    def start(self):
+        """Start sampling, False if the system keeps no statistics for the source"""
+        self.last = self.counters(self.source)
+        if self.last is None:
+            return False
+        self.started = self.last_time = self.last_read = self.clock()
+        self.thread = threading.Thread(target=self._loop, daemon=True, name="health-monitor")
+        self.thread.start()
+        return True
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join()
+
+    def _loop(self):
+        while not self.stopped.wait(self.interval):
+            counters = self.counters(self.source)
+            if counters is None:
+                # The drive is gone, the recovery itself reports that
+                return
+            self.sample(counters)
+
+    def sample(self, counters):
+        """Account for one reading of the counters, return the new state"""
+        now = self.clock()
+        elapsed = now - self.last_time
+        reads = counters.reads - self.last.reads
+        latency = (counters.read_seconds - self.last.read_seconds) / reads if reads > 0 else None
+        rate = (counters.bytes_read - self.last.bytes_read) / elapsed / 1024 ** 2 if elapsed > 0 else 0.0
+        self.state_seconds[self.state] += elapsed
+        self.last, self.last_time = counters, now
+
+        if latency is not None:
+            self.latencies.append(latency)
+        if reads > 0 or counters.in_flight == 0 or self.paused:
+            self.last_read = now
+        tail = percentile(self.latencies, 0.95) if self.latencies else None
+        if tail is not None and (self.worst_tail is None or tail > self.worst_tail):
+            self.worst_tail = tail
+        if tail is not None and tail >= SLOW_LATENCY:
+            if self.slow_since is None:
+                self.slow_since = now
+        else:
+            self.slow_since = None
+
+        if now - self.last_read >= STALL_SECONDS:
+            state = HEALTH_STALLED
+        elif self.slow_since is not None and now - self.slow_since >= SLOW_SECONDS:
+            state = HEALTH_SLOW
+        else:
+            state = HEALTH_OK
+        if state != self.state:
+            self.state = state
+            self.on_change(state, HealthSample(now - self.started, rate, latency, tail, counters.in_flight))
+        return state
+
+    def summary(self):
+        """One line on the drive's health over the whole run"""
+        tail = f"{self.worst_tail * 1000:.0f} ms" if self.worst_tail is not None else "-"
+        return (f"Read health: worst 95th percentile latency {tail}, "
+                f"{self.state_seconds[HEALTH_SLOW]:.0f} s slow, {self.state_seconds[HEALTH_STALLED]:.0f} s stalled")
@@ -0,0 +1,309 @@
+"""Recovery history kept in a small SQLite database
+
+Every run is recorded with the drive it read (serial number, model, size),
+where it wrote to, how long it took and how fast it scanned, together with
+the result and hash of each recovered clip. Lookups by serial number, run id
+and clip name are indexed, so the helper can tell right away that a card was
+already recovered and where to. Changes of the source drive's read health
+are kept with what the recovery did about them, for tuning the thresholds of
+redundead_health.
+
+Recovery threads never touch the database. They put records on a queue and
+a writer thread commits them in batches, one transaction per batch, so a slow
+disk or a long query can't hold up a recovery.
+"""
+import atexit
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+
+HISTORY_FILE = "history.sqlite3"
+SCHEMA_VERSION = 2
+
+# A batch is committed when it is this large or this old, whichever comes first
+BATCH_SIZE = 500
+BATCH_INTERVAL = 1.0
+
+# Run states
+RUN_RUNNING = "running"
+RUN_DONE = "done"
+RUN_FAILED = "failed"
+RUN_CANCELLED = "cancelled"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    device_id TEXT NOT NULL,
+    serial TEXT NOT NULL DEFAULT '',
+    model TEXT NOT NULL DEFAULT '',
+    size_bytes INTEGER,
+    source TEXT NOT NULL,
+    target TEXT NOT NULL,
+    backend TEXT NOT NULL,
+    started REAL NOT NULL,
+    finished REAL,
+    status TEXT NOT NULL,
+    message TEXT NOT NULL DEFAULT '',
+    bytes_scanned INTEGER NOT NULL DEFAULT 0,
+    clips INTEGER NOT NULL DEFAULT 0,
+    mb_per_second REAL
+);
+CREATE INDEX IF NOT EXISTS runs_serial ON runs (serial);
+CREATE INDEX IF NOT EXISTS runs_model_size ON runs (model, size_bytes);
+CREATE INDEX IF NOT EXISTS runs_started ON runs (started);
+
+CREATE TABLE IF NOT EXISTS clips (
+    run_id TEXT NOT NULL REFERENCES runs (run_id),
+    name TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    algorithm TEXT NOT NULL DEFAULT '',
+    hash TEXT NOT NULL DEFAULT '',
+    status TEXT NOT NULL,
+    detail TEXT NOT NULL DEFAULT '',
+    recorded REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS clips_run ON clips (run_id);
+CREATE INDEX IF NOT EXISTS clips_name ON clips (name);
+
+CREATE TABLE IF NOT EXISTS metrics (
+    run_id TEXT NOT NULL REFERENCES runs (run_id),
+    time REAL NOT NULL,
+    scan_offset INTEGER NOT NULL,
+    mb_per_second REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS metrics_run ON metrics (run_id);
+
+CREATE TABLE IF NOT EXISTS health (
+    run_id TEXT NOT NULL REFERENCES runs (run_id),
+    time REAL NOT NULL,
+    state TEXT NOT NULL,
+    decision TEXT NOT NULL DEFAULT '',
+    detail TEXT NOT NULL DEFAULT '',
+    mb_per_second REAL,
+    latency_ms REAL,
+    tail_latency_ms REAL,
+    in_flight INTEGER
+);
+CREATE INDEX IF NOT EXISTS health_run ON health (run_id);
+"""
+
+
+class RecoveryHistory:
+    """Queued writer and indexed queries for the history database"""
+
+    def __init__(self, path, batch_size=BATCH_SIZE, interval=BATCH_INTERVAL):
+        self.path = path
+        self.batch_size = batch_size
+        self.interval = interval
+        self.queue = queue.Queue()
+        self.closed = False
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        # The schema exists before the first query, the writer only inserts and updates
+        connection = self.connect()
+        try:
+            if connection.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+                connection.executescript(SCHEMA)
+                connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        finally:
+            connection.close()
+        self.thread = threading.Thread(target=self._write, daemon=True, name="history-writer")
+        self.thread.start()
+        atexit.register(self.close)
+
+    def connect(self):
+        """New connection, readers don't wait for the writer in WAL mode"""
+        connection = sqlite3.connect(self.path, timeout=10)
+        connection.row_factory = sqlite3.Row
+        connection.execute("PRAGMA journal_mode = WAL")
+        connection.execute("PRAGMA synchronous = NORMAL")
+        return connection
+
+    def _put(self, sql, params):
+        if not self.closed:
+            self.queue.put((sql, params))
+
+    def _write(self):
+        """Commit queued statements in batches until close()"""
+        connection = self.connect()
+        running = True
+        while running:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.interval
+            # flush() and close() markers end the batch right away
+            while len(batch) < self.batch_size and isinstance(batch[-1], tuple):
+                try:
+                    batch.append(self.queue.get(timeout=max(deadline - time.monotonic(), 0)))
+                except queue.Empty:
+                    break
+            flushed = []
+            try:
+                with connection:
+                    for item in batch:
+                        if item is None:
+                            running = False
+                        elif isinstance(item, threading.Event):
+                            flushed.append(item)
+                        else:
+                            connection.execute(*item)
+            except sqlite3.Error as e:
+                # History is a convenience, a failed batch must not stop the recovery
+                sys.stderr.write(f"Recovery history: {len(batch)} records not saved: {e}\n")
+            for event in flushed:
+                event.set()
+        connection.close()
+
+    def flush(self, timeout=None):
+        """Wait until everything queued so far is committed"""
+        event = threading.Event()
+        self.queue.put(event)
+        return event.wait(timeout)
+
+    def close(self):
+        """Commit what is queued and stop the writer"""
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.put(None)
+        self.thread.join()
+
+    def start_run(self, device_id, source, target, backend, serial="", model="", size_bytes=None,
+                  started=None):
+        """Record the start of a run, return its run id"""
+        run_id = uuid.uuid4().hex
+        self._put(
+            "INSERT INTO runs (run_id, device_id, serial, model, size_bytes, source, target, backend, "
+            "started, status) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (run_id, device_id, serial or "", model or "", size_bytes, source, target, backend,
+             started or time.time(), RUN_RUNNING),
+        )
+        return run_id
+
+    def record_clip(self, run_id, row, path):
+        """Record the manifest row of one recovered clip"""
+        self._put(
+            "INSERT INTO clips (run_id, name, path, size, algorithm, hash, status, detail, recorded) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (run_id, row["name"], path, row["size"], row["algorithm"], row["hash"], row["status"],
+             row["detail"], time.time()),
+        )
+
+    def record_metric(self, run_id, offset, mb_per_second):
+        """Record one throughput sample"""
+        self._put("INSERT INTO metrics (run_id, time, scan_offset, mb_per_second) VALUES (?, ?, ?, ?)",
+                  (run_id, time.time(), offset, mb_per_second))
+
+    def record_health(self, run_id, state, decision, detail, mb_per_second, latency, tail_latency, in_flight):
+        """Record a change of the source drive's read health and what was done about it, latencies in seconds"""
+        self._put(
+            "INSERT INTO health (run_id, time, state, decision, detail, mb_per_second, latency_ms, tail_latency_ms, "
+            "in_flight) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (run_id, time.time(), state, decision, detail, mb_per_second,
+             latency * 1000 if latency is not None else None,
+             tail_latency * 1000 if tail_latency is not None else None, in_flight),
+        )
+
+    def finish_run(self, run_id, status, message="", bytes_scanned=0, clips=0, mb_per_second=None):
+        """Record the outcome of a run"""
+        self._put(
+            "UPDATE runs SET finished = ?, status = ?, message = ?, bytes_scanned = ?, clips = ?, "
+            "mb_per_second = ? WHERE run_id = ?",
+            (time.time(), status, message, bytes_scanned, clips, mb_per_second, run_id),
+        )
+
+    def _query(self, sql, params=()):
+        connection = self.connect()
+        try:
+            return [dict(row) for row in connection.execute(sql, params)]
+        finally:
+            connection.close()
+
+    def runs_for_device(self, serial="", model="", size_bytes=None, status=None, limit=20):
+        """Latest runs of a drive, matched by serial or else by model and size"""
+        if serial:
+            where, params = "serial = ?", [serial]
+        else:
+            where, params = "serial = '' AND model = ? AND size_bytes IS ?", [model or "", size_bytes]
+        if status:
+            where += " AND status = ?"
+            params.append(status)
+        return self._query(f"SELECT * FROM runs WHERE {where} ORDER BY started DESC LIMIT ?", (*params, limit))
+
+    def last_recovery(self, device):
+        """Latest finished run of a Device, None if there is none or the drive has no serial number
+
+        Only the serial number identifies a card, readers that don't report
+        one show every card of a size as the same model.
+        """
+        if not device or not device.serial:
+            return None
+        runs = self.runs_for_device(device.serial, status=RUN_DONE, limit=1)
+        return runs[0] if runs else None
+
+    def similar_recovery(self, device):
+        """Latest finished run of a drive of the same model and size, for a Device without a serial number
+
+        Only a hint that the card may have been recovered before, never a
+        reason to skip it.
+        """
+        if not device or device.serial or not device.model:
+            return None
+        runs = self.runs_for_device("", device.model, device.size_bytes, RUN_DONE, limit=1)
+        return runs[0] if runs else None
+
+    def run(self, run_id):
+        """One run by id, None if unknown"""
+        rows = self._query("SELECT * FROM runs WHERE run_id = ?", (run_id,))
+        return rows[0] if rows else None
+
+    def recent_runs(self, limit=20):
+        """Latest runs of any drive"""
+        return self._query("SELECT * FROM runs ORDER BY started DESC LIMIT ?", (limit,))
+
+    def clips(self, run_id):
+        """Clip rows of one run"""
+        return self._query("SELECT * FROM clips WHERE run_id = ? ORDER BY name", (run_id,))
+
+    def health_events(self, run_id):
+        """Read health changes and decisions of one run, oldest first"""
+        return self._query("SELECT * FROM health WHERE run_id = ? ORDER BY time", (run_id,))
+
+    def find_clip(self, name):
+        """Every recovery of a clip name, newest first, with its drive and run"""
+        return self._query(
+            "SELECT clips.*, runs.device_id, runs.serial, runs.model, runs.started FROM clips "
+            "JOIN runs USING (run_id) WHERE clips.name = ? ORDER BY clips.recorded DESC",
+            (name,),
+        )
+
+    def throughput(self, by="model"):
+        """Finished runs grouped by reader model or by day, with their average speed"""
+        if by == "day":
+            group = "date(started, 'unixepoch', 'localtime')"
+        elif by == "model":
+            group = "model"
+        else:
+            raise ValueError(f"Unknown grouping: {by}")
+        return self._query(
+            f"SELECT {group} AS grouping, backend, COUNT(*) AS runs, SUM(bytes_scanned) AS bytes_scanned, "
+            f"SUM(clips) AS clips, AVG(mb_per_second) AS mb_per_second, "
+            f"AVG(finished - started) AS seconds FROM runs WHERE status = ? "
+            f"GROUP BY grouping, backend ORDER BY grouping",
+            (RUN_DONE,),
+        )
+
+
+def open_history(path, log=None):
+    """Open the history database, None if it can't be used"""
+    try:
+        return RecoveryHistory(path)
+    except (OSError, sqlite3.Error) as e:
+        if log:
+            log(f"Recovery history unavailable: {e}")
+        return None
@@ -0,0 +1,273 @@
+"""Device hot-plug notifications
+
+HotplugWatcher listens for the operating system's device change
+notifications and calls back once per burst of them: inserting a card
+produces several events (the disk, its partitions, the media change) that
+arrive within a fraction of a second, and they are debounced into a single
+callback naming the disks involved.
+
+On Linux the kernel's uevents are read from a netlink socket, the same
+source udev uses, and only block devices are kept. On Windows a hidden
+message-only window registers for disk and volume interface arrival and
+removal, which arrive as WM_DEVICECHANGE. Both are complemented by a slow
+poll of the device signature, which also stands in for notifications where
+they aren't delivered, as inside a container.
+"""
+import os
+import socket
+import threading
+import time
+
+from redundead_core import device_signature
+
+# Quiet time after the last notification before the callback runs
+DEBOUNCE_SECONDS = 0.3
+# A steady stream of notifications is reported at least this often
+DEBOUNCE_MAX_SECONDS = 1.0
+# Interval of the device signature poll, the safety net for missed notifications
+POLL_INTERVAL = 2.0
+
+# Linux netlink uevents
+NETLINK_KOBJECT_UEVENT = 15
+UEVENT_GROUP_KERNEL = 1
+UEVENT_ACTIONS = ("add", "remove", "change")
+
+# Windows device notifications
+WM_DEVICECHANGE = 0x0219
+WM_CLOSE = 0x0010
+WM_DESTROY = 0x0002
+DBT_DEVICEARRIVAL = 0x8000
+DBT_DEVICEREMOVECOMPLETE = 0x8004
+DBT_DEVTYP_DEVICEINTERFACE = 5
+DEVICE_NOTIFY_WINDOW_HANDLE = 0
+HWND_MESSAGE = -3
+# GUID_DEVINTERFACE_DISK and GUID_DEVINTERFACE_VOLUME, a card in a reader only adds a volume
+INTERFACE_GUIDS = ("53F56307-B6BF-11D0-94F2-00A0C91EFB8B", "53F5630D-B6BF-11D0-94F2-00A0C91EFB8B")
+
+
+def parse_uevent(data):
+    """Action and disk name of a kernel uevent for a block device, None for other events
+
+    A partition event is reported as its disk, the name is the last part of
+    the disk's device path.
+    """
+    fields = data.split(b"\0")
+    values = {}
+    for field in fields[1:]:
+        key, _, value = field.partition(b"=")
+        values[key] = value.decode("utf-8", "replace")
+    action = values.get(b"ACTION")
+    if values.get(b"SUBSYSTEM") != "block" or action not in UEVENT_ACTIONS:
+        return None
+    parts = values.get(b"DEVPATH", "").split("/")
+    if values.get(b"DEVTYPE") == "partition" and len(parts) > 1:
+        return action, parts[-2]
+    return action, values.get(b"DEVNAME", parts[-1]).rsplit("/", 1)[-1]
+
+
+class HotplugWatcher:
+    """Calls on_change(names) after device changes, once per burst of notifications
+
+    names is the set of kernel disk names the notifications named, or None
+    when they didn't say which device changed, as on Windows and for the poll.
+    on_change runs on the watcher's own thread.
+    """
+
+    def __init__(self, on_change, debounce=DEBOUNCE_SECONDS, poll_interval=POLL_INTERVAL, signature=device_signature):
+        self.on_change = on_change
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.signature = signature  # Polled for changes, device_signature unless testing
+        self.known = None  # Signature at the last callback, the poll reports changes from it
+        self.condition = threading.Condition()
+        self.names = set()
+        self.unnamed = False
+        self.first_event = None
+        self.last_event = None
+        self.stopped = False
+        self.source = None  # "netlink", "windows" or None when only polling
+        self.window = None
+        self.threads = []
+
+    def start(self):
+        """Start listening, return the notification source in use"""
+        if os.name == "nt":
+            listen, self.source = self._listen_windows, "windows"
+        elif hasattr(socket, "AF_NETLINK"):
+            listen, self.source = self._listen_netlink, "netlink"
+        else:
+            listen = None
+        targets = [self._debounce_loop, self._poll_loop] + ([listen] if listen else [])
+        for target in targets:
+            thread = threading.Thread(target=target, name="hotplug", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        return self.source
+
+    def stop(self):
+        """Stop listening, a callback already running finishes"""
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+        if self.window:
+            import ctypes
+            ctypes.windll.user32.PostMessageW(self.window, WM_CLOSE, 0, 0)
+
+    def notify(self, name=None):
+        """Record one notification, name is the disk it concerns if known"""
+        with self.condition:
+            now = time.monotonic()
+            if name is None:
+                self.unnamed = True
+            else:
+                self.names.add(name)
+            if self.first_event is None:
+                self.first_event = now
+            self.last_event = now
+            self.condition.notify_all()
+
+    def _debounce_loop(self):
+        """Wait for a burst of notifications to end, then run the callback once"""
+        while True:
+            with self.condition:
+                while self.first_event is None and not self.stopped:
+                    self.condition.wait()
+                if self.stopped:
+                    return
+                # Until DEBOUNCE seconds pass without a new notification or DEBOUNCE_MAX since the first
+                while not self.stopped:
+                    now = time.monotonic()
+                    due = min(self.last_event + self.debounce, self.first_event + DEBOUNCE_MAX_SECONDS)
+                    if now >= due:
+                        break
+                    self.condition.wait(due - now)
+                if self.stopped:
+                    return
+                names = None if self.unnamed else self.names
+                self.names = set()
+                self.unnamed = False
+                self.first_event = self.last_event = None
+            # A change the notifications already reported isn't reported again by the poll
+            self.known = self.signature()
+            try:
+                self.on_change(names)
+            except Exception:
+                pass
+
+    def _poll_loop(self):
+        """Report a change of the device signature, catches what notifications missed"""
+        self.known = self.signature()
+        while True:
+            with self.condition:
+                if self.stopped or self.condition.wait_for(lambda: self.stopped, self.poll_interval):
+                    return
+            current = self.signature()
+            if current != self.known:
+                self.known = current
+                self.notify()
+
+    def _listen_netlink(self):
+        """Read kernel uevents for block devices from netlink"""
+        try:
+            sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_KOBJECT_UEVENT)
+            sock.bind((0, UEVENT_GROUP_KERNEL))
+        except OSError:
+            self.source = None
+            return
+        # Wake up now and then to notice stop
+        sock.settimeout(0.5)
+        with sock:
+            while not self.stopped:
+                try:
+                    data = sock.recv(65536)
+                except socket.timeout:
+                    continue
+                except OSError:
+                    self.source = None
+                    return
+                event = parse_uevent(data)
+                if event is not None:
+                    self.notify(event[1])
+
+    def _listen_windows(self):
+        """Run a message-only window registered for disk and volume arrival and removal"""
+        import ctypes
+        from ctypes import wintypes
+
+        user32 = ctypes.windll.user32
+        kernel32 = ctypes.windll.kernel32
+        LRESULT = ctypes.c_ssize_t
+        WNDPROC = ctypes.WINFUNCTYPE(LRESULT, wintypes.HWND, wintypes.UINT, wintypes.WPARAM, wintypes.LPARAM)
+
+        class WNDCLASSW(ctypes.Structure):
+            _fields_ = [("style", wintypes.UINT), ("lpfnWndProc", WNDPROC), ("cbClsExtra", ctypes.c_int),
+                        ("cbWndExtra", ctypes.c_int), ("hInstance", wintypes.HINSTANCE),
+                        ("hIcon", wintypes.HICON), ("hCursor", wintypes.HANDLE),
+                        ("hbrBackground", wintypes.HBRUSH), ("lpszMenuName", wintypes.LPCWSTR),
+                        ("lpszClassName", wintypes.LPCWSTR)]
+
+        class GUID(ctypes.Structure):
+            _fields_ = [("Data1", wintypes.DWORD), ("Data2", wintypes.WORD), ("Data3", wintypes.WORD),
+                        ("Data4", ctypes.c_ubyte * 8)]
+
+        class DEV_BROADCAST_DEVICEINTERFACE(ctypes.Structure):
+            _fields_ = [("dbcc_size", wintypes.DWORD), ("dbcc_devicetype", wintypes.DWORD),
+                        ("dbcc_reserved", wintypes.DWORD), ("dbcc_classguid", GUID),
+                        ("dbcc_name", ctypes.c_wchar * 1)]
+
+        user32.DefWindowProcW.argtypes = [wintypes.HWND, wintypes.UINT, wintypes.WPARAM, wintypes.LPARAM]
+        user32.DefWindowProcW.restype = LRESULT
+        user32.CreateWindowExW.restype = wintypes.HWND
+        user32.CreateWindowExW.argtypes = [wintypes.DWORD, wintypes.LPCWSTR, wintypes.LPCWSTR, wintypes.DWORD,
+                                           ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_int,
+                                           wintypes.HWND, wintypes.HMENU, wintypes.HINSTANCE, wintypes.LPVOID]
+        user32.RegisterDeviceNotificationW.restype = wintypes.HANDLE
+        user32.RegisterDeviceNotificationW.argtypes = [wintypes.HANDLE, wintypes.LPVOID, wintypes.DWORD]
+        user32.UnregisterDeviceNotification.argtypes = [wintypes.HANDLE]
+        user32.GetMessageW.argtypes = [ctypes.POINTER(wintypes.MSG), wintypes.HWND, wintypes.UINT, wintypes.UINT]
+        user32.PostMessageW.argtypes = [wintypes.HWND, wintypes.UINT, wintypes.WPARAM, wintypes.LPARAM]
+        kernel32.GetModuleHandleW.restype = wintypes.HMODULE
+
+        def window_proc(hwnd, message, wparam, lparam):
+            if message == WM_DEVICECHANGE and wparam in (DBT_DEVICEARRIVAL, DBT_DEVICEREMOVECOMPLETE):
+                # The interface path doesn't give the disk number, the cache finds out what changed
+                self.notify()
+            elif message == WM_DESTROY:
+                user32.PostQuitMessage(0)
+                return 0
+            return user32.DefWindowProcW(hwnd, message, wparam, lparam)
+
+        # Kept referenced for as long as the window lives
+        procedure = WNDPROC(window_proc)
+        window_class = WNDCLASSW()
+        window_class.lpfnWndProc = procedure
+        window_class.hInstance = kernel32.GetModuleHandleW(None)
+        window_class.lpszClassName = f"REDundeadHotplug{os.getpid()}"
+        if not user32.RegisterClassW(ctypes.byref(window_class)):
+            self.source = None
+            return
+        window = user32.CreateWindowExW(0, window_class.lpszClassName, None, 0, 0, 0, 0, 0,
+                                        HWND_MESSAGE, None, window_class.hInstance, None)
+        if not window:
+            self.source = None
+            return
+        handles = []
+        for text in INTERFACE_GUIDS:
+            parts = text.split("-")
+            guid = GUID(int(parts[0], 16), int(parts[1], 16), int(parts[2], 16),
+                        (ctypes.c_ubyte * 8)(*bytes.fromhex(parts[3] + parts[4])))
+            interface = DEV_BROADCAST_DEVICEINTERFACE(ctypes.sizeof(DEV_BROADCAST_DEVICEINTERFACE),
+                                                      DBT_DEVTYP_DEVICEINTERFACE, 0, guid)
+            handle = user32.RegisterDeviceNotificationW(window, ctypes.byref(interface), DEVICE_NOTIFY_WINDOW_HANDLE)
+            if handle:
+                handles.append(handle)
+        self.window = window
+        if self.stopped:
+            user32.PostMessageW(window, WM_CLOSE, 0, 0)
+        message = wintypes.MSG()
+        while user32.GetMessageW(ctypes.byref(message), None, 0, 0) > 0:
+            user32.TranslateMessage(ctypes.byref(message))
+            user32.DispatchMessageW(ctypes.byref(message))
+        for handle in handles:
+            user32.UnregisterDeviceNotification(handle)
+        self.window = None
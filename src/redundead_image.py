@@ -0,0 +1,331 @@
+"""Disk image acquisition for failing cards
+
+The drive is copied to a sparse image file in two passes, in the spirit of
+GNU ddrescue. The fast pass reads large sequential blocks and jumps over
+unreadable areas with a growing skip. The retry pass then goes back over the
+skipped areas one sector at a time. Progress and the bad-sector map are kept
+in a ddrescue compatible mapfile next to the image, so acquisition can be
+interrupted and resumed, and the map can be inspected with ddrescue tools.
+
+All-zero blocks are never written, so empty parts of a card take no space in
+the image.
+"""
+import ctypes
+import os
+import threading
+import time
+from bisect import bisect_right
+
+from r3d_carver import SECTOR_SIZE, device_path, device_size
+
+IMAGE_FOLDER_NAME = "Images"
+IMAGE_EXTENSION = ".img"
+MAP_EXTENSION = ".map"
+
+# Fast pass read size, and the limits of the skip after a read error
+IMAGE_BLOCK_SIZE = 1024 * 1024
+MIN_SKIP_SIZE = 64 * 1024
+MAX_SKIP_SIZE = 64 * 1024 * 1024
+
+# Sector reads of the retry pass
+RETRY_PASSES = 1
+
+# The mapfile is rewritten at most this often while reading
+MAP_SAVE_INTERVAL = 5.0
+
+# Progress lines are printed at most this often
+REPORT_INTERVAL = 1.0
+
+# ddrescue block states
+NON_TRIED = "?"
+NON_TRIMMED = "*"
+FINISHED = "+"
+BAD_SECTOR = "-"
+
+FSCTL_SET_SPARSE = 0x900C4
+
+
+def image_paths(target_path, source):
+    """Image and mapfile locations of a source below target_path"""
+    base = os.path.join(target_path, IMAGE_FOLDER_NAME, os.path.basename(source))
+    return base + IMAGE_EXTENSION, base + IMAGE_EXTENSION + MAP_EXTENSION
+
+
+def set_sparse(f):
+    """Mark a file as sparse on NTFS, other file systems leave holes on their own"""
+    if os.name != "nt":
+        return
+    try:
+        import msvcrt
+        handle = msvcrt.get_osfhandle(f.fileno())
+        returned = ctypes.c_ulong(0)
+        ctypes.windll.kernel32.DeviceIoControl(
+            handle, FSCTL_SET_SPARSE, None, 0, None, 0, ctypes.byref(returned), None
+        )
+    except (ImportError, OSError, AttributeError):
+        # A non-sparse image still works, it only takes more space
+        pass
+
+
+class SectorMap:
+    """Sorted, merged list of [pos, size, status] regions covering a device"""
+
+    def __init__(self, size):
+        self.size = size
+        self.regions = [[0, size, NON_TRIED]] if size else []
+        self.current_pos = 0
+        self.current_status = NON_TRIED
+
+    def mark(self, pos, size, status):
+        """Set the status of [pos, pos + size), splitting and merging regions"""
+        end = min(pos + size, self.size)
+        if pos >= end:
+            return
+        regions = self.regions
+        # First region that may overlap, the one that starts at or before pos
+        first = max(bisect_right(regions, [pos, float("inf")]) - 1, 0)
+        last = first
+        while last < len(regions) and regions[last][0] < end:
+            last += 1
+
+        replaced = []
+        head = regions[first]
+        if head[0] < pos:
+            replaced.append([head[0], pos - head[0], head[2]])
+        replaced.append([pos, end - pos, status])
+        tail = regions[last - 1]
+        tail_end = tail[0] + tail[1]
+        if tail_end > end:
+            replaced.append([end, tail_end - end, tail[2]])
+
+        # Merge with neighbours of the same status
+        low = first - 1 if first > 0 else first
+        high = last + 1 if last < len(regions) else last
+        merged = regions[low:first] + replaced + regions[last:high]
+        compact = []
+        for region in merged:
+            if compact and compact[-1][2] == region[2] and compact[-1][0] + compact[-1][1] == region[0]:
+                compact[-1][1] += region[1]
+            else:
+                compact.append(region)
+        regions[low:high] = compact
+
+    def find(self, status):
+        """Copies of the regions with the given status"""
+        return [(pos, size) for pos, size, state in self.regions if state == status]
+
+    def total(self, status):
+        """Bytes in regions with the given status"""
+        return sum(size for pos, size, state in self.regions if state == status)
+
+    def load(self, path):
+        """Read a ddrescue mapfile, return False if it does not fit this device"""
+        regions = []
+        status_line = True
+        with open(path, "r", encoding="ascii") as f:
+            for line in f:
+                fields = line.split()
+                if not fields or fields[0].startswith("#"):
+                    continue
+                if status_line:
+                    # The first data line holds the position of the interrupted pass
+                    self.current_pos = int(fields[0], 0)
+                    self.current_status = fields[1]
+                    status_line = False
+                    continue
+                regions.append([int(fields[0], 0), int(fields[1], 0), fields[2]])
+        if not regions or regions[-1][0] + regions[-1][1] != self.size:
+            return False
+        self.regions = regions
+        return True
+
+    def save(self, path):
+        """Write a ddrescue mapfile atomically"""
+        lines = [
+            "# Mapfile. Created by REDundead Helper\n",
+            "# current_pos  current_status\n",
+            f"0x{self.current_pos:08X}     {self.current_status}\n",
+            "#      pos        size  status\n",
+        ]
+        lines.extend(f"0x{pos:08X}  0x{size:08X}  {status}\n" for pos, size, status in self.regions)
+        temporary = path + ".tmp"
+        with open(temporary, "w", encoding="ascii") as f:
+            f.writelines(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, path)
+
+
+class DiskImager:
+    """Copies a drive to a sparse image with a fast pass and a retry pass"""
+
+    def __init__(self, source, image_path, map_path, block_size=IMAGE_BLOCK_SIZE,
+                 retry_passes=RETRY_PASSES, clock=time.monotonic, size=None):
+        self.source = source
+        self.path = device_path(source)
+        # Size from the device scan, used when the device can't tell its own
+        self.known_size = size
+        self.image_path = image_path
+        self.map_path = map_path
+        self.block_size = block_size
+        self.retry_passes = retry_passes
+        self.clock = clock
+        self.size = 0
+        self.map = None
+        self.last_save = 0.0
+        self.last_report = 0.0
+        self.zero_block = bytes(max(block_size, SECTOR_SIZE))
+        self.running = threading.Event()
+        self.running.set()
+        self.cancelled = False
+
+    def open_map(self):
+        """Load the mapfile of an earlier run or start a new one, OSError if the size is unknown"""
+        # The device's own size is exact, a scanned one may be rounded. Never image an unknown
+        # or empty source, its image would look finished
+        try:
+            self.size = device_size(self.path)
+        except OSError:
+            if not self.known_size:
+                raise
+            self.size = self.known_size
+        self.map = SectorMap(self.size)
+        if os.path.exists(self.map_path) and os.path.exists(self.image_path):
+            try:
+                return self.map.load(self.map_path)
+            except (OSError, ValueError, IndexError):
+                self.map = SectorMap(self.size)
+        return False
+
+    def checkpoint(self, pos, status, force=False):
+        """Remember the current position and save the mapfile now and then"""
+        self.map.current_pos = pos
+        self.map.current_status = status
+        now = self.clock()
+        if force or now - self.last_save >= MAP_SAVE_INTERVAL:
+            self.last_save = now
+            self.map.save(self.map_path)
+        if not self.running.is_set():
+            # Paused: the map is saved first, in case the pause ends with the program
+            self.map.save(self.map_path)
+            self.running.wait()
+        if self.cancelled:
+            self.map.save(self.map_path)
+            raise RuntimeError(f"Imaging of {self.source} cancelled at offset {pos}")
+
+    def pause(self):
+        """Hold imaging at the next block, True if it was running"""
+        if self.cancelled or not self.running.is_set():
+            return False
+        self.running.clear()
+        return True
+
+    def resume(self):
+        """Continue paused imaging, True if it was paused"""
+        if self.running.is_set():
+            return False
+        self.running.set()
+        return True
+
+    def cancel(self):
+        """Stop imaging at the next block, the mapfile lets a later run resume"""
+        self.cancelled = True
+        self.running.set()
+
+    def report(self, on_line, pos, force=False):
+        """Print a progress line with the imaging offset, rate limited"""
+        now = self.clock()
+        if force or now - self.last_report >= REPORT_INTERVAL:
+            self.last_report = now
+            on_line(f"Imaging {self.source} offset {pos}", "stdout")
+
+    def store(self, image, pos, buffer, count):
+        """Write count bytes of buffer to the image, leaving holes for all-zero data"""
+        # bytearray comparison is a memcmp, memoryview comparison is not
+        data = buffer if count == len(buffer) else buffer[:count]
+        zero = self.zero_block if count == len(self.zero_block) else self.zero_block[:count]
+        if data == zero:
+            return
+        image.seek(pos)
+        image.write(data)
+
+    def fast_pass(self, device, image, on_line):
+        """Read untried regions in large blocks, skip ahead on read errors"""
+        buffer = bytearray(self.block_size)
+        view = memoryview(buffer)
+        for start, length in self.map.find(NON_TRIED):
+            pos = start
+            end = start + length
+            skip = MIN_SKIP_SIZE
+            while pos < end:
+                count = min(self.block_size, end - pos)
+                try:
+                    device.seek(pos)
+                    count = device.readinto(view[:count])
+                except OSError:
+                    # Leave the area for the retry pass and jump further on every error in a row
+                    skipped = min(max(skip, count), end - pos)
+                    self.map.mark(pos, skipped, NON_TRIMMED)
+                    on_line(f"Read error at offset {pos}, skipping {skipped} bytes", "stderr")
+                    pos += skipped
+                    skip = min(skip * 2, MAX_SKIP_SIZE)
+                    self.checkpoint(pos, NON_TRIED)
+                    continue
+                if not count:
+                    # The device ended early, the rest can only be retried
+                    self.map.mark(pos, end - pos, NON_TRIMMED)
+                    break
+                self.store(image, pos, buffer, count)
+                self.map.mark(pos, count, FINISHED)
+                pos += count
+                skip = MIN_SKIP_SIZE
+                self.checkpoint(pos, NON_TRIED)
+                self.report(on_line, pos)
+
+    def retry_pass(self, device, image, on_line):
+        """Read skipped regions sector by sector, marking what fails as bad"""
+        buffer = bytearray(SECTOR_SIZE)
+        view = memoryview(buffer)
+        for _ in range(self.retry_passes):
+            regions = self.map.find(NON_TRIMMED) + self.map.find(BAD_SECTOR)
+            if not regions:
+                return
+            for start, length in sorted(regions):
+                on_line(f"Retrying {length} bytes at offset {start}", "stdout")
+                for pos in range(start, start + length, SECTOR_SIZE):
+                    count = min(SECTOR_SIZE, start + length - pos)
+                    try:
+                        device.seek(pos)
+                        count = device.readinto(view[:count])
+                    except OSError:
+                        count = 0
+                    if count:
+                        self.store(image, pos, buffer, count)
+                        self.map.mark(pos, count, FINISHED)
+                    else:
+                        self.map.mark(pos, SECTOR_SIZE, BAD_SECTOR)
+                    self.checkpoint(pos, NON_TRIMMED)
+
+    def run(self, on_line):
+        """Image the drive, return the number of unreadable bytes"""
+        resumed = self.open_map()
+        os.makedirs(os.path.dirname(self.image_path), exist_ok=True)
+        if resumed:
+            on_line(
+                f"Resuming image {self.image_path}: "
+                f"{self.map.total(FINISHED)} of {self.size} bytes already read", "stdout"
+            )
+        with open(self.path, "rb", buffering=0) as device, \
+                open(self.image_path, "r+b" if resumed else "wb") as image:
+            if not resumed:
+                set_sparse(image)
+                # Extending the file leaves the whole image as one hole
+                image.truncate(self.size)
+            self.checkpoint(0, NON_TRIED, force=True)
+            self.fast_pass(device, image, on_line)
+            self.report(on_line, self.size, force=True)
+            self.retry_pass(device, image, on_line)
+            image.flush()
+            os.fsync(image.fileno())
+        self.checkpoint(self.size, FINISHED, force=True)
+        return self.map.total(BAD_SECTOR) + self.map.total(NON_TRIMMED)
@@ -0,0 +1,208 @@
+"""Checkpoint journal and clip watcher for resumable recoveries
+
+The journal is an append-only JSON-lines file inside RecoveryFolder. It holds
+the last confirmed scan offset and every clip that was fully written, with its
+size and verification result, so an interrupted run can be resumed without
+redoing that work.
+"""
+import json
+import os
+import threading
+import time
+
+JOURNAL_FILE_NAME = ".redundead_journal.jsonl"
+
+# Resumed runs write into this subfolder so finished clips are never touched
+STAGING_FOLDER_NAME = ".resume"
+
+# Offset checkpoints are written at most this often
+CHECKPOINT_INTERVAL = 5.0
+
+# A clip counts as closed once its size stops changing for this long
+WATCH_INTERVAL = 2.0
+
+CLIP_EXTENSIONS = (".r3d",)
+
+
+class RecoveryJournal:
+    """Append-only record of the progress of one RecoveryFolder"""
+
+    def __init__(self, folder):
+        self.path = os.path.join(folder, JOURNAL_FILE_NAME)
+        self.lock = threading.Lock()
+        self.offset = 0
+        self.clips = {}  # name -> manifest row with size, hash and status
+        self.finished = {}  # Clips finished by earlier, interrupted runs
+        self.interrupted = False
+        self.last_checkpoint = 0.0
+        self.file = None
+
+    def open(self):
+        """Load an existing journal, return True if it belongs to an interrupted run"""
+        complete = True
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A crash can leave a torn last line, ignore it
+                        continue
+                    kind = record.get("type")
+                    if kind == "start":
+                        complete = False
+                    elif kind == "offset":
+                        self.offset = max(self.offset, record["offset"])
+                    elif kind == "clip":
+                        del record["type"]
+                        self.clips[record["name"]] = record
+                    elif kind == "complete":
+                        complete = True
+        except FileNotFoundError:
+            pass
+
+        self.interrupted = not complete
+        if not self.interrupted:
+            # A finished journal describes an old run, start over
+            self.offset = 0
+            self.clips = {}
+        self.finished = dict(self.clips)
+
+        self.file = open(self.path, "a" if self.interrupted else "w", encoding="utf-8")
+        self._append({"type": "start", "time": time.time(), "resume": self.interrupted})
+        return self.interrupted
+
+    def _append(self, record):
+        """Write one record and push it to disk"""
+        with self.lock:
+            if not self.file:
+                return
+            self.file.write(json.dumps(record) + "\n")
+            self.file.flush()
+            os.fsync(self.file.fileno())
+
+    def checkpoint(self, offset):
+        """Record the scan offset, rate limited to CHECKPOINT_INTERVAL"""
+        now = time.monotonic()
+        if offset <= self.offset or now - self.last_checkpoint < CHECKPOINT_INTERVAL:
+            return
+        self.last_checkpoint = now
+        self.offset = offset
+        self._append({"type": "offset", "offset": offset})
+
+    def was_finished(self, name, size):
+        """True if an earlier run already finished a clip with this name and size"""
+        clip = self.finished.get(name)
+        return clip is not None and clip["size"] == size
+
+    def record_clip(self, row):
+        """Record a fully written clip with its verification result"""
+        self.clips[row["name"]] = row
+        record = {"type": "clip"}
+        record.update(row)
+        self._append(record)
+
+    def close(self, complete):
+        """Close the journal, marking the run complete if it finished"""
+        if complete:
+            self._append({"type": "complete", "time": time.time()})
+        with self.lock:
+            if self.file:
+                self.file.close()
+                self.file = None
+
+
+class ClipWatcher:
+    """Polls a folder and reports clips whose size has stopped changing"""
+
+    def __init__(self, folder, on_closed, interval=WATCH_INTERVAL, on_scan=None):
+        self.folder = folder
+        self.on_closed = on_closed
+        self.on_scan = on_scan  # Called with the bytes the clips grew by since the last scan
+        self.interval = interval
+        self.sizes = {}  # name -> size seen on the last scan
+        self.closed = {}  # name -> size when reported
+        self.existing = {}  # name -> size of clips already there on start, left out until they change
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._watch, daemon=True)
+
+    def start(self):
+        """Snapshot the clips already in the folder and start polling on a background thread"""
+        self.existing = self.scan()
+        self.sizes = dict(self.existing)
+        self.thread.start()
+
+    def scan(self):
+        """Return {relative name: size} for every clip below the folder"""
+        found = {}
+        pending = [""]
+        while pending:
+            relative = pending.pop()
+            try:
+                entries = os.scandir(os.path.join(self.folder, relative))
+            except OSError:
+                continue
+            with entries:
+                for entry in entries:
+                    name = os.path.join(relative, entry.name) if relative else entry.name
+                    if entry.is_dir(follow_symlinks=False):
+                        if not entry.name.startswith("."):
+                            pending.append(name)
+                    elif entry.name.lower().endswith(CLIP_EXTENSIONS):
+                        try:
+                            found[name] = entry.stat().st_size
+                        except OSError:
+                            pass
+        return found
+
+    def poll(self, final=False):
+        """Compare with the previous scan and report clips that stopped growing"""
+        sizes = self.scan()
+        growth = 0
+        for name, size in sizes.items():
+            growth += size - self.sizes.get(name, 0)
+            # Clips of an earlier run are not this run's, unless it writes them again
+            if name in self.existing:
+                if self.existing[name] == size:
+                    continue
+                del self.existing[name]
+            # A clip that grows again after a stall is reported again once it settles
+            if self.closed.get(name) == size:
+                continue
+            if final or self.sizes.get(name) == size:
+                self.closed[name] = size
+                self.on_closed(name, os.path.join(self.folder, name), size)
+        self.sizes = sizes
+        if self.on_scan:
+            self.on_scan(growth)
+
+    def _watch(self):
+        """Poll until stopped"""
+        while not self.stopped.wait(self.interval):
+            self.poll()
+
+    def stop(self):
+        """Stop polling and report every clip that is left as closed"""
+        self.stopped.set()
+        if self.thread.is_alive():
+            self.thread.join()
+        self.poll(final=True)
+
+
+def merge_staging(staging, folder, journal, log):
+    """Move clips from a resumed run into folder, dropping ones already finished"""
+    for root, dirs, files in os.walk(staging, topdown=False):
+        for file_name in files:
+            source = os.path.join(root, file_name)
+            name = os.path.relpath(source, staging)
+            destination = os.path.join(folder, name)
+            size = os.path.getsize(source)
+            # Keep the copy from the earlier run if it is complete and still in place
+            if (journal.was_finished(name, size) and os.path.exists(destination)
+                    and os.path.getsize(destination) == size):
+                os.remove(source)
+                continue
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            os.replace(source, destination)
+            log(f"Recovered {name}")
+        os.rmdir(root)
@@ -0,0 +1,218 @@
+"""Clip information and thumbnails for the results view
+
+The results view lists thousands of recovered clips and fragments, so
+nothing here reads a whole clip. Size, duration and timecode come from a few
+KB of atom headers. A thumbnail is rendered by REDline from a stand-in clip
+made of the header atom and the first frame only, which also works for
+fragments that lost their end atom. Without REDline the view draws a
+placeholder instead.
+
+Rendered thumbnails are kept in a folder in the per-user folder, keyed by
+the clip's path, size and modification time so a changed clip is rendered
+again. The least recently used ones are removed once the folder grows past
+THUMBNAIL_CACHE_BYTES.
+"""
+import hashlib
+import os
+import shutil
+import struct
+import subprocess
+import tempfile
+import threading
+from collections import OrderedDict
+
+import r3d
+from redundead_process import split_command
+from redundead_providers import CREATE_NO_WINDOW
+
+# Command used to launch REDline, REDLINE_COMMAND can point to another install
+REDLINE_COMMAND = os.environ.get("REDLINE_COMMAND", "REDline")
+
+# REDline arguments that decode the first frame at an eighth of its resolution to a TIFF file.
+# REDLINE_THUMBNAIL_ARGUMENTS replaces them for REDline builds with other options
+REDLINE_THUMBNAIL_ARGUMENTS = os.environ.get("REDLINE_THUMBNAIL_ARGUMENTS",
+                                             "--format 1 --start 0 --frameCount 1 --res 8")
+REDLINE_TIMEOUT = 60
+
+THUMBNAIL_FOLDER = "thumbnails"
+THUMBNAIL_CACHE_BYTES = 128 * 1024 * 1024
+THUMBNAIL_WIDTH = 160
+THUMBNAIL_HEIGHT = 90
+
+# Thumbnails kept in memory by the results view
+MEMORY_CACHE_ITEMS = 512
+
+
+def read_info(path, size):
+    """Clip information of the R3D file at path, None if it can't be read or has no RED header"""
+    try:
+        # Unbuffered, each atom header is one small read
+        with open(path, "rb", buffering=0) as f:
+            return r3d.read_clip_info(f, size)
+    except OSError:
+        return None
+
+
+def thumbnail_key(path, size, mtime):
+    """Cache key of a clip's thumbnail, changes when the clip does"""
+    text = f"{os.path.abspath(path)}\0{size}\0{mtime}"
+    return hashlib.sha1(text.encode("utf-8", "surrogatepass")).hexdigest()
+
+
+class LRUCache:
+    """Mapping that drops the least recently used entry beyond capacity"""
+
+    def __init__(self, capacity=MEMORY_CACHE_ITEMS):
+        self.capacity = capacity
+        self.items = OrderedDict()
+
+    def get(self, key, default=None):
+        if key not in self.items:
+            return default
+        self.items.move_to_end(key)
+        return self.items[key]
+
+    def put(self, key, value):
+        self.items[key] = value
+        self.items.move_to_end(key)
+        while len(self.items) > self.capacity:
+            self.items.popitem(last=False)
+
+    def __contains__(self, key):
+        return key in self.items
+
+    def __len__(self):
+        return len(self.items)
+
+
+class ThumbnailCache:
+    """Encoded thumbnails on disk, least recently used first out
+
+    The modification time of a file records its last use. Safe to use from
+    several loader threads.
+    """
+
+    def __init__(self, folder, max_bytes=THUMBNAIL_CACHE_BYTES):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.sizes = None  # File name -> size, listed on the first store
+
+    def _path(self, key):
+        return os.path.join(self.folder, key + ".png")
+
+    def get(self, key):
+        """Stored thumbnail bytes, None if not cached"""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+        except OSError:
+            return None
+        return data
+
+    def put(self, key, data):
+        """Store a thumbnail atomically, False if it could not be written"""
+        path = self._path(key)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return False
+        with self.lock:
+            if self.sizes is None:
+                self.sizes = self._list()
+            self.sizes[os.path.basename(path)] = len(data)
+            if sum(self.sizes.values()) > self.max_bytes:
+                self._trim()
+        return True
+
+    def _list(self):
+        try:
+            return {entry.name: entry.stat().st_size for entry in os.scandir(self.folder)
+                    if entry.name.endswith(".png")}
+        except OSError:
+            return {}
+
+    def _trim(self):
+        """Remove the least recently used thumbnails until three quarters of the limit is left"""
+        used = []
+        for name in self.sizes:
+            try:
+                used.append((os.path.getmtime(os.path.join(self.folder, name)), name))
+            except OSError:
+                used.append((0, name))
+        total = sum(self.sizes.values())
+        for _, name in sorted(used):
+            if total <= self.max_bytes * 3 // 4:
+                break
+            try:
+                os.remove(os.path.join(self.folder, name))
+            except OSError:
+                pass
+            total -= self.sizes.pop(name)
+
+
+def redline_available():
+    """True if the REDline executable can be found"""
+    command = split_command(REDLINE_COMMAND)
+    return bool(command) and shutil.which(command[0]) is not None
+
+
+def first_frame_clip(path, info, out):
+    """Write a clip with the header atom and the first frame only of the clip at path to out
+
+    The index and end atoms are rebuilt for the single frame, the end atom
+    keeps the fields of the original one that aren't offsets or counts.
+    """
+    offset, frame_size = info.first_frame
+    with open(path, "rb", buffering=0) as f:
+        header_size = r3d.read_atom_header(f, 0)[0]
+        f.seek(0)
+        header = f.read(header_size)
+        f.seek(offset)
+        frame = f.read(frame_size)
+        end_rest = bytes(r3d.END_ATOM_SIZE - r3d.ATOM_HEADER.size - r3d.END_FIELDS.size)
+        if info.frames is not None:
+            f.seek(os.fstat(f.fileno()).st_size - r3d.END_ATOM_SIZE + r3d.ATOM_HEADER.size + r3d.END_FIELDS.size)
+            end_rest = f.read(len(end_rest))
+    if len(header) < header_size or len(frame) < frame_size:
+        raise OSError(f"{path} ends inside its first frame")
+    index_at = header_size + frame_size
+    index_size = r3d.ATOM_HEADER.size + 4
+    out.write(header)
+    out.write(frame)
+    out.write(r3d.ATOM_HEADER.pack(index_size, b"RDVO") + struct.pack(">I", header_size))
+    out.write(r3d.ATOM_HEADER.pack(index_size, b"RDVS") + struct.pack(">I", frame_size))
+    out.write(r3d.ATOM_HEADER.pack(r3d.END_ATOM_SIZE, b"REOB"))
+    out.write(r3d.END_FIELDS.pack(index_at, index_at + index_size, 0, 0, 1, 0) + end_rest)
+
+
+def render_first_frame(path, info):
+    """Image file bytes of the first frame rendered by REDline, None if it can't be rendered"""
+    if info is None or info.first_frame is None or not redline_available():
+        return None
+    with tempfile.TemporaryDirectory(prefix="redundead-thumb-") as folder:
+        clip = os.path.join(folder, "first_frame.R3D")
+        try:
+            with open(clip, "wb") as out:
+                first_frame_clip(path, info, out)
+            command = split_command(REDLINE_COMMAND) + ["--i", clip, "--outDir", folder, "--o", "thumbnail"]
+            command += split_command(REDLINE_THUMBNAIL_ARGUMENTS)
+            subprocess.run(command, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                           stderr=subprocess.DEVNULL, timeout=REDLINE_TIMEOUT,
+                           creationflags=CREATE_NO_WINDOW if os.name == "nt" else 0)
+            # REDline numbers the frames it writes, take whatever image it left
+            images = sorted(name for name in os.listdir(folder) if name.startswith("thumbnail"))
+            if not images:
+                return None
+            with open(os.path.join(folder, images[0]), "rb") as f:
+                return f.read()
+        except (OSError, subprocess.SubprocessError):
+            return None
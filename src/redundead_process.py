@@ -0,0 +1,203 @@
+"""Process control for external recovery engines
+
+REDundead is started without a shell, in its own process group on POSIX and
+its own console process group on Windows, so cancel, pause and priority
+changes reach the engine itself and not only a shell in front of it.
+
+Priorities are named levels rather than raw numbers. "low" lowers CPU and
+I/O priority a little and "background" only uses what nothing else needs,
+so a recovery can run on an ingest workstation without starving playback.
+Raising a priority again may need admin rights on POSIX, set_priority then
+returns False and the process keeps its current level.
+"""
+import ctypes
+import os
+import shlex
+import shutil
+import signal
+import subprocess
+import threading
+
+PRIORITIES = ("normal", "low", "background")
+
+# Seconds between the polite stop request and the kill on cancel
+CANCEL_GRACE = 5.0
+
+# nice value, ionice class and ionice level per priority
+POSIX_PRIORITIES = {
+    "normal": (0, 2, 4),
+    "low": (10, 2, 7),
+    "background": (19, 3, 0),
+}
+
+# Windows priority class and I/O priority (0 very low, 1 low, 2 normal) per priority
+WINDOWS_PRIORITIES = {
+    "normal": (0x00000020, 2),
+    "low": (0x00004000, 1),
+    "background": (0x00000040, 0),
+}
+PROCESS_SET_INFORMATION = 0x0200
+PROCESS_SUSPEND_RESUME = 0x0800
+PROCESS_IO_PRIORITY = 33  # PROCESS_INFORMATION_CLASS ProcessIoPriority
+
+
+def split_command(command):
+    """Split a command line from REDUNDEAD_COMMAND into arguments"""
+    if os.name != "nt":
+        return shlex.split(command)
+    # Windows paths keep their backslashes, only the quotes are removed
+    return [part[1:-1] if part[:1] == part[-1:] == '"' and len(part) > 1 else part
+            for part in shlex.split(command, posix=False)]
+
+
+def _windows_process(pid, access):
+    """Open a process handle with the given access rights, None on failure"""
+    handle = ctypes.windll.kernel32.OpenProcess(access, False, pid)
+    return handle or None
+
+
+def apply_priority(pid, level, group=False):
+    """Set the CPU and I/O priority of a process or process group, False if refused"""
+    if level not in PRIORITIES:
+        raise ValueError(f"Unknown priority: {level}")
+    if os.name == "nt":
+        priority_class, io_priority = WINDOWS_PRIORITIES[level]
+        handle = _windows_process(pid, PROCESS_SET_INFORMATION)
+        if not handle:
+            return False
+        try:
+            ok = bool(ctypes.windll.kernel32.SetPriorityClass(handle, priority_class))
+            value = ctypes.c_ulong(io_priority)
+            # Not every Windows version lets I/O priority be set, the priority class still counts
+            ctypes.windll.ntdll.NtSetInformationProcess(handle, PROCESS_IO_PRIORITY,
+                                                        ctypes.byref(value), ctypes.sizeof(value))
+            return ok
+        finally:
+            ctypes.windll.kernel32.CloseHandle(handle)
+
+    nice, io_class, io_level = POSIX_PRIORITIES[level]
+    try:
+        os.setpriority(os.PRIO_PGRP if group else os.PRIO_PROCESS, pid, nice)
+    except OSError:
+        # Lowering the nice value again needs CAP_SYS_NICE
+        return False
+    ionice = shutil.which("ionice")
+    if ionice:
+        command = [ionice, "-c", str(io_class)]
+        if io_class != 3:
+            command += ["-n", str(io_level)]
+        command += ["-P" if group else "-p", str(pid)]
+        subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return True
+
+
+class ProcessController:
+    """Starts one external engine and cancels, pauses or reprioritizes it later"""
+
+    def __init__(self, priority="normal", grace=CANCEL_GRACE):
+        self.priority = priority
+        self.grace = grace
+        self.process = None
+        self.paused = False
+        self.cancelled = False
+        self.lock = threading.Lock()
+
+    def start(self, args, **popen_args):
+        """Start the engine without a shell in a process group of its own"""
+        if os.name == "nt":
+            popen_args["creationflags"] = popen_args.get("creationflags", 0) | subprocess.CREATE_NEW_PROCESS_GROUP
+        else:
+            popen_args["start_new_session"] = True
+        with self.lock:
+            self.process = subprocess.Popen(args, **popen_args)
+            if self.priority != "normal":
+                apply_priority(self.process.pid, self.priority, group=os.name != "nt")
+            if self.cancelled:
+                # cancel() came while the engine was starting
+                self._terminate()
+        return self.process
+
+    def running(self):
+        process = self.process
+        return process is not None and process.poll() is None
+
+    def _signal(self, signum):
+        """Send a signal to the engine's process group"""
+        try:
+            os.killpg(self.process.pid, signum)
+        except ProcessLookupError:
+            pass
+
+    def _windows_suspend(self, suspend):
+        """Suspend or resume every thread of the engine process"""
+        handle = _windows_process(self.process.pid, PROCESS_SUSPEND_RESUME)
+        if not handle:
+            return False
+        try:
+            function = ctypes.windll.ntdll.NtSuspendProcess if suspend else ctypes.windll.ntdll.NtResumeProcess
+            return function(handle) == 0
+        finally:
+            ctypes.windll.kernel32.CloseHandle(handle)
+
+    def pause(self):
+        """Suspend the engine, True if it was paused"""
+        with self.lock:
+            if not self.running() or self.paused:
+                return False
+            if os.name == "nt":
+                self.paused = self._windows_suspend(True)
+            else:
+                self._signal(signal.SIGSTOP)
+                self.paused = True
+            return self.paused
+
+    def resume(self):
+        """Let a paused engine continue, True if it was resumed"""
+        with self.lock:
+            if not self.running() or not self.paused:
+                return False
+            if os.name == "nt":
+                self._windows_suspend(False)
+            else:
+                self._signal(signal.SIGCONT)
+            self.paused = False
+            return True
+
+    def set_priority(self, level):
+        """Change the CPU and I/O priority, also of an engine started later"""
+        with self.lock:
+            if not self.running():
+                self.priority = level
+                return True
+            if not apply_priority(self.process.pid, level, group=os.name != "nt"):
+                return False
+            self.priority = level
+            return True
+
+    def cancel(self):
+        """Ask the engine to stop, kill it if it is still running after the grace period"""
+        with self.lock:
+            self.cancelled = True
+            if self.running():
+                self._terminate()
+
+    def _terminate(self):
+        """Stop request plus a delayed kill, call with the lock held"""
+        if os.name == "nt":
+            # A console engine has no stop request, taskkill /T also ends what it started
+            subprocess.run(["taskkill", "/F", "/T", "/PID", str(self.process.pid)],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            return
+        self._signal(signal.SIGTERM)
+        if self.paused:
+            # A stopped process only sees SIGTERM once it runs again
+            self._signal(signal.SIGCONT)
+            self.paused = False
+        timer = threading.Timer(self.grace, self._kill)
+        timer.daemon = True
+        timer.start()
+
+    def _kill(self):
+        """Kill the process group if it ignored the stop request"""
+        if self.running():
+            self._signal(signal.SIGKILL)
@@ -0,0 +1,346 @@
+"""Device enumeration providers
+
+Each provider lists the physical drives one way: the REDundead device table,
+wmic, PowerShell CIM, or sysfs and lsblk on Linux. Providers run
+concurrently and stream their output through column-aware parsers that stop
+reading as soon as the table ends. The answer of the most authoritative
+provider wins, REDundead first. A fallback's answer is used once every
+provider ranked above it has failed, or after PREFERRED_WAIT seconds, so a
+hung REDundead costs one wait instead of several serial process runs.
+"""
+import csv
+import os
+import queue
+import signal
+import subprocess
+import threading
+import time
+
+from redundead_devices import Device, linux_device
+from redundead_process import split_command
+from redundead_trace import tracer
+
+# REDundead reports sizes in binary units
+SIZE_UNITS = {"B": 1, "KB": 1024, "MB": 1024 ** 2, "GB": 1024 ** 3, "TB": 1024 ** 4}
+
+# How long a fallback's answer waits for a better ranked provider
+PREFERRED_WAIT = 2.0
+
+# Windows: keep console windows of helper processes hidden
+CREATE_NO_WINDOW = 0x08000000
+
+
+def parse_size(text):
+    """Convert a size such as '954 GB', '1.8 TB' or '954GB' to bytes, None if unknown"""
+    parts = text.split()
+    if len(parts) == 1:
+        # Number and unit written together
+        number = parts[0].rstrip("BKMGTbkmgt")
+        parts = [number, parts[0][len(number):]]
+    if len(parts) != 2:
+        return None
+    unit = SIZE_UNITS.get(parts[1].upper())
+    if unit is None:
+        return None
+    try:
+        return int(float(parts[0]) * unit)
+    except ValueError:
+        return None
+
+
+class DeviceTableParser:
+    """Streaming parser for the device table REDundead prints without arguments
+
+    The header line names the columns (Device, Size, Name) and their start
+    positions. Rows are sliced at those positions, with a token-based
+    fallback for rows that don't line up. feed() returns True once the
+    table has ended, so the caller can stop reading.
+    """
+    COLUMNS = ("device", "size", "name")
+
+    def __init__(self):
+        self.columns = None  # Start positions of Device, Size and Name
+        self.devices = []
+        self.done = False
+
+    def feed(self, line):
+        """Parse one line, return True when no more rows can follow"""
+        if self.done:
+            return True
+        line = line.rstrip("\r\n")
+        if self.columns is None:
+            self.columns = self._header(line)
+            return False
+        device = self._row(line)
+        if device:
+            self.devices.append(device)
+        elif self.devices or not line.strip():
+            # A blank or foreign line after the rows ends the table
+            self.done = bool(self.devices)
+        return self.done
+
+    def _header(self, line):
+        """Column start positions if line is the table header"""
+        lowered = line.lower()
+        if lowered.split() != list(self.COLUMNS):
+            return None
+        return [lowered.index(column) for column in self.COLUMNS]
+
+    def _row(self, line):
+        """Device of one table row, None for anything else"""
+        tokens = line.split()
+        if not tokens or not tokens[0].startswith("disk"):
+            return None
+        device, size, name = self.columns
+        size_text = line[size:name].strip()
+        size_bytes = parse_size(size_text)
+        if line[device:size].strip() == tokens[0] and size_bytes is not None:
+            return Device(tokens[0], size_bytes, line[name:].strip())
+        # Misaligned row: the size follows the id as '954 GB' or '954GB'
+        for width in (2, 1):
+            size_bytes = parse_size(" ".join(tokens[1:1 + width]))
+            if size_bytes is not None:
+                return Device(tokens[0], size_bytes, " ".join(tokens[1 + width:]))
+        return None
+
+
+class CsvParser:
+    """Streaming parser for CSV tables with Index, Model, SerialNumber and Size columns"""
+
+    def __init__(self):
+        self.header = None
+        self.devices = []
+
+    def feed(self, line):
+        """Parse one line, the table ends with the output"""
+        line = line.strip()
+        if not line:
+            return False
+        row = next(csv.reader([line]))
+        if self.header is None:
+            self.header = [column.strip().lower() for column in row]
+            return False
+        values = dict(zip(self.header, row))
+        index = values.get("index", "").strip()
+        if not index.isdigit():
+            return False
+        size = values.get("size", "").strip()
+        self.devices.append(Device(
+            f"disk{index}",
+            int(size) if size.isdigit() else None,
+            values.get("model", "").strip(),
+            values.get("serialnumber", "").strip(),
+        ))
+        return False
+
+
+class LsblkParser:
+    """Streaming parser for lsblk -P output (KEY="value" pairs per line)"""
+
+    def __init__(self):
+        self.devices = []
+
+    def feed(self, line):
+        values = {}
+        for pair in line.split('" '):
+            key, _, value = pair.partition('="')
+            values[key.strip()] = value.rstrip('"\n')
+        if values.get("TYPE") != "disk" or not values.get("NAME"):
+            return False
+        size = values.get("SIZE", "")
+        self.devices.append(Device(values["NAME"], int(size) if size.isdigit() else None,
+                                   values.get("MODEL", "").strip(), values.get("SERIAL", "").strip()))
+        return False
+
+
+class DeviceProvider:
+    """One way of listing drives, run on its own thread"""
+    name = ""
+
+    def __init__(self):
+        self.process = None
+        self.output = []  # Lines read, for the diagnostic log
+        self.cancelled = False
+
+    def available(self):
+        """True if this provider can work on the current system"""
+        return True
+
+    def command(self):
+        raise NotImplementedError
+
+    def parser(self):
+        raise NotImplementedError
+
+    def run(self):
+        """Stream the command's output through the parser, return the devices"""
+        parser = self.parser()
+        flags = CREATE_NO_WINDOW if os.name == "nt" else 0
+        self.process = subprocess.Popen(
+            self.command(), stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            stdin=subprocess.DEVNULL, text=True, errors="replace", creationflags=flags,
+            start_new_session=os.name != "nt"
+        )
+        if self.cancelled:
+            self.kill()
+        try:
+            for line in self.process.stdout:
+                self.output.append(line)
+                if parser.feed(line):
+                    # The table is complete, whatever follows is not needed
+                    break
+        finally:
+            self.kill()
+            self.process.stdout.close()
+            self.process.wait()
+        return parser.devices
+
+    def kill(self):
+        """Kill the process and anything it started"""
+        process = self.process
+        if not process or process.poll() is not None:
+            return
+        try:
+            if os.name == "nt":
+                process.kill()
+            else:
+                os.killpg(process.pid, signal.SIGKILL)
+        except OSError:
+            pass
+
+    def cancel(self):
+        """Stop the provider, its thread then sees the end of the output"""
+        self.cancelled = True
+        self.kill()
+
+
+class REDundeadProvider(DeviceProvider):
+    """The device table of REDundead itself, the ids it prints are the ones it accepts"""
+    name = "REDundead"
+
+    def __init__(self, executable):
+        super().__init__()
+        self.executable = executable
+
+    def command(self):
+        return split_command(self.executable)
+
+    def parser(self):
+        return DeviceTableParser()
+
+
+class WmicProvider(DeviceProvider):
+    """wmic diskdrive, deprecated but present on most Windows 10 systems"""
+    name = "wmic"
+
+    def available(self):
+        return os.name == "nt"
+
+    def command(self):
+        return ["wmic", "diskdrive", "get", "Index,Model,SerialNumber,Size", "/format:csv"]
+
+    def parser(self):
+        return CsvParser()
+
+
+class CimProvider(DeviceProvider):
+    """Win32_DiskDrive through PowerShell, the replacement for wmic"""
+    name = "PowerShell CIM"
+
+    def available(self):
+        return os.name == "nt"
+
+    def command(self):
+        return ["powershell", "-NoProfile", "-NonInteractive", "-Command",
+                "Get-CimInstance Win32_DiskDrive | Select-Object Index,Model,SerialNumber,Size"
+                " | ConvertTo-Csv -NoTypeInformation"]
+
+    def parser(self):
+        return CsvParser()
+
+
+class LsblkProvider(DeviceProvider):
+    """lsblk on Linux, whole disks only"""
+    name = "lsblk"
+
+    def available(self):
+        return os.name != "nt" and os.path.isdir("/sys/block")
+
+    def command(self):
+        return ["lsblk", "-b", "-d", "-n", "-P", "-o", "NAME,SIZE,MODEL,SERIAL,TYPE"]
+
+    def parser(self):
+        return LsblkParser()
+
+
+class SysfsProvider(DeviceProvider):
+    """Reads /sys/block directly, no process needed"""
+    name = "sysfs"
+
+    def available(self):
+        return os.name != "nt" and os.path.isdir("/sys/block")
+
+    def run(self):
+        devices = []
+        for name in sorted(os.listdir("/sys/block")):
+            device = linux_device(name)
+            if device is None:
+                continue
+            devices.append(device)
+            self.output.append(f"{name} {device.size_bytes} {device.model}\n")
+        return devices
+
+
+def default_providers(executable):
+    """Providers for this system, most authoritative first"""
+    providers = [REDundeadProvider(executable), CimProvider(), WmicProvider(), SysfsProvider(), LsblkProvider()]
+    return [provider for provider in providers if provider.available()]
+
+
+def enumerate_devices(providers, log=None, timeout=None, preferred_wait=PREFERRED_WAIT):
+    """Run providers concurrently and return the best answer, [] if all fail"""
+    results = queue.Queue()
+
+    def run(rank, provider):
+        try:
+            with tracer.span("device_provider", provider=provider.name):
+                devices = provider.run()
+        except Exception as e:
+            devices = []
+            if log and not provider.cancelled:
+                log(f"{provider.name} device list failed: {e}")
+        results.put((rank, devices))
+
+    for rank, provider in enumerate(providers):
+        threading.Thread(target=run, args=(rank, provider), daemon=True,
+                         name=f"devices-{provider.name}").start()
+
+    answers = {}
+    start = time.monotonic()
+    deadline = start + timeout if timeout else None
+    fallback_deadline = None
+    best = None
+    while len(answers) < len(providers):
+        wait = [limit - time.monotonic() for limit in (deadline, fallback_deadline) if limit]
+        try:
+            rank, devices = results.get(timeout=max(min(wait), 0) if wait else None)
+        except queue.Empty:
+            break
+        answers[rank] = devices
+        if devices and fallback_deadline is None:
+            fallback_deadline = time.monotonic() + preferred_wait
+        # The best ranked answer wins as soon as everything ranked above it has failed
+        best = next((rank for rank in sorted(answers) if answers[rank]), None)
+        if best is not None and all(answers.get(higher) == [] for higher in range(best)):
+            break
+
+    for provider in providers:
+        provider.cancel()
+    if best is None:
+        if log:
+            log("No provider returned a device list")
+        return []
+    provider = providers[best]
+    if log:
+        log(f"Device list from {provider.name} in {time.monotonic() - start:.2f} s:\n{''.join(provider.output)}")
+    return answers[best]
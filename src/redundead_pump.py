@@ -0,0 +1,206 @@
+"""Binary output pump between an engine process and its consumers
+
+Each pipe is read unbuffered into one reusable bytearray. The complete lines
+of every read are handed to all consumers as one PumpChunk that points into
+the buffer, so consumers share the bytes instead of each getting a copy.
+Consumers that count lines, look for a marker or write the raw output to a
+file never decode anything, and the first consumer that asks for text
+decodes the chunk once for all of them. Only the unfinished line at the end
+of a read is copied, to the front of the buffer, and the buffer grows when a
+single line doesn't fit.
+
+A PumpChunk and its views are only valid during the consumer call. A
+consumer that keeps output must copy it with bytes() or keep its text.
+A consumer that raises is reported once and the pipe keeps being drained.
+"""
+import sys
+import threading
+from collections import deque
+
+# Bytes read from a pipe at once, lines longer than this grow the buffer
+READ_SIZE = 64 * 1024
+
+
+class PumpChunk:
+    """Complete lines from one read of a pipe, inside the pump's buffer"""
+    __slots__ = ("stream", "memory", "start", "end", "_text", "_lines")
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.memory = None
+        self.start = 0
+        self.end = 0
+        self._text = None
+        self._lines = None
+
+    def _point(self, memory, start, end):
+        self.memory = memory
+        self.start = start
+        self.end = end
+        self._text = None
+        self._lines = None
+
+    @property
+    def view(self):
+        """memoryview of the raw bytes, line endings included, no copy"""
+        return self.memory[self.start:self.end]
+
+    @property
+    def text(self):
+        """Chunk decoded as UTF-8, decoded on first use and shared by all consumers"""
+        if self._text is None:
+            self._text = str(self.memory[self.start:self.end], "utf-8", "replace")
+        return self._text
+
+    def lines(self):
+        """Decoded lines without their line endings"""
+        if self._lines is None:
+            text = self.text
+            if text.endswith("\n"):
+                text = text[:-1]
+            lines = text.split("\n")
+            if "\r" in text:
+                lines = [line.rstrip("\r") for line in lines]
+            self._lines = lines
+        return self._lines
+
+    def find(self, sub):
+        """Index of sub in the chunk, -1 if absent, searched in the buffer without a copy"""
+        index = self.memory.obj.find(sub, self.start, self.end)
+        return index - self.start if index >= 0 else -1
+
+    def count(self, sub):
+        return self.memory.obj.count(sub, self.start, self.end)
+
+    def __contains__(self, sub):
+        return self.memory.obj.find(sub, self.start, self.end) >= 0
+
+    def __len__(self):
+        return self.end - self.start
+
+    def __bytes__(self):
+        return bytes(self.memory[self.start:self.end])
+
+
+def text_consumer(on_line):
+    """Adapt an on_line(text, stream) callback to a pump consumer"""
+    def consume(chunk):
+        stream = chunk.stream
+        for line in chunk.lines():
+            on_line(line, stream)
+    return consume
+
+
+class OutputPump:
+    """Reads stdout and stderr of a process concurrently, one reader thread per pipe
+
+    The process must be started with binary, unbuffered pipes (bufsize=0 and
+    no text mode). Every chunk is passed to the consumers in the order they
+    were added.
+    """
+
+    def __init__(self, process, consumers=(), max_lines=1000, read_size=READ_SIZE, on_error=None):
+        self.process = process
+        self.consumers = list(consumers)
+        # Called with a message the first time a consumer raises, stderr if not given
+        self.on_error = on_error
+        self.failed = set()  # Indexes of consumers that raised
+        self.failed_lock = threading.Lock()
+        self.read_size = read_size
+        # Bounded ring buffer with the last error lines, stdout is not kept
+        self.stderr_tail = deque(maxlen=max_lines)
+        self.line_counts = {"stdout": 0, "stderr": 0}
+        self.threads = []
+
+    def add_consumer(self, consumer):
+        """Add a consumer(chunk) called for every chunk of output, before start()"""
+        self.consumers.append(consumer)
+
+    def start(self):
+        """Start one reader thread per available pipe"""
+        for name, stream in (("stdout", self.process.stdout), ("stderr", self.process.stderr)):
+            if stream is None:
+                continue
+            thread = threading.Thread(
+                target=self._read_stream,
+                args=(name, stream),
+                daemon=True
+            )
+            thread.start()
+            self.threads.append(thread)
+
+    def _dispatch(self, chunk):
+        if chunk.stream == "stderr":
+            self.stderr_tail.extend(chunk.lines())
+        for index, consumer in enumerate(self.consumers):
+            # One failing consumer must not stop the reader, the process would block on a full pipe
+            try:
+                consumer(chunk)
+            except Exception as e:
+                self._consumer_failed(index, consumer, e)
+
+    def _consumer_failed(self, index, consumer, error):
+        """Report the first failure of a consumer, it keeps getting the following chunks"""
+        with self.failed_lock:
+            if index in self.failed:
+                return
+            self.failed.add(index)
+        name = getattr(consumer, "__qualname__", type(consumer).__name__)
+        message = f"Output consumer {name} failed: {error!r}"
+        try:
+            if self.on_error:
+                self.on_error(message)
+                return
+        except Exception:
+            pass
+        sys.stderr.write(message + "\n")
+
+    def _read_stream(self, name, stream):
+        """Forward the output of a pipe chunk by chunk until EOF"""
+        chunk = PumpChunk(name)
+        buffer = bytearray(self.read_size)
+        memory = memoryview(buffer)
+        filled = 0  # Bytes of an unfinished line at the front of the buffer
+        count = 0
+        try:
+            while True:
+                if filled == len(buffer):
+                    # A line longer than the buffer, continue in one twice the size
+                    buffer = bytearray(len(buffer) * 2)
+                    buffer[:filled] = memory
+                    memory = memoryview(buffer)
+                # readinto blocks only this thread, never the other pipe
+                read = stream.readinto(memory[filled:])
+                if not read:
+                    break
+                end = filled + read
+                last = buffer.rfind(b"\n", filled, end)
+                if last < 0:
+                    filled = end
+                    continue
+                chunk._point(memory, 0, last + 1)
+                count += buffer.count(b"\n", 0, last + 1)
+                self._dispatch(chunk)
+                # Keep the unfinished line for the next read
+                filled = end - last - 1
+                if filled:
+                    buffer[:filled] = buffer[last + 1:end]
+            if filled:
+                # The last line had no newline
+                chunk._point(memory, 0, filled)
+                count += 1
+                self._dispatch(chunk)
+        finally:
+            self.line_counts[name] = count
+            stream.close()
+
+    def error_tail(self):
+        """Last stderr lines"""
+        return list(self.stderr_tail)
+
+    def wait(self):
+        """Wait for the process to exit and both pipes to drain, return the exit code"""
+        return_code = self.process.wait()
+        for thread in self.threads:
+            thread.join()
+        return return_code
@@ -0,0 +1,290 @@
+"""Results step of the GUI: the recovered clips with their thumbnails
+
+The clips are shown in a model/view table with fixed row heights, so the
+view only asks the model about the rows on screen. The model lists the
+folder once and loads clip information and thumbnails for visible rows on
+background threads. Requests made while scrolling are collected and sent
+when the event loop is idle, dropping rows that have left the screen by
+then, so scrolling through thousands of fragments reads a few KB per clip
+that is actually shown.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from PyQt5.QtCore import QAbstractTableModel, QBuffer, QIODevice, QSize, Qt, QTimer, pyqtSignal, QObject
+from PyQt5.QtGui import QColor, QImage, QPainter, QPixmap
+from PyQt5.QtWidgets import QAbstractItemView, QHeaderView, QLabel, QTableView, QVBoxLayout, QWidget
+
+from redundead_core import default_thumbnail_cache
+from redundead_dedup import find_clips
+from redundead_preview import (THUMBNAIL_HEIGHT, THUMBNAIL_WIDTH, LRUCache, read_info, redline_available,
+                               render_first_frame, thumbnail_key)
+from redundead_space import format_bytes
+
+# Threads reading clip headers, the reads are small and mostly wait on the disk
+INFO_WORKERS = 4
+
+COLUMNS = ("col_clip", "col_size", "col_duration", "col_timecode")
+UNKNOWN = "--:--:--"
+
+
+def format_duration(seconds):
+    """Format seconds as HH:MM:SS"""
+    minutes, seconds = divmod(round(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+
+
+def png_bytes(image):
+    """Encode a QImage as PNG"""
+    buffer = QBuffer()
+    buffer.open(QIODevice.WriteOnly)
+    image.save(buffer, "PNG")
+    return bytes(buffer.data())
+
+
+class ClipLoader(QObject):
+    """Lists a folder and loads clip information and thumbnails on background threads
+
+    Every result carries the generation of the listing it belongs to, so the
+    model can drop results for a folder it no longer shows.
+    """
+    clips_listed = pyqtSignal(int, list)  # Generation, (ClipFile, thumbnail key) pairs
+    info_ready = pyqtSignal(int, int, object)  # Generation, row, ClipInfo or None
+    thumbnail_ready = pyqtSignal(int, int, object)  # Generation, row, QImage, null without a thumbnail
+
+    def __init__(self, cache):
+        super().__init__()
+        self.cache = cache
+        self.info_pool = ThreadPoolExecutor(max_workers=INFO_WORKERS, thread_name_prefix="clip-info")
+        # REDline decodes a whole frame, one render at a time leaves the disk to the headers
+        self.render_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="clip-render")
+        self.redline = None  # Looked up with the first thumbnail
+
+    def list_folder(self, generation, folder):
+        self.info_pool.submit(self._list, generation, folder)
+
+    def _list(self, generation, folder):
+        clips = sorted(find_clips(folder), key=lambda clip: clip.path)
+        self.clips_listed.emit(generation, [(clip, thumbnail_key(clip.path, clip.size, clip.mtime))
+                                            for clip in clips])
+
+    def load(self, generation, row, clip, key, info, need_info):
+        """Read the information of a clip if needed, then find or render its thumbnail"""
+        self.info_pool.submit(self._load, generation, row, clip, key, info, need_info)
+
+    def _load(self, generation, row, clip, key, info, need_info):
+        if need_info:
+            info = read_info(clip.path, clip.size)
+            self.info_ready.emit(generation, row, info)
+        data = self.cache.get(key)
+        if data is not None:
+            self.thumbnail_ready.emit(generation, row, QImage.fromData(data))
+            return
+        if self.redline is None:
+            self.redline = redline_available()
+        if self.redline and info is not None and info.first_frame is not None:
+            self.render_pool.submit(self._render, generation, row, clip, key, info)
+        else:
+            self.thumbnail_ready.emit(generation, row, QImage())
+
+    def _render(self, generation, row, clip, key, info):
+        image = QImage()
+        data = render_first_frame(clip.path, info)
+        if data is not None and image.loadFromData(data):
+            image = image.scaled(THUMBNAIL_WIDTH, THUMBNAIL_HEIGHT, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+            self.cache.put(key, png_bytes(image))
+        self.thumbnail_ready.emit(generation, row, image)
+
+    def shutdown(self):
+        """Drop queued loads, a running REDline render finishes on its own"""
+        self.info_pool.shutdown(wait=False, cancel_futures=True)
+        self.render_pool.shutdown(wait=False, cancel_futures=True)
+
+
+class ClipModel(QAbstractTableModel):
+    """Recovered clips of a folder, information and thumbnails loaded for visible rows only"""
+
+    def __init__(self, tr, loader, visible_rows):
+        super().__init__()
+        self.tr = tr
+        self.loader = loader
+        self.visible_rows = visible_rows  # Returns the range of rows on screen
+        self.folder = None
+        self.generation = 0
+        self.clips = []
+        self.keys = []
+        self.infos = {}  # Row -> ClipInfo, None for a clip without a readable header
+        self.thumbnails = LRUCache()  # Thumbnail key -> QPixmap
+        self.pending = set()  # Rows with a load in flight
+        self.wanted = set()  # Rows painted without their data since the last flush
+        self.request_timer = QTimer(self)
+        self.request_timer.setSingleShot(True)
+        self.request_timer.timeout.connect(self.flush_requests)
+        loader.clips_listed.connect(self.set_clips)
+        loader.info_ready.connect(self.set_info)
+        loader.thumbnail_ready.connect(self.set_thumbnail)
+
+    def load(self, folder):
+        """Show the clips below folder, listed in the background"""
+        self.generation += 1
+        self.folder = folder
+        self.set_clips(self.generation, [])
+        self.loader.list_folder(self.generation, folder)
+
+    def set_clips(self, generation, clips):
+        if generation != self.generation:
+            return
+        self.beginResetModel()
+        self.clips = [clip for clip, _ in clips]
+        self.keys = [key for _, key in clips]
+        self.infos = {}
+        self.pending = set()
+        self.wanted = set()
+        self.endResetModel()
+
+    def rowCount(self, parent=None):
+        return len(self.clips)
+
+    def columnCount(self, parent=None):
+        return len(COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.tr.get(COLUMNS[section])
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        row, column = index.row(), index.column()
+        clip = self.clips[row]
+        if role == Qt.DecorationRole and column == 0:
+            pixmap = self.thumbnails.get(self.keys[row])
+            if pixmap is None:
+                self.request(row)
+            return pixmap
+        if role == Qt.ToolTipRole and column == 0:
+            info = self.infos.get(row)
+            if info is not None and info.width and info.fps:
+                return f"{info.width}×{info.height}, {info.fps:g} fps"
+            return None
+        if role != Qt.DisplayRole:
+            return None
+        if column == 0:
+            return os.path.relpath(clip.path, self.folder)
+        if column == 1:
+            return format_bytes(clip.size)
+        if row not in self.infos:
+            self.request(row)
+            return ""
+        info = self.infos[row]
+        if column == 2:
+            duration = info.duration if info is not None else None
+            return format_duration(duration) if duration is not None else UNKNOWN
+        timecode = info.timecode() if info is not None else None
+        return timecode or UNKNOWN
+
+    def request(self, row):
+        """Ask for the data of a painted row, sent once the event loop is idle"""
+        if row in self.pending:
+            return
+        self.wanted.add(row)
+        if not self.request_timer.isActive():
+            self.request_timer.start(0)
+
+    def flush_requests(self):
+        """Load the wanted rows that are still on screen"""
+        visible = self.visible_rows()
+        for row in sorted(self.wanted):
+            if row in visible and row not in self.pending:
+                self.pending.add(row)
+                self.loader.load(self.generation, row, self.clips[row], self.keys[row],
+                                 self.infos.get(row), row not in self.infos)
+        self.wanted = set()
+
+    def set_info(self, generation, row, info):
+        if generation != self.generation:
+            return
+        self.infos[row] = info
+        self.dataChanged.emit(self.index(row, 2), self.index(row, 3), [Qt.DisplayRole])
+
+    def set_thumbnail(self, generation, row, image):
+        if generation != self.generation:
+            return
+        self.pending.discard(row)
+        pixmap = QPixmap.fromImage(image) if not image.isNull() else self.placeholder(self.infos.get(row))
+        self.thumbnails.put(self.keys[row], pixmap)
+        index = self.index(row, 0)
+        self.dataChanged.emit(index, index, [Qt.DecorationRole])
+
+    def placeholder(self, info):
+        """Stand-in thumbnail showing the frame size, for clips REDline can't render"""
+        pixmap = QPixmap(THUMBNAIL_WIDTH, THUMBNAIL_HEIGHT)
+        pixmap.fill(QColor(48, 48, 48))
+        painter = QPainter(pixmap)
+        painter.setPen(QColor(170, 170, 170))
+        text = f"{info.width}×{info.height}" if info is not None and info.width else "R3D"
+        painter.drawText(pixmap.rect(), Qt.AlignCenter, text)
+        painter.end()
+        return pixmap
+
+
+class ResultsWidget(QWidget):
+    """Step 4: the recovered clips with thumbnail, size, duration and timecode"""
+
+    def __init__(self, tr):
+        super().__init__()
+        self.tr = tr
+        layout = QVBoxLayout(self)
+
+        self.title_label = QLabel(tr.get("step4_title"))
+        self.title_label.setStyleSheet("font-size: 14pt; font-weight: bold;")
+        layout.addWidget(self.title_label)
+
+        self.summary_label = QLabel()
+        layout.addWidget(self.summary_label)
+
+        self.view = QTableView()
+        self.view.verticalHeader().setVisible(False)
+        # Fixed row heights, the view never asks the model for the size of rows off screen
+        self.view.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.view.verticalHeader().setDefaultSectionSize(THUMBNAIL_HEIGHT + 6)
+        self.view.setIconSize(QSize(THUMBNAIL_WIDTH, THUMBNAIL_HEIGHT))
+        self.view.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.view.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.view.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+
+        self.loader = ClipLoader(default_thumbnail_cache())
+        self.model = ClipModel(tr, self.loader, self.visible_rows)
+        self.model.modelReset.connect(self.update_summary)
+        self.view.setModel(self.model)
+        # Sized to contents, a column would be measured over every row
+        header = self.view.horizontalHeader()
+        header.setSectionResizeMode(0, QHeaderView.Stretch)
+        for column in range(1, len(COLUMNS)):
+            header.setSectionResizeMode(column, QHeaderView.Fixed)
+            header.resizeSection(column, 110)
+        layout.addWidget(self.view)
+
+    def load(self, folder):
+        """List the clips below folder"""
+        self.summary_label.setText(self.tr.get("results_listing"))
+        self.model.load(folder)
+
+    def update_summary(self):
+        if self.model.clips:
+            self.summary_label.setText(self.tr.get("results_summary").format(
+                count=len(self.model.clips), folder=self.model.folder
+            ))
+
+    def visible_rows(self):
+        """Range of the rows on screen"""
+        first = self.view.rowAt(0)
+        if first < 0:
+            return range(0)
+        last = self.view.rowAt(self.view.viewport().height() - 1)
+        if last < 0:
+            last = self.model.rowCount() - 1
+        return range(first, last + 1)
+
+    def shutdown(self):
+        self.loader.shutdown()
@@ -0,0 +1,156 @@
+"""User settings kept in a small JSON file in the per-user folder
+
+Holds choices that should survive a restart, such as the interface language,
+so the helper doesn't ask again on every launch. A missing or damaged file
+reads as empty settings, and every change replaces the file atomically.
+
+Named presets bundle what a recovery needs besides the drive: the target
+root, a template for the recovery folder name, the number of drives
+recovered at once, whether clips are verified and how much of the engine's
+output the log view shows. A preset with auto_start recovers every drive
+inserted while it is selected, without asking anything.
+"""
+import json
+import os
+import re
+import string
+import time
+
+SETTINGS_FILE = "settings.json"
+
+# Fields a folder name template can use, e.g. {date}_{serial}
+FOLDER_FIELDS = ("date", "serial", "disk")
+# Log verbosity, quiet keeps the engine's own output in the log file only
+VERBOSITY_LEVELS = ("full", "quiet")
+
+# Values of a preset that doesn't set them, a folder or jobs of None mean the built-in default
+PRESET_DEFAULTS = {
+    "target": None,
+    "folder": None,
+    "jobs": None,
+    "verify": True,
+    "verbosity": "full",
+    "auto_start": False,
+}
+
+# Characters Windows doesn't allow in a file name
+INVALID_NAME_CHARACTERS = re.compile(r'[<>:"/\\|?*\x00-\x1f]')
+
+
+def template_fields(template):
+    """Fields a folder name template uses, ValueError if it is malformed or uses an unknown one"""
+    fields = set()
+    try:
+        parsed = list(string.Formatter().parse(template))
+    except ValueError as e:
+        raise ValueError(f"Malformed folder template {template!r}: {e}")
+    for _, field, spec, conversion in parsed:
+        if field is None:
+            continue
+        if field not in FOLDER_FIELDS or spec or conversion:
+            raise ValueError(f"Unknown field {{{field}}} in folder template {template!r}, "
+                             f"use {', '.join('{' + name + '}' for name in FOLDER_FIELDS)}")
+        fields.add(field)
+    return fields
+
+
+def folder_name(template, disk, serial="", when=None):
+    """Recovery folder name for a drive, e.g. 2026-10-18_A1B2C3 for {date}_{serial}"""
+    template_fields(template)
+    name = template.format(
+        date=time.strftime("%Y-%m-%d", time.localtime(when)),
+        serial=serial or "unknown",
+        disk=disk
+    )
+    # A serial number may contain anything, and Windows drops trailing dots and spaces
+    name = INVALID_NAME_CHARACTERS.sub("_", name).rstrip(". ")
+    if not name:
+        raise ValueError(f"Folder template {template!r} gives an empty name")
+    return name
+
+
+def check_preset(values):
+    """Preset with every key filled in, ValueError for a key or value that can't be used"""
+    unknown = set(values) - set(PRESET_DEFAULTS)
+    if unknown:
+        raise ValueError(f"Unknown preset setting: {', '.join(sorted(unknown))}")
+    preset = dict(PRESET_DEFAULTS, **values)
+    if preset["folder"] is not None:
+        folder_name(preset["folder"], "disk1")
+    if preset["jobs"] is not None and (not isinstance(preset["jobs"], int) or preset["jobs"] < 1):
+        raise ValueError(f"Jobs must be a number of at least 1, not {preset['jobs']!r}")
+    if preset["verbosity"] not in VERBOSITY_LEVELS:
+        raise ValueError(f"Unknown log verbosity: {preset['verbosity']}")
+    return preset
+
+
+class Settings:
+    """Key-value settings loaded once and written back on every change"""
+
+    def __init__(self, path):
+        self.path = path
+        self.values = self._load()
+
+    def _load(self):
+        """Read the settings file, {} if it is missing or unreadable"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                values = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return values if isinstance(values, dict) else {}
+
+    def get(self, key, default=None):
+        return self.values.get(key, default)
+
+    def set(self, key, value):
+        """Change one setting and save, False if the file could not be written"""
+        self.values[key] = value
+        return self.save()
+
+    def presets(self):
+        """Names of the saved presets, sorted"""
+        return sorted(self.values.get("presets", {}))
+
+    def preset(self, name):
+        """Settings of a preset with defaults filled in
+
+        KeyError if there is no preset of that name, ValueError if the file
+        was edited into something that can't be used.
+        """
+        presets = self.values.get("presets", {})
+        if name not in presets:
+            raise KeyError(f"No preset named {name!r}")
+        if not isinstance(presets[name], dict):
+            raise ValueError(f"Preset {name!r} is not a set of settings")
+        return check_preset(presets[name])
+
+    def save_preset(self, name, values):
+        """Add or replace a preset and save, ValueError if a value can't be used"""
+        if not name:
+            raise ValueError("A preset needs a name")
+        presets = dict(self.values.get("presets", {}))
+        presets[name] = check_preset(values)
+        return self.set("presets", presets)
+
+    def delete_preset(self, name):
+        """Remove a preset and save, KeyError if there is none of that name"""
+        presets = dict(self.values.get("presets", {}))
+        if name not in presets:
+            raise KeyError(f"No preset named {name!r}")
+        del presets[name]
+        if self.values.get("preset") == name:
+            self.values.pop("preset")
+        return self.set("presets", presets)
+
+    def save(self):
+        """Write the settings, replacing the old file atomically"""
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temp_path = self.path + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(self.values, f, indent=2, ensure_ascii=False)
+            os.replace(temp_path, self.path)
+            return True
+        except OSError:
+            return False
@@ -0,0 +1,138 @@
+"""Free space checks and write throughput sampling for the target disk
+
+The pre-flight estimate compares the worst case a recovery can write with
+the free space on the target. While a job runs, WriteMonitor is fed the size
+deltas that ClipWatcher already computes on each scandir pass, so write
+speed, stalls and the time until the disk is full cost no extra directory
+walks.
+"""
+import os
+import shutil
+import time
+
+# Warn when the target has less free space than this
+LOW_SPACE_BYTES = 4 * 1024 ** 3
+
+# Stop the job before the disk is completely full, so logs and the journal still fit
+SPACE_RESERVE_BYTES = 256 * 1024 ** 2
+
+# A job that neither scans nor writes for this long counts as stalled
+STALL_TIMEOUT = 60.0
+
+# Sustained write speeds below this are reported as a slow target
+SLOW_WRITE_RATE = 20 * 1024 ** 2
+
+# Write speed is logged at most this often
+WRITE_REPORT_INTERVAL = 30.0
+
+
+def free_space(path):
+    """Free bytes on the disk holding path, which may not exist yet"""
+    path = os.path.abspath(path)
+    while not os.path.exists(path) and os.path.dirname(path) != path:
+        path = os.path.dirname(path)
+    return shutil.disk_usage(path).free
+
+
+def estimate_space(source_sizes, image=False):
+    """Worst case bytes written for sources of the given sizes
+
+    Recovered clips can't be larger than the source. Imaging adds a sparse
+    image that is at most as large as the source again.
+    """
+    needed = sum(size for size in source_sizes if size)
+    return needed * 2 if image else needed
+
+
+def preflight(target_path, source_sizes, image=False):
+    """Return (needed, free) bytes for recovering the sources into target_path"""
+    return estimate_space(source_sizes, image), free_space(target_path)
+
+
+def format_bytes(size):
+    """Short human readable size such as 12.5 GB or 954 GB"""
+    for unit in ("B", "KB", "MB", "GB", "TB"):
+        if size < 1024 or unit == "TB":
+            break
+        size /= 1024
+    return f"{size:.1f}".rstrip("0").rstrip(".") + f" {unit}"
+
+
+class WriteMonitor:
+    """Tracks bytes written to a recovery folder and the space left on its disk"""
+
+    def __init__(self, target_path, scan_offset, on_warning, on_full, clock=time.monotonic,
+                 low_space=LOW_SPACE_BYTES, reserve=SPACE_RESERVE_BYTES, stall_timeout=STALL_TIMEOUT):
+        self.target_path = target_path
+        self.scan_offset = scan_offset  # Callable returning the current scan offset
+        self.on_warning = on_warning
+        self.on_full = on_full
+        self.clock = clock
+        self.low_space = low_space
+        self.reserve = reserve
+        self.stall_timeout = stall_timeout
+
+        now = clock()
+        self.written = 0
+        self.rate = 0.0  # Smoothed bytes per second while writing
+        self.last_sample = now
+        self.last_activity = now
+        self.last_offset = None
+        self.last_report = now
+        self.warned_low = False
+        self.stalled = False
+        self.full = False
+        self.paused = False  # Set while the job is paused, so the quiet isn't a stall
+
+    def sample(self, delta):
+        """Account for delta bytes written since the last scan and check the target"""
+        now = self.clock()
+        elapsed = now - self.last_sample
+        self.last_sample = now
+        self.written += max(delta, 0)
+
+        if delta > 0 and elapsed > 0:
+            rate = delta / elapsed
+            self.rate = rate if not self.rate else 0.7 * self.rate + 0.3 * rate
+
+        offset = self.scan_offset()
+        if delta > 0 or offset != self.last_offset or self.paused:
+            self.last_activity = now
+            self.last_offset = offset
+            if self.stalled:
+                self.stalled = False
+                self.on_warning("Recovery is moving again")
+        elif not self.stalled and now - self.last_activity >= self.stall_timeout:
+            self.stalled = True
+            self.on_warning(
+                f"No data scanned or written for {int(now - self.last_activity)} s, "
+                f"the source or target drive may have stopped responding"
+            )
+
+        if now - self.last_report >= WRITE_REPORT_INTERVAL and self.rate:
+            self.last_report = now
+            slow = " (slow target disk)" if self.rate < SLOW_WRITE_RATE else ""
+            self.on_warning(
+                f"Target write speed {self.rate / 1024 ** 2:.1f} MB/s, "
+                f"{format_bytes(self.written)} written{slow}"
+            )
+
+        self.check_space()
+
+    def check_space(self):
+        """Warn when space runs low and call on_full before the disk fills up"""
+        try:
+            free = free_space(self.target_path)
+        except OSError:
+            return
+        if free <= self.reserve:
+            if not self.full:
+                self.full = True
+                self.on_full(free)
+            return
+        if free < self.low_space and not self.warned_low:
+            self.warned_low = True
+            remaining = ""
+            if self.rate:
+                remaining = f", full in about {int((free - self.reserve) / self.rate / 60)} min at the current speed"
+            self.on_warning(f"Target disk is running low on space: {format_bytes(free)} free{remaining}")
@@ -0,0 +1,221 @@
+"""Performance telemetry for recovery runs
+
+Records spans, counters and instant events and writes them as a Chrome trace
+(chrome://tracing or https://ui.perfetto.dev can open it), so a slow run can
+be attached to a bug report. Tracing is off unless REDUNDEAD_TRACE names an
+output file or the CLI is started with --trace. With REDUNDEAD_PROFILE=1 or
+--profile, cProfile statistics of the main thread and of every recovery job
+and a tracemalloc summary are written next to the trace.
+
+When tracing is off, span() hands out a shared no-op context manager, so the
+instrumented code paths cost one attribute check. The profilers are imported
+only when profiling is turned on.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from contextlib import nullcontext
+from functools import wraps
+
+TRACE_ENV = "REDUNDEAD_TRACE"
+PROFILE_ENV = "REDUNDEAD_PROFILE"
+
+# Events beyond this are dropped, so a forgotten trace can't eat all memory
+MAX_TRACE_EVENTS = 1000000
+
+# Counters fed from hot paths are emitted at most this often per name
+COUNTER_INTERVAL = 0.5
+
+# Lines of the tracemalloc summary
+MEMORY_TOP_LINES = 30
+
+_NO_SPAN = nullcontext()
+
+
+class _Span:
+    """Context manager that records one complete event"""
+    __slots__ = ("tracer", "name", "args", "start")
+
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = self.tracer.now()
+        return self
+
+    def __exit__(self, *exc):
+        end = self.tracer.now()
+        self.tracer.record({"name": self.name, "ph": "X", "ts": self.start, "dur": end - self.start,
+                            "args": self.args})
+
+
+class Tracer:
+    """Collects trace events from every thread of the process"""
+
+    def __init__(self):
+        self.enabled = False
+        self.profile = False
+        self.path = None
+        self.pid = os.getpid()
+        self.origin = time.perf_counter()
+        self.lock = threading.Lock()
+        self.events = []
+        self.dropped = 0
+        self.threads = set()
+        self.rates = {}  # name -> (start time, count) of rate counters
+        self.profiles = {}  # name -> cProfile.Profile
+        self.closed = False
+
+    def configure(self, path=None, profile=False):
+        """Enable tracing to path, also read from REDUNDEAD_TRACE and REDUNDEAD_PROFILE"""
+        path = path or os.environ.get(TRACE_ENV)
+        profile = profile or os.environ.get(PROFILE_ENV, "") not in ("", "0")
+        if not path and not profile:
+            return
+        if not path:
+            import tempfile
+            path = os.path.join(tempfile.gettempdir(), f"redundead_trace_{self.pid}.json")
+        self.path = path
+        self.profile = profile
+        self.enabled = True
+        self.instant("trace_start")
+        if profile:
+            import tracemalloc
+            tracemalloc.start()
+            self.start_profile("main")
+        atexit.register(self.close)
+
+    def now(self):
+        """Microseconds since the tracer was created"""
+        return (time.perf_counter() - self.origin) * 1e6
+
+    def record(self, event):
+        """Add an event stamped with the current process and thread"""
+        tid = threading.get_ident()
+        event["pid"] = self.pid
+        event["tid"] = tid
+        with self.lock:
+            if tid not in self.threads:
+                # Metadata event so the viewer shows thread names instead of ids
+                self.threads.add(tid)
+                self.events.append({"name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid,
+                                    "args": {"name": threading.current_thread().name}})
+            if len(self.events) >= MAX_TRACE_EVENTS:
+                self.dropped += 1
+                return
+            self.events.append(event)
+
+    def span(self, name, **args):
+        """Context manager timing a stage, a no-op when tracing is off"""
+        if not self.enabled:
+            return _NO_SPAN
+        return _Span(self, name, args)
+
+    def traced(self, name):
+        """Decorator recording a span for every call of a function"""
+        def decorate(function):
+            @wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                with _Span(self, name, {}):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def instant(self, name, **args):
+        """Record a point in time"""
+        if self.enabled:
+            self.record({"name": name, "ph": "i", "s": "t", "ts": self.now(), "args": args})
+
+    def counter(self, name, **values):
+        """Record counter values, shown as a graph in the viewer"""
+        if self.enabled:
+            self.record({"name": name, "ph": "C", "ts": self.now(), "args": values})
+
+    def rate(self, name, count=1):
+        """Count events and emit them as a per-second counter every COUNTER_INTERVAL"""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        start, total = self.rates.get(name, (now, 0))
+        total += count
+        elapsed = now - start
+        if elapsed >= COUNTER_INTERVAL:
+            self.counter(name, per_second=total / elapsed)
+            self.rates[name] = (now, 0)
+        else:
+            self.rates[name] = (start, total)
+
+    def start_profile(self, name):
+        """Start a cProfile profiler for the calling thread, None if one is already active"""
+        import cProfile
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Python 3.12+ allows one profiler per process, the main one then sees every thread
+            return None
+        with self.lock:
+            self.profiles[name] = profiler
+        return profiler
+
+    def profiled(self, name):
+        """Context manager profiling the calling thread when profiling is on"""
+        if not self.profile:
+            return _NO_SPAN
+        return _Profiled(self, name)
+
+    def close(self):
+        """Write the trace, profiles and memory summary, once"""
+        if not self.enabled or self.closed:
+            return
+        self.closed = True
+        self.instant("trace_end", dropped=self.dropped)
+        base = os.path.splitext(self.path)[0]
+        if self.profile:
+            for name, profiler in list(self.profiles.items()):
+                profiler.disable()
+                profiler.dump_stats(f"{base}.{name}.prof")
+            self.write_memory(f"{base}.memory.txt")
+        with self.lock:
+            events = list(self.events)
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+    def write_memory(self, path):
+        """Write the biggest allocation sites seen by tracemalloc"""
+        import tracemalloc
+        if not tracemalloc.is_tracing():
+            return
+        current, peak = tracemalloc.get_traced_memory()
+        statistics = tracemalloc.take_snapshot().statistics("lineno")
+        tracemalloc.stop()
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(f"Current {current} bytes, peak {peak} bytes\n\n")
+            for statistic in statistics[:MEMORY_TOP_LINES]:
+                f.write(f"{statistic}\n")
+
+
+class _Profiled:
+    """Profiles the enclosed block of one thread into its own .prof file"""
+
+    def __init__(self, tracer, name):
+        self.tracer = tracer
+        self.name = name
+
+    def __enter__(self):
+        self.profiler = self.tracer.start_profile(self.name)
+        return self
+
+    def __exit__(self, *exc):
+        if self.profiler:
+            self.profiler.disable()
+
+
+# Shared by every module of the process
+tracer = Tracer()